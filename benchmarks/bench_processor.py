@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""Replay benchmark for the NiceType input processor.
+
+Drives ``InputProcessor`` headlessly with a recorded or synthetic key stream
+and reports per-key latency of the listener callback, throughput and how
+much synthetic output was injected. With ``--check`` the results are
+compared against ``baseline.json`` and the script exits non-zero if any
+number got worse than the allowed tolerance.
+
+``--check`` also replays a bursty stream, whose triggers come faster than
+the output worker can type them, twice: with the real output timing and
+with a worker that is never busy. The first must coalesce at least as many
+triggers as the baseline and both must leave the same text behind.
+
+Examples::
+
+    python benchmarks/bench_processor.py
+    python benchmarks/bench_processor.py --stream my_typing.jsonl
+    python benchmarks/bench_processor.py --prose --compare-prefilter
+    python benchmarks/bench_processor.py --check
+    python benchmarks/bench_processor.py --update-baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fakes  # noqa: E402
+
+keyboard = fakes.install()
+
+from benchmarks.streams import burst_stream, load_stream, synthetic_stream  # noqa: E402
+from nicetype.config.manager import config  # noqa: E402
+from nicetype.core import output as output_module  # noqa: E402
+from nicetype.core import processor as processor_module  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Relative slack allowed before --check reports a regression
+DEFAULT_TOLERANCES = {
+    "p50_us": 0.30,
+    "p99_us": 0.50,
+    "p999_us": 1.00,
+    "keys_per_second": 0.30,
+}
+# Output counters must not grow at all
+EXACT_METRICS = ("injections", "backspaces", "typed_chars", "cursor_moves")
+# Stream for the coalescing check
+BURST_KEYS = 4000
+BURST_SEED = 1234
+
+
+def _to_key(token):
+    """Turn a stream token into a fake pynput key object."""
+    if token.startswith("Key."):
+        return keyboard.Key[token[4:]]
+    return keyboard.KeyCode.from_char(token)
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _disable_prefilter(events):
+    """Make every character in ``events`` take the full rule/completion path."""
+    snapshot = config.snapshot
+    every_char = frozenset(token for _, _, token in events if len(token) == 1)
+    # Benchmark-only: the snapshot is immutable for everyone else
+    object.__setattr__(snapshot, "trigger_chars", snapshot.trigger_chars | every_char)
+
+
+def run_once(events, config_overrides=None, prefilter=True, instant_output=False):
+    """Replay ``events`` through a fresh processor and return raw results.
+
+    With ``instant_output`` the output worker finishes every edit before the
+    next key arrives, so nothing is ever coalesced.
+    """
+    clock = fakes.ReplayClock()
+    processor_module.time = clock
+    output_module.time = clock
+    # The output worker runs in replay time so coalescing is reproducible
+    processor_module.TextInjector = lambda **kwargs: fakes.ReplayInjector(clock)
+
+    config.reset_to_defaults()
+    # Large enough that backpressure never changes the injection counts
+    config.set("injection_queue_size", len(events) + 1)
+    for key, value in (config_overrides or {}).items():
+        config.set(key, value)
+    if not prefilter:
+        _disable_prefilter(events)
+
+    keyboard.Controller.reset()
+    screen = keyboard.Controller.screen
+    processor = processor_module.InputProcessor()
+    processor.start()
+    on_press = processor.listener.on_press
+    on_release = processor.listener.on_release
+    injector = processor.injector
+    run_due = injector.run_due
+
+    prepared = [(timestamp, action == "press", _to_key(token)) for timestamp, action, token in events]
+    latencies = []
+    record = latencies.append
+    counter = time.perf_counter_ns
+
+    gc.collect()
+    for timestamp, is_press, key in prepared:
+        run_due(timestamp)
+        clock.now = timestamp
+        if is_press:
+            screen.key(key)  # The application gets the key as the listener sees it
+            started = counter()
+            on_press(key)
+            record(counter() - started)
+        else:
+            on_release(key)
+        if instant_output:
+            injector.busy_until = 0.0
+            run_due(float("inf"))
+
+    run_due(float("inf"))
+    injection_stats = processor.get_injection_stats()
+    processor.stop()
+
+    results = {"latencies_ns": latencies, "injection_stats": injection_stats, "screen": screen.text}
+    results.update(keyboard.Controller.counts())
+    return results
+
+
+def summarize(raw):
+    """Reduce raw results to the reported metrics."""
+    latencies = sorted(raw["latencies_ns"])
+    total_seconds = sum(latencies) / 1e9
+    injection_stats = raw["injection_stats"]
+    return {
+        "keys": len(latencies),
+        "p50_us": _percentile(latencies, 0.50) / 1000.0,
+        "p99_us": _percentile(latencies, 0.99) / 1000.0,
+        "p999_us": _percentile(latencies, 0.999) / 1000.0,
+        "max_us": (latencies[-1] / 1000.0) if latencies else 0.0,
+        "mean_us": (total_seconds * 1e6 / len(latencies)) if latencies else 0.0,
+        "keys_per_second": (len(latencies) / total_seconds) if total_seconds else 0.0,
+        "injections": injection_stats.get("completed", 0),
+        "dropped": injection_stats.get("dropped", 0),
+        "merged": injection_stats.get("merged", 0),
+        "backspaces": raw["backspaces"],
+        "typed_chars": raw["typed_chars"],
+        "cursor_moves": raw["cursor_moves"],
+    }
+
+
+def run_benchmark(events, repeat=5, config_overrides=None, prefilter=True):
+    """Run the replay ``repeat`` times and keep the best latency figures.
+
+    Taking the best run filters out scheduler noise; the output counters are
+    deterministic and identical across runs.
+    """
+    best = None
+    for _ in range(repeat):
+        metrics = summarize(run_once(events, config_overrides, prefilter))
+        if best is None:
+            best = metrics
+            continue
+        for key in ("p50_us", "p99_us", "p999_us", "max_us", "mean_us"):
+            best[key] = min(best[key], metrics[key])
+        best["keys_per_second"] = max(best["keys_per_second"], metrics["keys_per_second"])
+    return best
+
+
+def run_coalescing(events):
+    """Replay a bursty stream with the real output timing and with an instant worker.
+
+    Returns the output counters of the timed replay, the injections the
+    instant one needed and whether both left the same text behind.
+    """
+    timed = run_once(events)
+    instant = run_once(events, instant_output=True)
+    metrics = summarize(timed)
+    return {
+        "merged": metrics["merged"],
+        "injections": metrics["injections"],
+        "uncoalesced_injections": summarize(instant)["injections"],
+        "same_text": timed["screen"] == instant["screen"],
+    }
+
+
+def check_coalescing(metrics, reference):
+    """Return a list of human readable coalescing regressions."""
+    failures = []
+    if not metrics["same_text"]:
+        failures.append("coalesced edits left different text behind than unmerged ones")
+    if metrics["merged"] < reference["merged"]:
+        failures.append(f"merged: {metrics['merged']} < {reference['merged']} (fewer triggers coalesced)")
+    if metrics["injections"] > reference["injections"]:
+        failures.append(f"bursty injections: {metrics['injections']} > {reference['injections']}")
+    return failures
+
+
+def check_against_baseline(metrics, baseline, tolerance_scale=1.0):
+    """Return a list of human readable regressions."""
+    failures = []
+    tolerances = dict(DEFAULT_TOLERANCES)
+    tolerances.update(baseline.get("tolerances", {}))
+    reference = baseline["metrics"]
+
+    for key, tolerance in tolerances.items():
+        if key not in reference:
+            continue
+        allowed = tolerance * tolerance_scale
+        if key == "keys_per_second":
+            limit = reference[key] / (1.0 + allowed)
+            if metrics[key] < limit:
+                failures.append(f"{key}: {metrics[key]:.0f} < {limit:.0f} (baseline {reference[key]:.0f})")
+        else:
+            limit = reference[key] * (1.0 + allowed)
+            if metrics[key] > limit:
+                failures.append(f"{key}: {metrics[key]:.2f} > {limit:.2f} (baseline {reference[key]:.2f})")
+
+    for key in EXACT_METRICS:
+        if key in reference and metrics[key] > reference[key]:
+            failures.append(f"{key}: {metrics[key]} > {reference[key]} (more synthetic output than baseline)")
+    return failures
+
+
+def print_report(name, metrics):
+    """Print one benchmark result."""
+    print(f"{name}: {metrics['keys']} keys")
+    print(f"  latency   p50 {metrics['p50_us']:8.2f} us   p99 {metrics['p99_us']:8.2f} us   "
+          f"p999 {metrics['p999_us']:8.2f} us   max {metrics['max_us']:8.2f} us")
+    print(f"  throughput {metrics['keys_per_second']:,.0f} keys/s (mean {metrics['mean_us']:.2f} us/key)")
+    print(f"  output    {metrics['injections']} injections ({metrics['merged']} merged), {metrics['dropped']} dropped, "
+          f"{metrics['backspaces']} backspaces, {metrics['typed_chars']} chars, "
+          f"{metrics['cursor_moves']} cursor moves")
+
+
+def print_coalescing(name, metrics):
+    """Print the result of the coalescing replay."""
+    text = "same text" if metrics["same_text"] else "DIFFERENT TEXT"
+    print(f"{name}: {metrics['merged']} triggers merged, {metrics['injections']} injections "
+          f"({metrics['uncoalesced_injections']} without coalescing), {text}")
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Replay benchmark for the NiceType input processor")
+    parser.add_argument("--stream", help="Recorded key stream (JSON lines); default is a synthetic stream")
+    parser.add_argument("--keys", type=int, default=20000, help="Key presses in the synthetic stream")
+    parser.add_argument("--seed", type=int, default=1234, help="Seed for the synthetic stream")
+    parser.add_argument("--prose", action="store_true",
+                        help="Synthesize ordinary English typing that no default rule reacts to")
+    parser.add_argument("--compare-prefilter", action="store_true",
+                        help="Also replay with the trigger-character fast path off and report the saving")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay the stream this many times faster (checks that per-key cost stays flat)")
+    parser.add_argument("--repeat", type=int, default=5, help="Replays per benchmark (best run is kept)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--check", action="store_true", help="Fail if results regress against the baseline")
+    parser.add_argument("--tolerance-scale", type=float, default=1.0,
+                        help="Multiply the allowed slack (e.g. 2.0 on noisy CI machines)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file to check against or update")
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        name = os.path.basename(args.stream)
+        events = load_stream(args.stream)
+    else:
+        kind = "prose" if args.prose else "synthetic"
+        name = f"{kind}(keys={args.keys}, seed={args.seed})"
+        events = synthetic_stream(args.keys, args.seed, prose=args.prose)
+    if args.speed != 1.0:
+        name += f" x{args.speed:g}"
+        events = [(timestamp / args.speed, action, token) for timestamp, action, token in events]
+
+    metrics = run_benchmark(events, repeat=args.repeat)
+
+    if args.json:
+        print(json.dumps({name: metrics}, indent=2))
+    else:
+        print_report(name, metrics)
+
+    if args.compare_prefilter:
+        full = run_benchmark(events, repeat=args.repeat, prefilter=False)
+        print_report(f"{name} without prefilter", full)
+        print(f"\nPrefilter saves {1 - metrics['mean_us'] / full['mean_us']:.0%} of the mean per-key time "
+              f"({full['mean_us']:.2f} -> {metrics['mean_us']:.2f} us, "
+              f"p50 {full['p50_us']:.2f} -> {metrics['p50_us']:.2f} us)")
+
+    coalescing = None
+    if args.check or args.update_baseline:
+        burst_name = f"burst(keys={BURST_KEYS}, seed={BURST_SEED})"
+        coalescing = run_coalescing(burst_stream(BURST_KEYS, BURST_SEED))
+        if not args.json:
+            print_coalescing(burst_name, coalescing)
+
+    if args.update_baseline:
+        if not coalescing["same_text"]:
+            print("Coalesced edits left different text behind; not updating the baseline")
+            return 1
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"stream": name, "metrics": metrics, "tolerances": DEFAULT_TOLERANCES,
+                       "coalescing": dict(coalescing, stream=burst_name)}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if args.check:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("stream") != name:
+            print(f"Baseline was recorded for {baseline.get('stream')}, not {name}")
+            return 2
+        failures = check_against_baseline(metrics, baseline, args.tolerance_scale)
+        if "coalescing" in baseline:
+            failures += check_coalescing(coalescing, baseline["coalescing"])
+        if failures:
+            print("\nPerformance regression:")
+            for failure in failures:
+                print(f"  - {failure}")
+            return 1
+        print("\nNo regression against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
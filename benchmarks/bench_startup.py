@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Startup and import-time benchmark for NiceType.
+
+Each scenario runs in a fresh interpreter (with ``HOME`` pointed at a
+scratch directory so the user's config is not touched) and is checked
+against ``startup_budget.json``:
+
+* the wall time NiceType adds on top of a bare ``python -c pass``,
+* the cumulative ``-X importtime`` of the ``nicetype`` modules it loads,
+* heavy modules (tkinter, pystray, PIL, pynput) that must not be imported.
+
+Examples::
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --check
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+HEAVY_MODULES = ("tkinter", "pystray", "PIL", "pynput")
+# Punctuation rules in the config of the large_rules scenario
+LARGE_RULES = 20000
+
+# name -> (python statement, description)
+SCENARIOS = {
+    "import_main": ("import nicetype.main", "importing the console entry point"),
+    "test_mode": (
+        "import sys; sys.argv = ['nicetype', '--test']; import nicetype.main as m; m.main()",
+        "nicetype --test",
+    ),
+    "stats_mode": (
+        "import sys; sys.argv = ['nicetype', '--stats']; import nicetype.main as m; m.main()",
+        "nicetype --stats",
+    ),
+    "processor": (
+        "from nicetype.core.processor import input_processor",
+        "creating the input processor (before it starts listening)",
+    ),
+    "tray_module": ("import nicetype.gui.tray", "importing the tray module (before the tray is built)"),
+    "settings_module": ("import nicetype.gui.settings", "importing the settings window"),
+    "large_rules": (
+        "from nicetype.config.manager import config; config.snapshot",
+        f"loading a config with {LARGE_RULES} rules (compiled rules cached on disk)",
+    ),
+}
+
+_REPORT = (
+    "\nimport json as _json, sys as _sys\n"
+    "_sys.stdout.write('\\n@@' + _json.dumps(sorted(m for m in {heavy!r} if m in _sys.modules)) + '\\n')\n"
+)
+
+
+def _write_large_config(home):
+    """Write a config with LARGE_RULES multi-character punctuation rules."""
+    import random
+
+    rng = random.Random(0)
+    mapping = {}
+    while len(mapping) < LARGE_RULES:
+        pattern = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz，。；：") for _ in range(rng.randint(2, 6)))
+        mapping[pattern] = pattern.upper()
+    os.makedirs(os.path.join(home, ".nicetype"), exist_ok=True)
+    with open(os.path.join(home, ".nicetype", "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"punctuation_mapping": mapping}, f, ensure_ascii=False)
+
+
+# Scenarios that run with a config of their own, written by the given function
+HOME_SETUP = {"large_rules": _write_large_config}
+
+
+def _run(statement, home, importtime=False):
+    """Run ``statement`` in a new interpreter; return (seconds, stdout, stderr)."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", statement]
+    env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode not in (0, 1):
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr}")
+    return elapsed, result.stdout, result.stderr
+
+
+def _nicetype_import_ms(stderr):
+    """Sum the cumulative ``-X importtime`` of the outermost nicetype imports."""
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        module = parts[2].strip()
+        # Nested nicetype imports are already part of their parent's total
+        if module.startswith("nicetype") and not parts[2].startswith("  "):
+            total_us += int(parts[1])
+    return total_us / 1000.0
+
+
+def measure(repeat=7):
+    """Measure every scenario; returns {name: metrics}."""
+    home = tempfile.mkdtemp(prefix="nicetype-startup-")
+    baseline = statistics.median(_run("pass", home)[0] for _ in range(repeat))
+
+    results = {}
+    for name, (statement, _) in SCENARIOS.items():
+        code = statement + _REPORT.format(heavy=HEAVY_MODULES)
+        scenario_home = home
+        if name in HOME_SETUP:
+            scenario_home = tempfile.mkdtemp(prefix=f"nicetype-{name}-")
+            HOME_SETUP[name](scenario_home)
+        _run(code, scenario_home)  # Warm the OS file cache (and write caches)
+        times = []
+        stdout = ""
+        for _ in range(repeat):
+            elapsed, stdout, _ = _run(code, scenario_home)
+            times.append(elapsed)
+        _, _, stderr = _run(code, scenario_home, importtime=True)
+        heavy = json.loads(stdout.rsplit("@@", 1)[1])
+        results[name] = {
+            "wall_ms": max(0.0, (statistics.median(times) - baseline) * 1000.0),
+            "import_ms": _nicetype_import_ms(stderr),
+            "heavy_modules": heavy,
+        }
+    return results
+
+
+def check(results, budget, scale=1.0):
+    """Return a list of budget violations."""
+    failures = []
+    for name, metrics in results.items():
+        limits = budget.get(name)
+        if limits is None:
+            continue
+        for key in ("wall_ms", "import_ms"):
+            if key in limits and metrics[key] > limits[key] * scale:
+                failures.append(f"{name}: {key} {metrics[key]:.1f} > budget {limits[key] * scale:.1f}")
+        allowed = set(limits.get("allowed_heavy_modules", []))
+        unexpected = [module for module in metrics["heavy_modules"] if module not in allowed]
+        if unexpected:
+            failures.append(f"{name}: imports {', '.join(unexpected)}")
+    return failures
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Startup and import-time benchmark for NiceType")
+    parser.add_argument("--repeat", type=int, default=7, help="Runs per scenario (median is kept)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--check", action="store_true", help="Fail if a scenario exceeds its budget")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiply every time budget (e.g. 2.0 on slow CI machines)")
+    args = parser.parse_args(argv)
+
+    results = measure(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, metrics in results.items():
+            heavy = ", ".join(metrics["heavy_modules"]) or "-"
+            print(f"{name:<16} wall +{metrics['wall_ms']:6.1f} ms   nicetype imports {metrics['import_ms']:6.1f} ms"
+                  f"   heavy: {heavy}   ({SCENARIOS[name][1]})")
+
+    if args.check:
+        with open(BUDGET_FILE, "r", encoding="utf-8") as f:
+            budget = json.load(f)
+        failures = check(results, budget, args.budget_scale)
+        if failures:
+            print("\nStartup budget exceeded:")
+            for failure in failures:
+                print(f"  - {failure}")
+            return 1
+        print("\nAll scenarios within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
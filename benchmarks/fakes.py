@@ -0,0 +1,300 @@
+"""Headless stand-ins for pynput and the clock used by the benchmarks.
+
+The fake ``pynput.keyboard`` module must be installed before anything under
+``nicetype.core`` is imported. Besides making the benchmarks run without a
+display, it guarantees they never type into the developer's real windows.
+"""
+
+import enum
+import sys
+from collections import deque
+import time as _real_time
+import types
+
+
+class Key(enum.Enum):
+    """Subset of ``pynput.keyboard.Key`` used by NiceType and the streams."""
+
+    alt = "alt"
+    alt_l = "alt_l"
+    alt_r = "alt_r"
+    backspace = "backspace"
+    caps_lock = "caps_lock"
+    ctrl = "ctrl"
+    ctrl_l = "ctrl_l"
+    ctrl_r = "ctrl_r"
+    delete = "delete"
+    down = "down"
+    end = "end"
+    enter = "enter"
+    esc = "esc"
+    f13 = "f13"
+    home = "home"
+    left = "left"
+    page_down = "page_down"
+    page_up = "page_up"
+    right = "right"
+    shift = "shift"
+    shift_l = "shift_l"
+    shift_r = "shift_r"
+    space = "space"
+    tab = "tab"
+    up = "up"
+
+
+class KeyCode:
+    """Character key, compatible with ``pynput.keyboard.KeyCode``."""
+
+    __slots__ = ("char", "vk")
+
+    def __init__(self, vk=None, char=None):
+        self.vk = vk
+        self.char = char
+
+    @classmethod
+    def from_char(cls, char):
+        return cls(char=char)
+
+    def __eq__(self, other):
+        return isinstance(other, KeyCode) and other.char == self.char and other.vk == self.vk
+
+    def __hash__(self):
+        return hash((self.vk, self.char))
+
+    def __repr__(self):
+        return f"KeyCode(char={self.char!r})"
+
+
+class Screen:
+    """The text of the focused application, edited by real and synthetic keys.
+
+    Lets a benchmark compare what two replays of the same stream leave
+    behind. Only single-line editing is modelled: characters, backspace,
+    left/right, home/end and enter.
+    """
+
+    def __init__(self):
+        self._before = []  # Characters before the cursor
+        self._after = []  # Characters after the cursor, nearest last
+
+    def key(self, key):
+        """Apply one key press."""
+        if isinstance(key, KeyCode):
+            if key.char is not None:
+                self._before.append(key.char)
+        elif key is Key.space:
+            self._before.append(" ")
+        elif key is Key.enter:
+            self._before.append("\n")
+        elif key is Key.backspace:
+            if self._before:
+                self._before.pop()
+        elif key is Key.left:
+            if self._before:
+                self._after.append(self._before.pop())
+        elif key is Key.right:
+            if self._after:
+                self._before.append(self._after.pop())
+        elif key is Key.home:
+            while self._before and self._before[-1] != "\n":
+                self._after.append(self._before.pop())
+        elif key is Key.end:
+            while self._after and self._after[-1] != "\n":
+                self._before.append(self._after.pop())
+
+    @property
+    def text(self):
+        """The whole text; the cursor position is not included."""
+        return "".join(self._before) + "".join(reversed(self._after))
+
+
+class Controller:
+    """Records synthetic output instead of sending it to the OS.
+
+    Like a real desktop, every synthetic event is echoed straight back to the
+    running ``Listener`` (within the replay, so outside the timed region),
+    and applied to :attr:`screen`.
+    """
+
+    # Shared across instances: the processor may create one per injection
+    events = []
+    screen = Screen()
+
+    def press(self, key):
+        Controller.events.append(("press", key))
+        Controller.screen.key(key)
+        Listener.echo("on_press", key)
+
+    def release(self, key):
+        Controller.events.append(("release", key))
+        Listener.echo("on_release", key)
+
+    def type(self, text):
+        Controller.events.append(("type", text))
+        for char in text:
+            key = KeyCode.from_char(char)
+            Controller.screen.key(key)
+            Listener.echo("on_press", key)
+            Listener.echo("on_release", key)
+
+    @classmethod
+    def reset(cls):
+        cls.events = []
+        cls.screen = Screen()
+
+    @classmethod
+    def counts(cls):
+        """Summarize recorded output."""
+        backspaces = sum(1 for kind, key in cls.events if kind == "press" and key is Key.backspace)
+        cursor_moves = sum(
+            1 for kind, key in cls.events
+            if kind == "press" and key in (Key.left, Key.right)
+        )
+        typed_chars = sum(len(text) for kind, text in cls.events if kind == "type")
+        return {
+            "backspaces": backspaces,
+            "cursor_moves": cursor_moves,
+            "typed_chars": typed_chars,
+        }
+
+
+class Listener:
+    """Keeps the callbacks so the benchmark can feed events directly."""
+
+    # The started listener that receives echoes of synthetic output
+    active = None
+
+    def __init__(self, on_press=None, on_release=None, **kwargs):
+        self.on_press = on_press
+        self.on_release = on_release
+        self.running = False
+
+    def start(self):
+        self.running = True
+        Listener.active = self
+
+    def stop(self):
+        self.running = False
+        if Listener.active is self:
+            Listener.active = None
+
+    @classmethod
+    def echo(cls, callback, key):
+        listener = cls.active
+        if listener is not None and getattr(listener, callback) is not None:
+            getattr(listener, callback)(key)
+
+    def join(self, timeout=None):
+        pass
+
+
+class ReplayClock:
+    """Replacement for the ``time`` module inside the processor.
+
+    ``monotonic()``/``time()`` return the timestamp of the event being
+    replayed, so timeouts behave exactly as in the recording, and ``sleep()``
+    returns immediately (adding to ``slept``). Everything else falls through
+    to the real module.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+
+    # Hot-path timers are bound directly; __getattr__ would skew the latencies
+    perf_counter = staticmethod(_real_time.perf_counter)
+    perf_counter_ns = staticmethod(_real_time.perf_counter_ns)
+
+    def __getattr__(self, name):
+        return getattr(_real_time, name)
+
+
+class ReplayInjector:
+    """Stand-in for ``TextInjector`` that runs the output worker in replay time.
+
+    A submitted action starts once the replay clock reaches the moment the
+    worker would be free, and keeps it busy for as long as it sleeps. The
+    benchmark calls :meth:`run_due` between key presses (outside the timed
+    region), so whether actions coalesce depends only on the stream, not on
+    how fast the machine running the benchmark is.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.busy_until = 0.0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._queue = deque()
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=None):
+        self.run_due(float("inf"))
+
+    def submit(self, action, *args):
+        self._queue.append((self.clock.now, action, args))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, len(self._queue))
+        return True
+
+    def run_due(self, now):
+        """Run every action the worker would have started by ``now``."""
+        clock = self.clock
+        saved = clock.now
+        while self._queue and max(self._queue[0][0], self.busy_until) <= now:
+            submitted_at, action, args = self._queue.popleft()
+            clock.now = max(submitted_at, self.busy_until)
+            clock.slept = 0.0
+            try:
+                action(*args)
+                self.completed += 1
+            except Exception:
+                self.failed += 1
+            self.busy_until = clock.now + clock.slept
+        clock.now = saved
+
+    def depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+def install():
+    """Register the fake ``pynput`` package in ``sys.modules``."""
+    if "nicetype.core.processor" in sys.modules:
+        raise RuntimeError("fakes.install() must run before importing nicetype.core.processor")
+
+    keyboard = types.ModuleType("pynput.keyboard")
+    keyboard.Key = Key
+    keyboard.KeyCode = KeyCode
+    keyboard.Controller = Controller
+    keyboard.Listener = Listener
+
+    package = types.ModuleType("pynput")
+    package.keyboard = keyboard
+    package.__path__ = []
+
+    sys.modules["pynput"] = package
+    sys.modules["pynput.keyboard"] = keyboard
+    return keyboard
@@ -0,0 +1,177 @@
+"""Key streams for the processor benchmarks.
+
+A stream is a list of ``(timestamp, action, token)`` tuples where ``action``
+is ``"press"`` or ``"release"`` and ``token`` is either a single character
+or a special key name prefixed with ``Key.`` (e.g. ``"Key.backspace"``).
+
+Recorded streams are stored as JSON lines with the same fields::
+
+    {"t": 0.000, "action": "press", "key": "n"}
+    {"t": 0.031, "action": "release", "key": "n"}
+    {"t": 0.118, "action": "press", "key": "Key.backspace"}
+"""
+
+import json
+import random
+from typing import List, Tuple
+
+Event = Tuple[float, str, str]
+
+_ENGLISH_WORDS = (
+    "the", "input", "method", "config", "release", "python", "window", "build",
+    "server", "request", "latency", "merge", "review", "commit", "branch", "test",
+    "deploy", "cache", "thread", "queue", "github", "linux", "ok", "bug", "fix",
+)
+_HANZI = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动"
+    "同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自"
+)
+_SENTENCE_PUNCTUATION = "，。；：？！"
+_OPENERS = "(（【《“'\"["
+
+
+def _word(rng: random.Random) -> str:
+    """Pick an English word or a short run of hanzi."""
+    if rng.random() < 0.45:
+        return rng.choice(_ENGLISH_WORDS)
+    return "".join(rng.choice(_HANZI) for _ in range(rng.randint(1, 4)))
+
+
+def _tokens(rng: random.Random, count: int) -> List[str]:
+    """Generate ``count`` key tokens of mixed Chinese/English typing."""
+    tokens: List[str] = []
+    while len(tokens) < count:
+        tokens.extend(_word(rng))
+
+        roll = rng.random()
+        if roll < 0.10:
+            # Doubled punctuation: the conversion rules fire on these
+            mark = rng.choice(_SENTENCE_PUNCTUATION)
+            tokens.extend((mark, mark))
+        elif roll < 0.30:
+            tokens.append(rng.choice(_SENTENCE_PUNCTUATION))
+        elif roll < 0.38:
+            opener = rng.choice(_OPENERS)
+            tokens.append(opener)
+            tokens.extend(_word(rng))
+            tokens.append("Key.right")
+        elif roll < 0.45:
+            tokens.extend(["Key.backspace"] * rng.randint(1, 3))
+        elif roll < 0.47:
+            tokens.append(rng.choice(("Key.left", "Key.enter", "Key.home")))
+        elif roll < 0.55:
+            tokens.append("Key.shift")
+
+        if rng.random() < 0.5:
+            tokens.append(" ")
+    return tokens[:count]
+
+
+def _prose_tokens(rng: random.Random, count: int) -> List[str]:
+    """Generate ``count`` key tokens of ordinary English typing (letters, digits, spaces)."""
+    tokens: List[str] = []
+    while len(tokens) < count:
+        word = rng.choice(_ENGLISH_WORDS)
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        elif rng.random() < 0.05:
+            word = str(rng.randint(0, 2024))
+        tokens.extend(word)
+        if rng.random() < 0.05:
+            tokens.append("Key.backspace")
+        tokens.append(" ")
+    return tokens[:count]
+
+
+def synthetic_stream(count: int = 20000, seed: int = 1234,
+                     interval: float = 0.12, burst_interval: float = 0.035,
+                     prose: bool = False) -> List[Event]:
+    """Build a reproducible stream of ``count`` key presses (plus releases).
+
+    Inter-key gaps follow a log-normal distribution around ``interval``
+    seconds, with occasional fast bursts around ``burst_interval``. With
+    ``prose`` the stream is ordinary English typing that no default rule or
+    completion reacts to.
+    """
+    rng = random.Random(seed)
+    events: List[Event] = []
+    now = 0.0
+    burst_left = 0
+    tokens = _prose_tokens(rng, count) if prose else _tokens(rng, count)
+    for token in tokens:
+        if burst_left == 0 and rng.random() < 0.02:
+            burst_left = rng.randint(10, 40)
+        mean = burst_interval if burst_left else interval
+        if burst_left:
+            burst_left -= 1
+        now += rng.lognormvariate(0.0, 0.35) * mean
+        if rng.random() < 0.005:
+            # Thinking pause: longer than the conversion timeout
+            now += rng.uniform(1.0, 3.0)
+        events.append((now, "press", token))
+        events.append((now + mean * 0.4, "release", token))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def burst_stream(count: int = 4000, seed: int = 1234, interval: float = 0.12,
+                 burst_interval: float = 0.004) -> List[Event]:
+    """Build a reproducible stream whose triggers come in fast bursts.
+
+    Words are typed at ordinary speed; in between, runs of openers, doubled
+    punctuation and hanzi (with the odd backspace) follow each other every
+    few milliseconds, faster than the output worker can type one edit. So
+    several triggers land in a single pending edit, which exercises the
+    coalescing path. Cursor movement only happens at ordinary speed, once
+    the pending edits have been typed.
+    """
+    rng = random.Random(seed)
+    timed: List[Tuple[str, float]] = []
+    while len(timed) < count:
+        for char in _word(rng):
+            timed.append((char, interval))
+        timed.append((" ", interval))
+        if rng.random() < 0.2:
+            timed.append(("Key.right", interval))
+        for _ in range(rng.randint(2, 6)):
+            roll = rng.random()
+            if roll < 0.35:
+                tokens = [rng.choice(_OPENERS)]
+            elif roll < 0.7:
+                mark = rng.choice(_SENTENCE_PUNCTUATION)
+                tokens = [mark, mark]
+            elif roll < 0.9:
+                tokens = [rng.choice(_HANZI)]
+            else:
+                tokens = ["Key.backspace"]
+            timed.extend((token, burst_interval) for token in tokens)
+    events: List[Event] = []
+    now = 0.0
+    for token, mean in timed[:count]:
+        now += rng.lognormvariate(0.0, 0.25) * mean
+        events.append((now, "press", token))
+        events.append((now + mean * 0.4, "release", token))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def load_stream(path: str) -> List[Event]:
+    """Load a recorded stream from a JSON lines file."""
+    events: List[Event] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            events.append((float(record["t"]), record.get("action", "press"), record["key"]))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def save_stream(events: List[Event], path: str):
+    """Write a stream as JSON lines."""
+    with open(path, "w", encoding="utf-8") as f:
+        for timestamp, action, token in events:
+            f.write(json.dumps({"t": round(timestamp, 6), "action": action, "key": token},
+                               ensure_ascii=False) + "\n")
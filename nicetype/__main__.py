@@ -1,6 +1,8 @@
 """Main module entry point for NiceType."""
 
+import sys
+
 from .main import main
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -1,21 +1,124 @@
 """Configuration manager for NiceType."""
 
+import copy
+import itertools
 import json
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Callable, Dict, Any, FrozenSet, List, Optional, Sequence
+from ..core.backends import RuleCache, compile_rules
+from ..core.rules import RuleEngine
+from .persistence import ConfigWriter
+from .rulecache import CompiledRuleStore, rules_key
+from .snapshot import ConfigSnapshot
+
+# Settings that change how the punctuation rules are compiled
+_RULE_KEYS = frozenset({"punctuation_mapping", "case_sensitive", "rule_backend", "profiles"})
+# Settings a per-application profile may override
+PROFILE_KEYS = frozenset({
+    "enabled",
+    "punctuation_conversion_enabled",
+    "auto_complete_enabled",
+    "case_sensitive",
+    "rule_backend",
+    "punctuation_mapping",
+    "auto_complete_pairs",
+})
+
+
+# Called with the new snapshot and the names of the settings that changed
+Subscriber = Callable[[ConfigSnapshot, FrozenSet[str]], None]
+
+# How the types of the defaults are called in error messages (JSON terms)
+_TYPE_NAMES = {bool: "true or false", int: "a whole number", float: "a number", str: "a string", dict: "an object"}
+# Settings mapping strings to strings
+_STRING_MAPS = ("punctuation_mapping", "auto_complete_pairs")
+
+
+def _check_settings(config: Dict[str, Any], defaults: Dict[str, Any]) -> Optional[str]:
+    """Return what is wrong with the values of ``config``, or None if they can be used."""
+    for key, default in defaults.items():
+        if key not in config:
+            continue
+        value = config[key]
+        if isinstance(default, bool):
+            valid = isinstance(value, bool)
+        elif isinstance(default, (int, float)):
+            # Counts must be whole; delays may be given as whole numbers
+            kinds = int if isinstance(default, int) else (int, float)
+            valid = isinstance(value, kinds) and not isinstance(value, bool) and value >= 0
+        else:
+            valid = isinstance(value, type(default))
+        if not valid:
+            return f"'{key}' must be {_TYPE_NAMES[type(default)]}, got {json.dumps(value, default=repr)}"
+    for key in _STRING_MAPS:
+        mapping = config.get(key, {})
+        # Type sets instead of a loop: rule sets can have tens of thousands of entries
+        if not set(map(type, mapping)) <= {str} or not set(map(type, mapping.values())) <= {str}:
+            return f"'{key}' must map strings to strings"
+    return None
+
+
+def _clean_profiles(profiles: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Return the usable profiles, reporting and skipping malformed ones."""
+    cleaned = {}
+    for name, overrides in profiles.items():
+        if not isinstance(overrides, dict):
+            problem = "must be an object"
+        elif not isinstance(overrides.get("match", []), list) \
+                or not all(isinstance(pattern, str) for pattern in overrides.get("match", [])):
+            problem = "'match' must be a list of window classes"
+        else:
+            problem = _check_settings({key: value for key, value in overrides.items() if key in PROFILE_KEYS},
+                                      defaults)
+        if problem is not None:
+            print(f"Skipping profile '{name}': {problem}")
+            continue
+        cleaned[name] = overrides
+    return cleaned
+
+
+def _profile_settings(config: Dict[str, Any], profile: Optional[str]) -> Dict[str, Any]:
+    """Return ``config`` with the overrides of ``profile`` applied."""
+    overrides = config.get("profiles", {}).get(profile) if profile else None
+    if not overrides:
+        return config
+    settings = dict(config)
+    settings.update((key, value) for key, value in overrides.items() if key in PROFILE_KEYS)
+    return settings
 
 
 class ConfigManager:
-    """Manages configuration settings for NiceType."""
+    """Manages configuration settings for NiceType.
+    
+    The settings dict is copy-on-write: writers (tray, settings window,
+    config watcher, focus tracker) are serialized by a lock, build a new dict
+    and publish it together with a new snapshot. A published dict is never
+    modified again, so readers on any thread just load the current one and
+    never take a lock.
+    """
     
-    def __init__(self):
-        """Initialize the configuration manager."""
-        self.config_dir = Path.home() / ".nicetype"
+    def __init__(self, config_dir: Optional[Path] = None):
+        """Initialize the configuration manager (in ``~/.nicetype`` unless ``config_dir`` is given)."""
+        self.config_dir = Path(config_dir) if config_dir is not None else Path.home() / ".nicetype"
         self.config_file = self.config_dir / "config.json"
+        self._writer = ConfigWriter(self.config_file)
         self._config = self._load_default_config()
+        # Bumped whenever the rule inputs change; never reused, so rules compiled
+        # for a change that was then rejected can't pass for current ones
+        self._revisions = itertools.count(1)
+        self._rules_revision = 0
+        self._rule_cache = RuleCache(self._config["rule_cache_size"])
+        self._rule_store = CompiledRuleStore(self.config_dir / "rules.cache")
+        self._write_lock = threading.RLock()
+        self._subscribers: List[Subscriber] = []
+        self.active_profile: Optional[str] = None  # Set by the focus tracker
+        self.snapshot: Optional[ConfigSnapshot] = None  # Published by _publish()
         self._ensure_config_dir()
         self.load()
+        if self.snapshot is None:
+            self._publish()
     
     def _load_default_config(self) -> Dict[str, Any]:
         """Load default configuration."""
@@ -45,8 +148,106 @@ class ConfigManager:
             "punctuation_conversion_enabled": True,
             "auto_complete_enabled": True,
             "case_sensitive": False,
+            "rule_backend": "auto",  # auto, translate, regex or automaton
+            "history_capacity": 64,  # Keystrokes remembered for matching and backspace
+            "injection_pacing": 0.005,  # Seconds between synthetic key events
+            "injection_settle": 0.02,  # Seconds to wait for the echo of injected keys
+            "injection_queue_size": 64,  # Max pending injection actions
+            "injection_drop_policy": "drop_newest",  # drop_newest, drop_oldest or block
+            "watch_config": True,  # Reload config.json automatically when it changes
+            "profiles": {},  # Per-application overrides, selected by window class
+            "rule_cache_size": 8,  # Compiled rule sets kept for quick profile switches
+            "compiled_rule_cache": True,  # Keep the compiled rules in ~/.nicetype/rules.cache
         }
     
+    def reset_to_defaults(self):
+        """Reset all settings to defaults."""
+        self._replace(self._load_default_config())
+    
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Call ``callback(snapshot, changed_keys)`` after every published change.
+        
+        Callbacks run on the writing thread while writers are held off, so
+        they see changes in order and must be quick. ``changed_keys`` is empty
+        when only the active profile switched. Returns a function that
+        unsubscribes again.
+        """
+        with self._write_lock:
+            self._subscribers = self._subscribers + [callback]
+        
+        def unsubscribe():
+            with self._write_lock:
+                self._subscribers = [subscriber for subscriber in self._subscribers
+                                     if subscriber is not callback]
+        return unsubscribe
+    
+    def _update(self, changes: Dict[str, Any]):
+        """Publish a copy of the settings with ``changes`` applied."""
+        with self._write_lock:
+            new_config = dict(self._config)
+            new_config.update(changes)
+            self._replace(new_config)
+    
+    def _replace(self, new_config: Dict[str, Any]) -> bool:
+        """Publish ``new_config`` as the current settings; return True if anything changed.
+        
+        The new settings are checked and their snapshot (with the compiled
+        rules) is built before anything is replaced, so settings and snapshot
+        always agree. Invalid settings are reported and change nothing;
+        malformed profiles are reported and left out.
+        """
+        defaults = self._load_default_config()
+        profiles = new_config.get("profiles")
+        if isinstance(profiles, dict) and profiles is not self._config.get("profiles"):
+            cleaned = _clean_profiles(profiles, defaults)
+            if len(cleaned) != len(profiles):
+                new_config = dict(new_config, profiles=cleaned)
+        with self._write_lock:
+            old_config = self._config
+            changed = frozenset(key for key in new_config.keys() | old_config.keys()
+                                if new_config.get(key) != old_config.get(key))
+            if not changed:
+                return False
+            problem = _check_settings(new_config, defaults)
+            revision = next(self._revisions) if changed & _RULE_KEYS else self._rules_revision
+            if problem is None:
+                try:
+                    snapshot = self._build_snapshot(new_config, revision, self.active_profile)
+                except Exception as e:
+                    problem = f"{type(e).__name__}: {e}"
+            if problem is not None:
+                print(f"Error in settings: {problem}. Keeping current settings.")
+                return False
+            if "rule_cache_size" in changed:
+                self._rule_cache.resize(new_config["rule_cache_size"])
+            self._config = new_config
+            self._rules_revision = revision
+            self._publish(changed, snapshot)
+            return True
+    
+    def _build_snapshot(self, config: Dict[str, Any], revision: int, profile: Optional[str]) -> ConfigSnapshot:
+        """Compile the rules of ``config`` and freeze it with ``profile`` applied."""
+        version = self.snapshot.version + 1 if self.snapshot is not None else 1
+        return ConfigSnapshot(version, _profile_settings(config, profile),
+                              self._compile_rules(config, revision, profile), profile)
+    
+    def _publish(self, changed: FrozenSet[str] = frozenset(), snapshot: Optional[ConfigSnapshot] = None):
+        """Make a new immutable snapshot visible and notify subscribers.
+        
+        Rules are compiled while building the snapshot, on the thread that
+        changed the settings or switched the profile, never on the keyboard
+        listener thread.
+        """
+        with self._write_lock:
+            if snapshot is None:
+                snapshot = self._build_snapshot(self._config, self._rules_revision, self.active_profile)
+            self.snapshot = snapshot
+            for subscriber in self._subscribers:
+                try:
+                    subscriber(snapshot, changed)
+                except Exception as e:
+                    print(f"Error in config subscriber: {e}")
+    
     def _ensure_config_dir(self):
         """Ensure configuration directory exists."""
         self.config_dir.mkdir(exist_ok=True)
@@ -57,42 +258,163 @@ class ConfigManager:
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     file_config = json.load(f)
-                    # Merge with defaults to ensure all keys exist
-                    self._config.update(file_config)
+                # Merge with defaults to ensure all keys exist
+                self._update(file_config)
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Error loading config: {e}. Using defaults.")
     
-    def save(self):
-        """Save configuration to file."""
+    def reload(self) -> bool:
+        """Re-read the configuration file and apply what changed.
+        
+        Settings missing from the file fall back to their defaults. The rule
+        engine is only recompiled if its inputs changed. Returns True if a new
+        snapshot was published.
+        """
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self._config, f, indent=2, ensure_ascii=False)
-        except IOError as e:
-            print(f"Error saving config: {e}")
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                file_config = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            # Often a half-written file; the next change event will retry
+            print(f"Error reloading config: {e}. Keeping current settings.")
+            return False
+        if not isinstance(file_config, dict):
+            print("Error reloading config: top level must be an object. Keeping current settings.")
+            return False
+        
+        new_config = self._load_default_config()
+        new_config.update(file_config)
+        return self._replace(new_config)
+    
+    def save(self):
+        """Save configuration to file.
+        
+        Returns immediately; the file is written atomically on a background
+        thread, and saves in quick succession are coalesced into one write.
+        """
+        # Published settings are never modified, so no copy is needed
+        self._writer.request(self._config)
+    
+    def flush(self):
+        """Block until every requested save has reached the disk."""
+        self._writer.flush()
+    
+    def file_is_own_save(self) -> bool:
+        """Return True if the config file is exactly the version this process last saved."""
+        return self._writer.wrote_current()
     
     def get(self, key: str, default=None):
-        """Get configuration value."""
-        return self._config.get(key, default)
+        """Get configuration value (containers are returned as copies)."""
+        value = self._config.get(key, default)
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
     
     def set(self, key: str, value: Any):
         """Set configuration value."""
-        self._config[key] = value
+        if isinstance(value, (dict, list)):
+            # The caller may keep editing its object; published settings must not change
+            value = copy.deepcopy(value)
+        self._update({key: value})
+    
+    def update(self, changes: Dict[str, Any]):
+        """Set several configuration values as one change."""
+        self._update({key: copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+                      for key, value in changes.items()})
     
     def get_punctuation_mapping(self) -> Dict[str, str]:
         """Get punctuation mapping configuration."""
-        return self._config.get("punctuation_mapping", {})
+        return dict(self._config.get("punctuation_mapping", {}))
     
     def set_punctuation_mapping(self, mapping: Dict[str, str]):
         """Set punctuation mapping configuration."""
-        self._config["punctuation_mapping"] = mapping
+        self._update({"punctuation_mapping": dict(mapping)})
+    
+    def get_compiled_rules(self, profile: Optional[str] = None) -> RuleEngine:
+        """Get the punctuation mapping of ``profile`` compiled with the best rule backend.
+        
+        Compiled rule sets are kept in a bounded LRU cache and rebuilt only
+        after the mapping, case sensitivity, ``rule_backend`` or profiles
+        change. Profiles that don't override any of these share the global
+        rule set. The global rule set is also kept on disk, so a start with
+        unchanged rules loads it instead of compiling it again.
+        """
+        return self._compile_rules(self._config, self._rules_revision, profile)
+    
+    def _compile_rules(self, config: Dict[str, Any], revision: int, profile: Optional[str]) -> RuleEngine:
+        """Return the compiled rules of ``profile`` in ``config``, whose rule revision is ``revision``.
+        
+        Rules missing from both caches are compiled on the calling thread, as
+        the snapshot being built needs them; the disk store is written later
+        on its own thread.
+        """
+        overrides = config.get("profiles", {}).get(profile) if profile else None
+        if not overrides or not _RULE_KEYS.intersection(overrides):
+            profile = None
+        key = (profile, revision)
+        rules = self._rule_cache.get(key)
+        if rules is None:
+            settings = _profile_settings(config, profile)
+            mapping = settings.get("punctuation_mapping", {})
+            case_sensitive = settings.get("case_sensitive", False)
+            backend = settings.get("rule_backend", "auto")
+            disk_key = None
+            if profile is None and config.get("compiled_rule_cache", True):
+                disk_key = rules_key(mapping, case_sensitive, backend)
+                rules = self._rule_store.load(disk_key)
+            if rules is None:
+                rules = compile_rules(mapping, case_sensitive=case_sensitive, backend=backend)
+                if disk_key is not None:
+                    self._rule_store.save(disk_key, rules)
+            self._rule_cache.put(key, rules)
+            self._rule_cache.discard_older(revision)
+        return rules
+    
+    def get_profiles(self) -> Dict[str, Dict[str, Any]]:
+        """Get the per-application profiles (read-only)."""
+        return self._config.get("profiles", {})
+    
+    def get_profile_settings(self, profile: Optional[str] = None) -> Dict[str, Any]:
+        """Return the settings with the overrides of ``profile`` applied."""
+        return _profile_settings(self._config, profile)
+    
+    def profile_for_window(self, window_class: Sequence[str]) -> Optional[str]:
+        """Return the first profile whose ``match`` list names the window class.
+        
+        ``window_class`` holds the names identifying the focused window (for
+        X11 the instance and class of ``WM_CLASS``); comparison ignores case.
+        """
+        names = {name.casefold() for name in window_class if name}
+        for profile, overrides in self.get_profiles().items():
+            if any(str(pattern).casefold() in names for pattern in overrides.get("match", ())):
+                return profile
+        return None
+    
+    def activate_profile(self, profile: Optional[str]) -> bool:
+        """Switch to ``profile`` (None for the global settings).
+        
+        Called by the focus tracker; the rule set is compiled (or taken from
+        the cache) on the calling thread before the new snapshot is
+        published. Returns True if the active profile changed.
+        """
+        with self._write_lock:
+            if profile == self.active_profile:
+                return False
+            self.active_profile = profile
+            self._publish()
+            return True
+    
+    def warm_profiles(self):
+        """Compile the rule sets of the profiles ahead of their first use."""
+        for profile in list(self.get_profiles())[:self._rule_cache.maxsize]:
+            self.get_compiled_rules(profile)
     
     def get_auto_complete_pairs(self) -> Dict[str, str]:
         """Get auto-complete pairs configuration."""
-        return self._config.get("auto_complete_pairs", {})
+        return dict(self._config.get("auto_complete_pairs", {}))
     
     def set_auto_complete_pairs(self, pairs: Dict[str, str]):
         """Set auto-complete pairs configuration."""
-        self._config["auto_complete_pairs"] = pairs
+        self._update({"auto_complete_pairs": dict(pairs)})
     
     def is_enabled(self) -> bool:
         """Check if NiceType is enabled."""
@@ -100,7 +422,7 @@ class ConfigManager:
     
     def set_enabled(self, enabled: bool):
         """Set enabled state."""
-        self._config["enabled"] = enabled
+        self._update({"enabled": enabled})
     
     def is_punctuation_conversion_enabled(self) -> bool:
         """Check if punctuation conversion is enabled."""
@@ -108,7 +430,7 @@ class ConfigManager:
     
     def set_punctuation_conversion_enabled(self, enabled: bool):
         """Set punctuation conversion enabled state."""
-        self._config["punctuation_conversion_enabled"] = enabled
+        self._update({"punctuation_conversion_enabled": enabled})
     
     def is_auto_complete_enabled(self) -> bool:
         """Check if auto-complete is enabled."""
@@ -116,8 +438,25 @@ class ConfigManager:
     
     def set_auto_complete_enabled(self, enabled: bool):
         """Set auto-complete enabled state."""
-        self._config["auto_complete_enabled"] = enabled
+        self._update({"auto_complete_enabled": enabled})
+
+
+_config: Optional[ConfigManager] = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> ConfigManager:
+    """Get the global configuration instance, loading it on first use."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = ConfigManager()
+    return _config
 
 
-# Global configuration instance
-config = ConfigManager()
\ No newline at end of file
+def __getattr__(name):
+    """Create the global ``config`` lazily so importing this module has no side effects."""
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
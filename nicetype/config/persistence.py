@@ -0,0 +1,170 @@
+"""Crash-safe configuration persistence for NiceType."""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional, Tuple
+
+# What identifies one version of a file: modification time, size and inode
+FileSignature = Tuple[int, int, int]
+
+
+@contextmanager
+def atomic_writer(path: Path, encoding: str = "utf-8", newline: Optional[str] = None,
+                  binary: bool = False) -> Iterator[IO]:
+    """Open a text (or ``binary``) file that replaces ``path`` only when the block succeeds.
+
+    The data goes to a temporary file in the same directory, is fsynced, and
+    is then renamed over the target, so readers see either the old or the new
+    file. A crash mid-write leaves at worst a stray temporary file, never a
+    truncated one. The permissions of an existing target are kept.
+    """
+    import tempfile  # Only needed once something is saved
+
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        f = os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", encoding=encoding, newline=newline)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_name, os.stat(str(path)).st_mode & 0o7777)
+        except OSError:
+            pass  # New file: keep mkstemp's private mode
+        os.replace(tmp_name, str(path))
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+    # Make the rename itself durable
+    if hasattr(os, "O_DIRECTORY"):
+        try:
+            dir_fd = os.open(str(path.parent), os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+
+def _signature(stat: os.stat_result) -> FileSignature:
+    """Return the signature of the file ``stat`` describes."""
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def file_signature(path: Path) -> Optional[FileSignature]:
+    """Return the signature of the current version of ``path`` (None if it is missing)."""
+    try:
+        return _signature(os.stat(str(path)))
+    except OSError:
+        return None
+
+
+def write_atomic(path: Path, text: str):
+    """Replace ``path`` with ``text`` so readers see either the old or new file."""
+    with atomic_writer(path) as f:
+        f.write(text)
+
+
+class ConfigWriter:
+    """Writes the configuration on a background thread.
+
+    :meth:`request` returns immediately. Requests arriving within ``delay``
+    seconds of each other are coalesced into a single write of the newest
+    data. :meth:`flush` writes anything pending synchronously; it is
+    registered with ``atexit`` so no change is lost on a normal exit.
+    """
+
+    def __init__(self, path: Path, delay: float = 0.3):
+        """Initialize the writer for ``path``."""
+        self.path = Path(path)
+        self.delay = delay
+        self.requests = 0
+        self.writes = 0
+        # Signature of the last version written here, so watchers can skip it
+        self.last_signature: Optional[FileSignature] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._cond = threading.Condition()
+        # Held while taking and writing data, so writes happen in request order
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, data: Dict[str, Any]):
+        """Schedule ``data`` to be written."""
+        with self._cond:
+            self._pending = data
+            self.requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="NiceTypeConfigWriter", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            self._cond.notify()
+
+    def flush(self):
+        """Write pending data now and wait for any write in progress."""
+        self._write_pending()
+
+    def wrote_current(self) -> bool:
+        """Return True if the file on disk is the version this writer last wrote."""
+        return self.last_signature is not None and file_signature(self.path) == self.last_signature
+
+    def _take_pending(self) -> Optional[Dict[str, Any]]:
+        """Remove and return the newest unwritten data."""
+        with self._cond:
+            data = self._pending
+            self._pending = None
+            return data
+
+    def _write_pending(self):
+        """Write the newest pending data, if any."""
+        with self._write_lock:
+            data = self._take_pending()
+            if data is not None:
+                self._write(data)
+
+    def _write(self, data: Dict[str, Any]):
+        """Serialize and atomically write one version of the config."""
+        for _ in range(3):
+            try:
+                text = json.dumps(data, indent=2, ensure_ascii=False)
+                break
+            except RuntimeError:
+                # A nested dict was being edited while we serialized; try again
+                time.sleep(0.01)
+        else:
+            print("Error saving config: settings kept changing during save")
+            return
+
+        try:
+            with atomic_writer(self.path) as f:
+                f.write(text)
+                f.flush()
+                # Taken from our own file, so a foreign write right after the
+                # rename is never mistaken for it
+                signature = _signature(os.fstat(f.fileno()))
+            self.last_signature = signature
+            self.writes += 1
+        except OSError as e:
+            print(f"Error saving config: {e}")
+
+    def _run(self):
+        """Writer loop."""
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+            # Let a burst of toggles/edits settle into one write
+            time.sleep(self.delay)
+            self._write_pending()
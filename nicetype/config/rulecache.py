@@ -0,0 +1,100 @@
+"""On-disk cache of the compiled punctuation rules."""
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.backends import BACKENDS, ENGINE_VERSION
+from .persistence import ConfigWriter, atomic_writer
+
+# Identifies the file layout; the key after it identifies the rules. Layout 1
+# was a pickle and is never read: unpickling runs code chosen by the file
+_MAGIC = "NICETYPE-RULES 2 "
+
+
+def rules_key(mapping: Dict[str, str], case_sensitive: bool, backend: str) -> str:
+    """Return a content hash of everything the compiled rules depend on.
+
+    Includes the engine version and the Python version (case variants come
+    from the Unicode tables of the interpreter), so a cache written by
+    another version is never used.
+    """
+    # Rule order matters (the first of two colliding patterns wins), so the
+    # items are hashed as a list
+    data = [ENGINE_VERSION, list(sys.version_info[:2]), bool(case_sensitive), backend, list(mapping.items())]
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+class RuleCacheWriter(ConfigWriter):
+    """Serializes compiled rules to disk on a background thread.
+
+    Same coalescing as the config writer: a burst of rule edits ends in a
+    single write of the newest rule set.
+    """
+
+    def _write(self, data: Tuple[str, Any]):
+        """Atomically write one compiled rule set under its key."""
+        key, rules = data
+        try:
+            # Fixed line ends keep the key line byte-identical on every platform
+            with atomic_writer(self.path, newline="\n") as f:
+                f.write(_MAGIC + key + "\n")
+                # json.dump encodes in small pieces (unlike the one C call of
+                # json.dumps), so the listener thread keeps running meanwhile
+                json.dump({"backend": rules.name, "tables": rules.to_data()}, f,
+                          ensure_ascii=False, separators=(",", ":"))
+            self.writes += 1
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving compiled rules: {e}")
+
+
+class CompiledRuleStore:
+    """The compiled global rule set, kept in ``~/.nicetype/rules.cache``.
+
+    The file starts with a line naming its :func:`rules_key`, so a stale
+    cache is recognised from that line alone. The rest holds the tables of
+    the backend as JSON; they are only ever parsed as data and are checked
+    while the backend is rebuilt. Loading a current cache skips compiling
+    the rules and timing the backends at startup. On a stale, corrupt or
+    missing one the caller compiles the rules itself, since it needs them
+    at once, and only writing the replacement happens in the background.
+    The file lives in the user's private config directory next to
+    ``config.json``, which it is derived from.
+    """
+
+    def __init__(self, path: Path):
+        """Initialize the store for ``path``."""
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._writer = RuleCacheWriter(self.path)
+
+    def load(self, key: str):
+        """Return the rules cached under ``key``, or None if the cache is stale or unreadable."""
+        try:
+            with open(self.path, "rb") as f:
+                if f.readline(len(_MAGIC) + 80) != (_MAGIC + key + "\n").encode("ascii"):
+                    self.misses += 1
+                    return None
+                payload = json.loads(f.read())
+            rules = BACKENDS[payload["backend"]].from_data(payload["tables"])
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # Truncated by a crash, edited by hand, ...
+            print(f"Ignoring unreadable rule cache {self.path}: {e!r}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return rules
+
+    def save(self, key: str, rules):
+        """Write ``rules`` under ``key`` in the background."""
+        self._writer.request((key, rules))
+
+    def flush(self):
+        """Block until the newest rules have been written."""
+        self._writer.flush()
@@ -0,0 +1,244 @@
+"""Bulk import and export of punctuation rules and completion pairs."""
+
+import csv
+import json
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..core.rules import BREAKS
+
+PUNCTUATION = "punctuation"
+COMPLETION = "completion"
+KINDS = (PUNCTUATION, COMPLETION)
+FORMATS = ("csv", "tsv", "jsonl")
+
+# Config key holding each kind of rule
+_CONFIG_KEYS = {PUNCTUATION: "punctuation_mapping", COMPLETION: "auto_complete_pairs"}
+_EXTENSIONS = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+_HEADER = ("kind", "from", "to")
+# TSV fields are taken literally, so rules like '"' need no quoting
+_DIALECTS = {
+    "csv": {"delimiter": ","},
+    "tsv": {"delimiter": "\t", "quoting": csv.QUOTE_NONE, "quotechar": None},
+}
+# Conflicts and errors listed in a summary before "... and N more"
+_SHOWN_PROBLEMS = 10
+
+# (line number, kind, pattern, replacement)
+RuleRow = Tuple[int, str, str, str]
+
+
+def detect_format(path: Optional[str], default: str = "csv") -> str:
+    """Guess the file format from the extension of ``path``."""
+    if not path or path == "-":
+        return default
+    return _EXTENSIONS.get(Path(path).suffix.lower(), default)
+
+
+def _table_rows(stream: IO[str], fmt: str, kind: str, errors: List[str]) -> Iterator[RuleRow]:
+    """Parse CSV or TSV; the header row (kind,from,to) is optional."""
+    reader = csv.reader(stream, **_DIALECTS[fmt])
+    columns: Optional[Tuple[int, int, int]] = None  # Positions of kind, from, to
+    for record in reader:
+        line = reader.line_num
+        if not record or (len(record) == 1 and not record[0]):
+            continue
+        if columns is None:
+            names = [field.strip().lower() for field in record]
+            if "from" in names and "to" in names:
+                columns = (names.index("kind") if "kind" in names else -1, names.index("from"), names.index("to"))
+                continue
+            columns = (0, 1, 2) if len(record) >= 3 else (-1, 0, 1)
+        kind_column, from_column, to_column = columns
+        if len(record) <= max(columns):
+            errors.append(f"line {line}: expected {max(columns) + 1} columns, got {len(record)}")
+            continue
+        row_kind = record[kind_column].strip().lower() if kind_column >= 0 else kind
+        yield line, row_kind or kind, record[from_column], record[to_column]
+
+
+def _jsonl_rows(stream: IO[str], kind: str, errors: List[str]) -> Iterator[RuleRow]:
+    """Parse JSON lines of the form ``{"kind": ..., "from": ..., "to": ...}``."""
+    for line, text in enumerate(stream, 1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            record = json.loads(text)
+        except json.JSONDecodeError as e:
+            errors.append(f"line {line}: invalid JSON ({e.msg})")
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get("from"), str) \
+                or not isinstance(record.get("to"), str):
+            errors.append(f'line {line}: expected an object with string "from" and "to"')
+            continue
+        yield line, str(record.get("kind") or kind).lower(), record["from"], record["to"]
+
+
+def read_rules(stream: IO[str], fmt: str, kind: str = PUNCTUATION,
+               errors: Optional[List[str]] = None) -> Iterator[RuleRow]:
+    """Parse a rule file lazily, one record at a time.
+
+    Rows without a kind are of ``kind``. Malformed records are skipped and
+    described in ``errors``.
+    """
+    errors = errors if errors is not None else []
+    if fmt == "jsonl":
+        return _jsonl_rows(stream, kind, errors)
+    if fmt in ("csv", "tsv"):
+        return _table_rows(stream, fmt, kind, errors)
+    raise ValueError(f"unknown rule file format '{fmt}' (use one of {', '.join(FORMATS)})")
+
+
+def _check_row(kind: str, pattern: str, replacement: str) -> Optional[str]:
+    """Return why a rule can't be used, or None if it is valid."""
+    if kind not in KINDS:
+        return f"unknown kind '{kind}' (use {' or '.join(KINDS)})"
+    if not pattern or not replacement:
+        return "both 'from' and 'to' are required"
+    if kind == COMPLETION and (len(pattern) != 1 or len(replacement) != 1):
+        return "completion pairs must be exactly one character each"
+    if kind == PUNCTUATION and any(char in BREAKS for char in pattern):
+        return "patterns can't contain spaces, line breaks or tabs"
+    return None
+
+
+class ImportPlan:
+    """What importing a rule file would change, worked out in one pass.
+
+    Within the file, a repeated pattern with the same replacement is a
+    harmless duplicate; with a different one it is an error. A pattern that
+    already exists with another replacement is a conflict, resolved when the
+    plan is applied.
+    """
+
+    def __init__(self, current: Dict[str, Dict[str, str]], replace: bool):
+        """Start from the current rules of every kind."""
+        self.replace = replace
+        self.added = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.errors: List[str] = []
+        self.conflicts: List[Tuple[int, str, str, str, str]] = []  # line, kind, pattern, old, new
+        self.kinds_seen = set()
+        self._current = current
+        self._result = {kind: ({} if replace else dict(rules)) for kind, rules in current.items()}
+        self._seen: Dict[Tuple[str, str], Tuple[int, str]] = {}
+
+    def add(self, row: RuleRow):
+        """Account for one parsed row."""
+        line, kind, pattern, replacement = row
+        problem = _check_row(kind, pattern, replacement)
+        if problem is not None:
+            self.errors.append(f"line {line}: {problem}")
+            return
+        previous = self._seen.get((kind, pattern))
+        if previous is not None:
+            if previous[1] == replacement:
+                self.duplicates += 1
+            else:
+                self.errors.append(f"line {line}: '{pattern}' → '{replacement}' contradicts line {previous[0]} "
+                                   f"('{pattern}' → '{previous[1]}')")
+            return
+        self._seen[(kind, pattern)] = (line, replacement)
+        self.kinds_seen.add(kind)
+
+        existing = None if self.replace else self._current[kind].get(pattern)
+        if existing is None:
+            self.added += 1
+            self._result[kind][pattern] = replacement
+        elif existing == replacement:
+            self.unchanged += 1
+        else:
+            self.conflicts.append((line, kind, pattern, existing, replacement))
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the file had no errors."""
+        return not self.errors
+
+    def changes(self, overwrite: bool = False) -> Dict[str, Dict[str, str]]:
+        """Return the new config values (by config key) of the kinds that change."""
+        result = {kind: dict(rules) for kind, rules in self._result.items()}
+        if overwrite:
+            for _, kind, pattern, _, replacement in self.conflicts:
+                result[kind][pattern] = replacement
+        changes = {}
+        for kind, rules in result.items():
+            if self.replace and kind not in self.kinds_seen:
+                continue  # --replace only replaces the kinds present in the file
+            if rules != self._current[kind]:
+                changes[_CONFIG_KEYS[kind]] = rules
+        return changes
+
+    def summary(self, overwrite: Optional[bool] = None) -> str:
+        """Return a human readable report."""
+        lines = [f"{self.added} new, {self.unchanged} unchanged, {self.duplicates} duplicates in the file, "
+                 f"{len(self.conflicts)} conflicting with existing rules, {len(self.errors)} errors"]
+        if self.conflicts:
+            action = {None: "", True: " (imported value wins)", False: " (existing value kept)"}[overwrite]
+            lines.append(f"Conflicts{action}:")
+            for line, kind, pattern, old, new in self.conflicts[:_SHOWN_PROBLEMS]:
+                lines.append(f"  line {line}: {kind} '{pattern}' is '{old}', file says '{new}'")
+            if len(self.conflicts) > _SHOWN_PROBLEMS:
+                lines.append(f"  ... and {len(self.conflicts) - _SHOWN_PROBLEMS} more")
+        if self.errors:
+            lines.append("Errors:")
+            lines.extend(f"  {error}" for error in self.errors[:_SHOWN_PROBLEMS])
+            if len(self.errors) > _SHOWN_PROBLEMS:
+                lines.append(f"  ... and {len(self.errors) - _SHOWN_PROBLEMS} more")
+        return "\n".join(lines)
+
+
+def plan_import(manager, stream: IO[str], fmt: str, kind: str = PUNCTUATION,
+                replace: bool = False) -> ImportPlan:
+    """Parse ``stream`` and check it against the rules of ``manager`` in one pass."""
+    plan = ImportPlan({PUNCTUATION: manager.get_punctuation_mapping(),
+                       COMPLETION: manager.get_auto_complete_pairs()}, replace)
+    for row in read_rules(stream, fmt, kind, plan.errors):
+        plan.add(row)
+    return plan
+
+
+def apply_import(manager, plan: ImportPlan, overwrite: bool = False) -> bool:
+    """Merge the plan into ``manager`` as one change (so the rules compile once).
+
+    Returns False (and changes nothing) if the plan has errors or would not
+    change anything.
+    """
+    if not plan.ok:
+        return False
+    changes = plan.changes(overwrite)
+    if not changes:
+        return False
+    manager.update(changes)
+    return True
+
+
+def export_rows(manager, kinds: Iterable[str] = KINDS) -> Iterator[Tuple[str, str, str]]:
+    """Yield ``(kind, pattern, replacement)`` for the rules of ``kinds``."""
+    for kind in kinds:
+        rules = manager.get_punctuation_mapping() if kind == PUNCTUATION else manager.get_auto_complete_pairs()
+        for pattern, replacement in rules.items():
+            yield kind, pattern, replacement
+
+
+def write_rules(stream: IO[str], fmt: str, rows: Iterable[Tuple[str, str, str]]) -> int:
+    """Write rows in ``fmt``, one record at a time; return the number written."""
+    count = 0
+    if fmt == "jsonl":
+        for kind, pattern, replacement in rows:
+            stream.write(json.dumps({"kind": kind, "from": pattern, "to": replacement}, ensure_ascii=False) + "\n")
+            count += 1
+        return count
+    if fmt not in ("csv", "tsv"):
+        raise ValueError(f"unknown rule file format '{fmt}' (use one of {', '.join(FORMATS)})")
+    writer = csv.writer(stream, lineterminator="\n", **_DIALECTS[fmt])
+    writer.writerow(_HEADER)
+    for row in rows:
+        try:
+            writer.writerow(row)
+        except csv.Error:
+            raise ValueError(f"'{row[1]}' → '{row[2]}' contains a tab or line break; export as csv or jsonl")
+        count += 1
+    return count
@@ -0,0 +1,60 @@
+"""Immutable configuration snapshot for the key path."""
+
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from ..core.rules import RuleEngine
+
+
+class ConfigSnapshot:
+    """Read-only view of everything the input processor needs per key.
+
+    ``ConfigManager`` builds a new snapshot after every change and publishes
+    it with a single attribute assignment, so the listener thread always sees
+    one consistent version while the tray or settings window edit rules.
+    """
+
+    __slots__ = (
+        "version",
+        "profile",
+        "enabled",
+        "punctuation_conversion_enabled",
+        "auto_complete_enabled",
+        "case_sensitive",
+        "rules",
+        "auto_complete_pairs",
+        "trigger_chars",
+    )
+
+    def __init__(self, version: int, settings: Dict[str, Any], rules: RuleEngine,
+                 profile: Optional[str] = None):
+        """Freeze ``settings`` (with ``profile`` applied) together with the compiled rules."""
+        assign = object.__setattr__
+        assign(self, "version", version)
+        assign(self, "profile", profile)
+        assign(self, "enabled", bool(settings.get("enabled", True)))
+        assign(self, "punctuation_conversion_enabled",
+               bool(settings.get("punctuation_conversion_enabled", True)))
+        assign(self, "auto_complete_enabled", bool(settings.get("auto_complete_enabled", True)))
+        assign(self, "case_sensitive", bool(settings.get("case_sensitive", False)))
+        assign(self, "rules", rules)
+        pairs: Mapping[str, str] = MappingProxyType(dict(settings.get("auto_complete_pairs", {})))
+        assign(self, "auto_complete_pairs", pairs)
+        # Characters that can start, continue or finish a rule or completion;
+        # everything else takes the processor's fast path
+        triggers = set()
+        if self.punctuation_conversion_enabled:
+            triggers.update(rules.alphabet)
+        if self.auto_complete_enabled:
+            triggers.update(pairs)
+        assign(self, "trigger_chars", frozenset(triggers))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def __repr__(self) -> str:
+        return (f"ConfigSnapshot(version={self.version}, profile={self.profile!r}, enabled={self.enabled}, "
+                f"rules={len(self.rules)}, pairs={len(self.auto_complete_pairs)})")
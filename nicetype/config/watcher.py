@@ -0,0 +1,176 @@
+"""Configuration file watcher for NiceType."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .persistence import file_signature
+
+# inotify(7) constants
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _InotifyBackend:
+    """Reports changes to one file using Linux inotify (through ctypes).
+
+    The parent directory is watched rather than the file itself, so editors
+    and tools that save by writing a temporary file and renaming it over the
+    original are picked up as well.
+    """
+
+    def __init__(self, path: Path):
+        """Start watching ``path``; raises OSError if inotify is unavailable."""
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._name = os.fsencode(path.name)
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        if libc.inotify_add_watch(self._fd, os.fsencode(str(path.parent)), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, "inotify_add_watch failed")
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds; return True if the file changed."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        changed = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if name == self._name:
+                changed = True
+        return changed
+
+    def close(self):
+        """Release the inotify descriptor."""
+        os.close(self._fd)
+
+
+class _PollingBackend:
+    """Reports changes to one file by polling its modification time."""
+
+    def __init__(self, path: Path, interval: float):
+        """Remember the current state of ``path``."""
+        self._path = path
+        self._interval = interval
+        self._signature = file_signature(path)
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep for one poll interval (at most ``timeout``) and compare."""
+        time.sleep(min(self._interval, timeout))
+        signature = file_signature(self._path)
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
+
+    def close(self):
+        """Nothing to release."""
+
+
+class ConfigWatcher:
+    """Reloads the configuration when ``config.json`` changes on disk.
+
+    Bursts of writes are debounced, and the file is parsed on the watcher
+    thread. ``ConfigManager.reload`` only recompiles rule tables whose input
+    actually changed, then publishes a new snapshot, so the running processor
+    switches over between two key presses. Versions NiceType saved itself
+    are recognised by their signature and not reloaded.
+    """
+
+    def __init__(self, manager, debounce: float = 0.2, poll_interval: float = 1.0):
+        """Initialize the watcher for ``manager.config_file``."""
+        self.manager = manager
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.own_saves = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _create_backend(self):
+        """Use inotify where available, otherwise fall back to polling."""
+        path = Path(self.manager.config_file)
+        if sys.platform.startswith("linux"):
+            try:
+                return _InotifyBackend(path)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}); polling config file instead.")
+        return _PollingBackend(path, self.poll_interval)
+
+    def start(self):
+        """Start watching in a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        backend = self._create_backend()
+        self._thread = threading.Thread(target=self._run, args=(backend,), name="NiceTypeConfigWatcher",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop watching."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self, backend):
+        """Watch loop: wait for a change, let the burst settle, reload."""
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._watch_once(backend)
+                except Exception as e:
+                    # One bad edit or failed reload must not end hot-reloading
+                    # for the rest of the session
+                    self.errors += 1
+                    print(f"Error watching config file: {e}")
+                    self._stop.wait(self.poll_interval)
+        finally:
+            backend.close()
+
+    def _watch_once(self, backend):
+        """Wait for one change and reload once it has settled."""
+        if not backend.wait(0.5):
+            return
+        # Debounce: keep waiting until the file has been quiet for a while
+        while not self._stop.is_set() and backend.wait(self.debounce):
+            pass
+        if self._stop.is_set():
+            return
+        if self.manager.file_is_own_save():
+            # Our own save: reloading it could undo edits made since it was
+            # requested, and would only republish what is in memory anyway
+            self.own_saves += 1
+            return
+        if self.manager.reload():
+            self.reloads += 1
@@ -0,0 +1,347 @@
+"""Rule-matching backends and automatic backend selection."""
+
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type
+
+from .rules import BREAKS, Hits, Match, RuleEngine, _char_variants, _check_states, _load_matches
+
+AUTO = "auto"
+# Version of the compiled form of every backend; bump it whenever the
+# attributes of a backend change, so rule sets cached on disk are rebuilt
+ENGINE_VERSION = 3
+# Above this many rules the regex never wins: one capture group per rule makes
+# each match attempt slower (on typical text it already loses at about 20 rules)
+REGEX_MAX_RULES = 32
+# Translate tables up to this size count hits with str.count per key
+_COUNT_PER_KEY_LIMIT = 32
+
+
+class TranslateBackend:
+    """Rule set where every pattern is a single character.
+
+    Each key is converted on its own, so the live step is one dict lookup and
+    batch conversion is a single ``str.translate`` call.
+    """
+
+    ROOT = 0
+    name = "translate"
+
+    @staticmethod
+    def eligible(mapping: Dict[str, str], case_sensitive: bool) -> bool:
+        """Return True if every pattern is one (ordinary) character long."""
+        return bool(mapping) and all(len(pattern) == 1 and pattern not in BREAKS for pattern in mapping)
+
+    def __init__(self, mapping: Dict[str, str], case_sensitive: bool = False):
+        """Build the lookup and translation tables."""
+        self.case_sensitive = case_sensitive
+        self.rule_count = 0
+        self.max_pattern_length = 1 if mapping else 0
+        self._states: Dict[str, int] = {}
+        self._output: List[Optional[Match]] = [None]
+        self._table: Dict[int, str] = {}
+        for pattern, replacement in mapping.items():
+            if pattern in self._states:
+                continue
+            self.rule_count += 1
+            state = len(self._output)
+            self._output.append((1, replacement))
+            for variant in _char_variants(pattern, case_sensitive):
+                # First rule wins when patterns collide (e.g. differ only by case)
+                if variant not in self._states:
+                    self._states[variant] = state
+                    self._table[ord(variant)] = replacement
+        self.alphabet = frozenset(self._states)
+
+    def __len__(self) -> int:
+        """Return the number of compiled rules."""
+        return self.rule_count
+
+    @property
+    def state_count(self) -> int:
+        """Return the number of states."""
+        return len(self._output)
+
+    def to_data(self) -> Dict[str, Any]:
+        """Return the lookup tables as plain JSON data (see :meth:`from_data`)."""
+        return {
+            "case_sensitive": self.case_sensitive,
+            "rule_count": self.rule_count,
+            "max_pattern_length": self.max_pattern_length,
+            "states": self._states,
+            "output": self._output,
+        }
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "TranslateBackend":
+        """Rebuild the tables from :meth:`to_data`, checking them first."""
+        backend = cls.__new__(cls)
+        backend.case_sensitive = bool(data["case_sensitive"])
+        backend.rule_count = int(data["rule_count"])
+        backend.max_pattern_length = int(data["max_pattern_length"])
+        backend._output = _load_matches(data["output"])
+        states = data["states"]
+        if not isinstance(states, dict) or not all(type(char) is str and len(char) == 1 for char in states):
+            raise ValueError("invalid characters in compiled rules")
+        _check_states(len(backend._output), states.values())
+        backend._states = states
+        # State 0 has no rule, so this also rejects characters pointing there
+        backend._table = {ord(char): backend._output[state][1] for char, state in states.items()}
+        backend.alphabet = frozenset(states)
+        return backend
+
+    def step(self, state: int, char: str) -> int:
+        """Look up the typed character."""
+        return self._states.get(char, 0)
+
+    def match(self, state: int) -> Optional[Match]:
+        """Return the rule of the last character, if any."""
+        return self._output[state]
+
+    def depth(self, state: int) -> int:
+        """Nothing is ever held back."""
+        return 0
+
+    def feed(self, held: str, chunk: str, state: int, hits: Hits) -> Tuple[str, str, int]:
+        """Convert a piece of text in one pass."""
+        table = self._table
+        if len(table) <= _COUNT_PER_KEY_LIMIT:
+            counts = ((chr(code), chunk.count(chr(code))) for code in table)
+        else:
+            counts = Counter(chunk).items()
+        for char, count in counts:
+            if count and ord(char) in table:
+                rule = (char, table[ord(char)])
+                hits[rule] = hits.get(rule, 0) + count
+        return chunk.translate(table), "", 0
+
+
+class RegexBackend(RuleEngine):
+    """Small literal rule set matched with one compiled regex alternation.
+
+    Only used when no pattern occurs inside another one: then the leftmost
+    regex match is always the pattern that live typing would complete first,
+    so batch results are identical to the automaton's. The live key path
+    still steps the inherited automaton.
+    """
+
+    name = "regex"
+
+    @staticmethod
+    def eligible(mapping: Dict[str, str], case_sensitive: bool) -> bool:
+        """Return True if a regex gives exactly the live-typing results."""
+        patterns = [pattern for pattern in mapping if pattern]
+        if not patterns or len(patterns) > REGEX_MAX_RULES:
+            return False
+        if any(char in BREAKS for pattern in patterns for char in pattern):
+            return False
+        forms = [patterns] if case_sensitive else [[p.lower() for p in patterns], [p.upper() for p in patterns]]
+        for form in forms:
+            ordered = sorted(form, key=len)
+            for index, short in enumerate(ordered):
+                if any(short in longer for longer in ordered[index + 1:]):
+                    return False
+        return True
+
+    def __init__(self, mapping: Dict[str, str], case_sensitive: bool = False):
+        """Compile the automaton for typing and the regex for batch conversion."""
+        super().__init__(mapping, case_sensitive)
+        alternatives = []
+        self._replacements: List[str] = []
+        seen = set()
+        for pattern, replacement in mapping.items():
+            key = pattern if case_sensitive else pattern.lower()
+            if not pattern or key in seen:
+                continue
+            seen.add(key)
+            parts = []
+            for char in pattern:
+                variants = _char_variants(char, case_sensitive)
+                parts.append(re.escape(char) if len(variants) == 1
+                             else "[" + "".join(re.escape(variant) for variant in variants) + "]")
+            alternatives.append("(" + "".join(parts) + ")")
+            self._replacements.append(replacement)
+        self._regex = re.compile("|".join(alternatives))
+
+    def to_data(self) -> Dict[str, Any]:
+        """Return the automaton and the regex source as plain JSON data."""
+        data = super().to_data()
+        data["regex"] = self._regex.pattern
+        data["replacements"] = self._replacements
+        return data
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "RegexBackend":
+        """Rebuild the automaton and recompile the regex from :meth:`to_data`."""
+        backend = super().from_data(data)
+        backend._replacements = [str(replacement) for replacement in data["replacements"]]
+        backend._regex = re.compile(str(data["regex"]))
+        if backend._regex.groups != len(backend._replacements):
+            raise ValueError("regex does not match the replacements in compiled rules")
+        return backend
+
+    def feed(self, held: str, chunk: str, state: int, hits: Hits) -> Tuple[str, str, int]:
+        """Convert a piece of text with the regex."""
+        text = held + chunk
+        replacements = self._replacements
+        out: List[str] = []
+        position = 0
+        for found in self._regex.finditer(text):
+            replacement = replacements[found.lastindex - 1]
+            out.append(text[position:found.start()])
+            out.append(replacement)
+            position = found.end()
+            rule = (found.group(), replacement)
+            hits[rule] = hits.get(rule, 0) + 1
+
+        # The tail may be the start of a pattern that continues in the next chunk
+        keep = max(position, len(text) - (self.max_pattern_length - 1))
+        for index in range(len(text) - 1, keep - 1, -1):
+            if text[index] in BREAKS:
+                keep = index + 1
+                break
+        out.append(text[position:keep])
+        return "".join(out), text[keep:], self.ROOT
+
+
+BACKENDS: Dict[str, Type] = {
+    TranslateBackend.name: TranslateBackend,
+    RegexBackend.name: RegexBackend,
+    RuleEngine.name: RuleEngine,
+}
+
+
+def eligible_backends(mapping: Dict[str, str], case_sensitive: bool) -> List[str]:
+    """Return the names of the backends that can run ``mapping`` exactly."""
+    names = [RuleEngine.name]
+    if RegexBackend.eligible(mapping, case_sensitive):
+        names.insert(0, RegexBackend.name)
+    if TranslateBackend.eligible(mapping, case_sensitive):
+        names.insert(0, TranslateBackend.name)
+    return names
+
+
+def _sample_text(mapping: Dict[str, str], length: int = 8192) -> str:
+    """Build typical text for the selection benchmark: prose with rule matches."""
+    import random  # Only needed when there is a choice to make
+
+    rng = random.Random(0)
+    filler = "abcdefghijklmnop qrstuvwxyz 的一是在不了有和人这中大为上个国"
+    patterns = [pattern for pattern in mapping if pattern]
+    pieces = []
+    size = 0
+    while size < length:
+        word = "".join(rng.choice(filler) for _ in range(rng.randint(3, 12)))
+        pieces.append(word)
+        size += len(word)
+        if patterns and rng.random() < 0.2:
+            pattern = rng.choice(patterns)
+            pieces.append(pattern)
+            size += len(pattern)
+    return "".join(pieces)
+
+
+def _time_feed(engine, sample: str, key_chars: str, repeat: int = 3, limit: float = float("inf")) -> float:
+    """Return the best time to convert ``sample`` and replay ``key_chars`` as typing.
+
+    Stops after the first run slower than ``limit`` (the time to beat).
+    """
+    best = float("inf")
+    step = engine.step
+    match = engine.match
+    for _ in range(repeat):
+        started = time.perf_counter()
+        engine.feed("", sample, engine.ROOT, {})
+        state = engine.ROOT
+        for char in key_chars:
+            state = step(state, char)
+            if match(state) is not None:
+                state = engine.ROOT
+        best = min(best, time.perf_counter() - started)
+        if best > limit:
+            break
+    return best
+
+
+def compile_rules(mapping: Dict[str, str], case_sensitive: bool = False, backend: str = AUTO):
+    """Compile ``mapping`` with the requested backend, or the fastest one for ``auto``.
+
+    Every eligible backend is compiled and timed on a short sample (batch
+    conversion plus a replay of typed keys); the winner is returned. The
+    automaton goes first, so a slower candidate is dropped after one run. A
+    requested backend that cannot run this mapping exactly falls back to
+    automatic selection.
+    """
+    candidates = eligible_backends(mapping, case_sensitive)
+    if backend != AUTO:
+        if backend in candidates:
+            return BACKENDS[backend](mapping, case_sensitive)
+        print(f"Rule backend '{backend}' can't be used for these rules; choosing automatically.")
+    if len(candidates) == 1:
+        return BACKENDS[candidates[0]](mapping, case_sensitive)
+
+    sample = _sample_text(mapping)
+    key_chars = sample[:1024]
+    best_engine = None
+    best_time = float("inf")
+    for name in reversed(candidates):
+        engine = BACKENDS[name](mapping, case_sensitive)
+        elapsed = _time_feed(engine, sample, key_chars, limit=best_time)
+        if elapsed < best_time:
+            best_engine, best_time = engine, elapsed
+    return best_engine
+
+
+class RuleCache:
+    """Bounded least-recently-used cache of compiled rule sets.
+
+    Compiled rules can be large (a big mapping has tens of thousands of
+    automaton states), so only the ``maxsize`` most recently used ones are
+    kept. Safe to use from several threads.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        """Create an empty cache holding at most ``maxsize`` rule sets."""
+        self.maxsize = max(1, maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached rule sets."""
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """Return the rules stored under ``key`` (or None) and mark them as recently used."""
+        with self._lock:
+            rules = self._entries.get(key)
+            if rules is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rules
+
+    def put(self, key: Hashable, rules):
+        """Store ``rules``, evicting the least recently used entries beyond ``maxsize``."""
+        with self._lock:
+            self._entries[key] = rules
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def resize(self, maxsize: int):
+        """Change the capacity, evicting entries if it shrank."""
+        with self._lock:
+            self.maxsize = max(1, maxsize)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_older(self, revision: int):
+        """Drop entries whose key (``(name, revision)``) is from an older revision."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] < revision]:
+                del self._entries[key]
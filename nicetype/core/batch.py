@@ -0,0 +1,254 @@
+"""Parallel conversion of many files with the punctuation rules."""
+
+import codecs
+import mmap
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..config.persistence import atomic_writer
+from .backends import AUTO, compile_rules
+from .convert import StreamConverter
+from .rules import RuleEngine, _char_variants
+
+# Bytes decoded per step when converting a memory-mapped file
+READ_SIZE = 1024 * 1024
+
+# Set in every worker process by _init_worker
+_worker_rules: Optional[RuleEngine] = None
+_worker_prefilter = None
+_worker_encoding = "utf-8"
+
+
+def build_prefilter(mapping: Dict[str, str], case_sensitive: bool, encoding: str):
+    """Compile a bytes regex that finds any pattern in encoded text.
+
+    Returns None when the raw bytes cannot be searched reliably (the encoding
+    is not UTF-8) or there is nothing to search for. The regex may match in
+    places where no rule fires (e.g. across a line break), never the other
+    way round, so a file it does not match can be skipped unread.
+    """
+    if codecs.lookup(encoding).name not in ("utf-8", "utf-8-sig") or not mapping:
+        return None
+    alternatives = []
+    for pattern in mapping:
+        if not pattern:
+            continue
+        parts = []
+        for char in pattern:
+            variants = [re.escape(variant.encode("utf-8")) for variant in _char_variants(char, case_sensitive)]
+            parts.append(variants[0] if len(variants) == 1 else b"(?:" + b"|".join(variants) + b")")
+        alternatives.append(b"".join(parts))
+    if not alternatives:
+        return None
+    # Longest first keeps the alternation from stopping at a shorter prefix
+    alternatives.sort(key=len, reverse=True)
+    return re.compile(b"|".join(alternatives))
+
+
+def collect_files(paths: List[str]) -> List[Tuple[Path, Path]]:
+    """Expand files and directories into ``(file, path relative to its argument)`` pairs.
+
+    Directories are walked recursively; hidden files and directories (such as
+    ``.git``) are skipped.
+    """
+    files = []
+    for argument in paths:
+        root = Path(argument)
+        if root.is_dir():
+            for directory, subdirs, names in os.walk(root):
+                subdirs[:] = sorted(name for name in subdirs if not name.startswith("."))
+                for name in sorted(names):
+                    if not name.startswith("."):
+                        path = Path(directory) / name
+                        files.append((path, path.relative_to(root)))
+        else:
+            files.append((root, Path(root.name)))
+    return files
+
+
+def _init_worker(mapping: Dict[str, str], case_sensitive: bool, encoding: str, backend: str):
+    """Compile the rules once per worker process."""
+    global _worker_rules, _worker_prefilter, _worker_encoding
+    _worker_rules = compile_rules(mapping, case_sensitive, backend)
+    _worker_prefilter = build_prefilter(mapping, case_sensitive, encoding)
+    _worker_encoding = encoding
+
+
+def _decoded_chunks(data, encoding: str) -> Iterator[str]:
+    """Decode a bytes-like object (such as an mmap) piece by piece."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for start in range(0, len(data), READ_SIZE):
+        # Slicing copies one piece; no buffer export keeps the mapping open
+        text = decoder.decode(data[start:start + READ_SIZE])
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+class _Unchanged(Exception):
+    """Raised inside the atomic writer to discard an unchanged in-place file."""
+
+
+def _convert_file(job: Tuple[str, Optional[str]]) -> Dict:
+    """Convert one file (runs in a worker process).
+
+    ``job`` is ``(source, destination)``; a destination of None means in place.
+    """
+    source, destination = job
+    started = time.process_time()
+    result = {"path": source, "pid": os.getpid(), "bytes": 0, "status": "skipped",
+              "hits": {}, "error": None}
+    try:
+        with open(source, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            result["bytes"] = size
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            try:
+                if _worker_prefilter is not None and not _worker_prefilter.search(data):
+                    matched = False
+                else:
+                    matched = True
+                    converter = StreamConverter(_worker_rules)
+                    target = Path(destination or source)
+                    # newline="" writes line endings exactly as they were read
+                    with atomic_writer(target, _worker_encoding, newline="") as out:
+                        for chunk in _decoded_chunks(data, _worker_encoding):
+                            out.write(converter.feed(chunk))
+                        out.write(converter.flush())
+                        if destination is None and not converter.hits:
+                            # Nothing to change; leave the original untouched
+                            raise _Unchanged()
+                    if destination is not None:
+                        shutil.copymode(source, destination)
+                    result["hits"] = {f"{matched_text}→{replacement}": count
+                                      for (matched_text, replacement), count in converter.hits.items()}
+                    result["status"] = "converted" if converter.hits else "copied"
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+        if not matched and destination is not None:
+            # Mirror: an unchanged file is still copied over
+            _copy_file(source, destination)
+            result["status"] = "copied"
+    except _Unchanged:
+        pass
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["cpu_seconds"] = time.process_time() - started
+    return result
+
+
+def _copy_file(source: str, destination: str):
+    """Copy a file unchanged (for the mirror directory)."""
+    shutil.copyfile(source, destination)
+    shutil.copymode(source, destination)
+
+
+class BatchSummary:
+    """Totals of a batch conversion."""
+
+    def __init__(self):
+        """Start with empty totals."""
+        self.files = 0
+        self.converted = 0
+        self.copied = 0
+        self.skipped = 0
+        self.errors: List[Tuple[str, str]] = []
+        self.bytes = 0
+        self.backend = ""
+        self.hits: Dict[str, int] = {}
+        self.wall_seconds = 0.0
+        self.cpu_by_worker: Dict[int, float] = {}
+        self.bytes_by_worker: Dict[int, int] = {}
+
+    def add(self, result: Dict):
+        """Account for one file result."""
+        self.files += 1
+        self.bytes += result["bytes"]
+        status = result["status"]
+        if status == "converted":
+            self.converted += 1
+        elif status == "copied":
+            self.copied += 1
+        elif status == "error":
+            self.errors.append((result["path"], result["error"]))
+        else:
+            self.skipped += 1
+        for rule, count in result["hits"].items():
+            self.hits[rule] = self.hits.get(rule, 0) + count
+        pid = result["pid"]
+        self.cpu_by_worker[pid] = self.cpu_by_worker.get(pid, 0.0) + result["cpu_seconds"]
+        self.bytes_by_worker[pid] = self.bytes_by_worker.get(pid, 0) + result["bytes"]
+
+    def format(self) -> str:
+        """Return a human readable report."""
+        mib = self.bytes / (1024 * 1024)
+        lines = [
+            f"Files: {self.files} scanned, {self.converted} converted, {self.copied} copied unchanged, "
+            f"{self.skipped} without matches, {len(self.errors)} failed",
+            f"Data: {mib:.1f} MiB in {self.wall_seconds:.2f} s"
+            + (f" ({mib / self.wall_seconds:.1f} MiB/s)" if self.wall_seconds else "")
+            + f", {self.backend} rule backend",
+        ]
+        if self.hits:
+            lines.append("Rules hit:")
+            for rule, count in sorted(self.hits.items(), key=lambda item: -item[1]):
+                lines.append(f"  {rule}: {count}")
+        workers = len(self.cpu_by_worker)
+        lines.append(f"Per core ({workers} worker{'s' if workers != 1 else ''}):")
+        for pid, cpu in sorted(self.cpu_by_worker.items()):
+            worker_mib = self.bytes_by_worker[pid] / (1024 * 1024)
+            rate = f"{worker_mib / cpu:.1f} MiB/s" if cpu > 0 else "-"
+            lines.append(f"  worker {pid}: {worker_mib:.1f} MiB, {cpu:.2f} s CPU, {rate}")
+        for path, error in self.errors:
+            lines.append(f"Error converting {path}: {error}")
+        return "\n".join(lines)
+
+
+def convert_files(paths: List[str], mapping: Dict[str, str], case_sensitive: bool = False,
+                  mirror: Optional[str] = None, jobs: Optional[int] = None,
+                  encoding: str = "utf-8", backend: str = AUTO) -> BatchSummary:
+    """Convert files and directory trees in place, or into the ``mirror`` directory.
+
+    Files are spread over ``jobs`` worker processes (default: one per CPU);
+    every worker compiles the rules once and memory-maps the files it gets.
+    The rule backend is chosen once here so all workers use the same one.
+    """
+    summary = BatchSummary()
+    backend = compile_rules(mapping, case_sensitive, backend).name
+    summary.backend = backend
+    jobs_list = []
+    for path, relative in collect_files(paths):
+        if mirror is None:
+            jobs_list.append((str(path), None))
+        else:
+            target = Path(mirror) / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            jobs_list.append((str(path), str(target)))
+
+    started = time.perf_counter()
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    elif jobs < 1:
+        raise ValueError(f"jobs must be at least 1, not {jobs}")
+    if jobs == 1 or len(jobs_list) <= 1:
+        _init_worker(mapping, case_sensitive, encoding, backend)
+        results = map(_convert_file, jobs_list)
+        for result in results:
+            summary.add(result)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(mapping, case_sensitive, encoding, backend)) as pool:
+            chunksize = max(1, min(64, len(jobs_list) // (jobs * 4)))
+            for result in pool.map(_convert_file, jobs_list, chunksize=chunksize):
+                summary.add(result)
+    summary.wall_seconds = time.perf_counter() - started
+    return summary
@@ -0,0 +1,77 @@
+"""Batch conversion of text with the punctuation rules."""
+
+from typing import IO, Optional
+
+from .rules import Hits, RuleEngine
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StreamConverter:
+    """Applies compiled rules to text that arrives in pieces.
+
+    The text is converted with the same semantics as live typing: a rule
+    fires as soon as its pattern is complete, the longest pattern ending there
+    wins, the converted text never takes part in a further conversion, and no
+    rule spans a space, line break or tab. The rule backend holds back only the
+    characters that may still turn out to be the start of a pattern (fewer
+    than the longest pattern), so memory stays constant however large the
+    input is.
+    """
+
+    def __init__(self, rules: RuleEngine):
+        """Prepare to convert with ``rules`` (any rule backend)."""
+        self.rules = rules
+        self.chars_in = 0
+        self.chars_out = 0
+        self.hits: Hits = {}
+        self._state = RuleEngine.ROOT
+        self._held = ""
+
+    def feed(self, chunk: str) -> str:
+        """Convert the next piece of text; return what can be written so far."""
+        result, self._held, self._state = self.rules.feed(self._held, chunk, self._state, self.hits)
+        self.chars_in += len(chunk)
+        self.chars_out += len(result)
+        return result
+
+    def flush(self) -> str:
+        """Return the held back tail once the input has ended."""
+        tail = self._held
+        self._held = ""
+        self._state = RuleEngine.ROOT
+        self.chars_out += len(tail)
+        return tail
+
+    @property
+    def conversions(self) -> int:
+        """Return the number of rules applied so far."""
+        return sum(self.hits.values())
+
+
+def convert_stream(source: IO[str], destination: IO[str], rules: RuleEngine,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   converter: Optional[StreamConverter] = None) -> StreamConverter:
+    """Copy ``source`` to ``destination`` chunk by chunk, converting on the way."""
+    # read(0) returns "" (taken for the end of the input) and read(-1) everything at once
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, not {chunk_size}")
+    if converter is None:
+        converter = StreamConverter(rules)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        converted = converter.feed(chunk)
+        if converted:
+            destination.write(converted)
+    tail = converter.flush()
+    if tail:
+        destination.write(tail)
+    return converter
+
+
+def convert_text(text: str, rules: RuleEngine) -> str:
+    """Convert a whole string."""
+    converter = StreamConverter(rules)
+    return converter.feed(text) + converter.flush()
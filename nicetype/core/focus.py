@@ -0,0 +1,232 @@
+"""Focused-window tracking for per-application profiles."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+from typing import Callable, Optional, Tuple
+
+# Names identifying a window, e.g. the instance and class of X11 WM_CLASS
+WindowClass = Tuple[str, ...]
+Resolver = Callable[[], Optional[WindowClass]]
+
+# Xlib constants
+_PROPERTY_CHANGE_MASK = 1 << 22
+_POINTER_ROOT = 1
+_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+# Displays opened by X11FocusResolver; X errors on them are ignored
+_own_displays = set()
+_previous_error_handler = None
+_error_handler = None
+
+
+class _XClassHint(ctypes.Structure):
+    _fields_ = [("res_name", ctypes.c_void_p), ("res_class", ctypes.c_void_p)]
+
+
+def _on_x_error(display, event):
+    """Ignore errors about windows that vanished under us; pass on the rest."""
+    if display in _own_displays or not _previous_error_handler:
+        return 0
+    return _previous_error_handler(display, event)
+
+
+class X11FocusResolver:
+    """Reads ``WM_CLASS`` of the focused X11 window (through ctypes).
+
+    Opens its own display connection, which must only be used from one
+    thread. :meth:`wait` sleeps until the window manager announces a new
+    active window, so focus changes are seen without busy polling.
+    """
+
+    def __init__(self, display_name: Optional[str] = None):
+        """Connect to the X server; raises OSError if that is not possible."""
+        global _previous_error_handler, _error_handler
+        library = ctypes.util.find_library("X11")
+        if not library:
+            raise OSError("libX11 not found")
+        x = ctypes.CDLL(library)
+        x.XOpenDisplay.restype = ctypes.c_void_p
+        x.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x.XDefaultRootWindow.restype = ctypes.c_ulong
+        x.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x.XGetInputFocus.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int)]
+        x.XGetClassHint.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XClassHint)]
+        x.XQueryTree.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong),
+                                 ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p),
+                                 ctypes.POINTER(ctypes.c_uint)]
+        x.XFree.argtypes = [ctypes.c_void_p]
+        x.XSelectInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_long]
+        x.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        x.XPending.argtypes = [ctypes.c_void_p]
+        x.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        x.XFlush.argtypes = [ctypes.c_void_p]
+        x.XSetErrorHandler.restype = _ERROR_HANDLER
+        x.XSetErrorHandler.argtypes = [_ERROR_HANDLER]
+
+        name = display_name or os.environ.get("DISPLAY")
+        display = x.XOpenDisplay(name.encode() if name else None)
+        if not display:
+            raise OSError(f"cannot open X display {name!r}")
+        if _error_handler is None:
+            # The default Xlib handler exits the process on any error, e.g. when
+            # the focused window is destroyed while its class is being read
+            _error_handler = _ERROR_HANDLER(_on_x_error)
+            _previous_error_handler = x.XSetErrorHandler(_error_handler)
+        _own_displays.add(display)
+
+        self._x = x
+        self._display = display
+        self._root = x.XDefaultRootWindow(display)
+        self._event = (ctypes.c_long * 24)()  # Large enough for any XEvent
+        # _NET_ACTIVE_WINDOW on the root window changes with every focus change
+        x.XSelectInput(display, self._root, _PROPERTY_CHANGE_MASK)
+        x.XFlush(display)
+
+    def __call__(self) -> Optional[WindowClass]:
+        """Return ``(instance, class)`` of the focused window, or None."""
+        x = self._x
+        display = self._display
+        window = ctypes.c_ulong()
+        revert_to = ctypes.c_int()
+        x.XGetInputFocus(display, ctypes.byref(window), ctypes.byref(revert_to))
+        current = window.value
+        # Focus is often on a child window; WM_CLASS is set on the toplevel
+        while current > _POINTER_ROOT and current != self._root:
+            hint = _XClassHint()
+            if x.XGetClassHint(display, current, ctypes.byref(hint)):
+                names = tuple(ctypes.string_at(pointer).decode("utf-8", "replace") if pointer else ""
+                              for pointer in (hint.res_name, hint.res_class))
+                for pointer in (hint.res_name, hint.res_class):
+                    if pointer:
+                        x.XFree(pointer)
+                return names
+            root = ctypes.c_ulong()
+            parent = ctypes.c_ulong()
+            children = ctypes.c_void_p()
+            count = ctypes.c_uint()
+            if not x.XQueryTree(display, current, ctypes.byref(root), ctypes.byref(parent),
+                                ctypes.byref(children), ctypes.byref(count)):
+                break
+            if children:
+                x.XFree(children)
+            current = parent.value
+        return None
+
+    def wait(self, timeout: float):
+        """Wait up to ``timeout`` seconds for a property change on the root window."""
+        x = self._x
+        if not x.XPending(self._display):
+            select.select([x.XConnectionNumber(self._display)], [], [], timeout)
+        while x.XPending(self._display):
+            x.XNextEvent(self._display, self._event)
+
+    def close(self):
+        """Close the display connection."""
+        if self._display:
+            self._x.XCloseDisplay(self._display)
+            _own_displays.discard(self._display)
+            self._display = None
+
+
+def default_resolver() -> Optional[Resolver]:
+    """Return the focused-window resolver for this desktop, or None if there is none."""
+    if not sys.platform.startswith("linux") or not os.environ.get("DISPLAY"):
+        return None
+    try:
+        return X11FocusResolver()
+    except OSError as e:
+        print(f"Can't track the focused window ({e}).")
+        return None
+
+
+class FocusTracker:
+    """Switches the active profile when another application gets the focus.
+
+    Runs on its own thread: the focused window is resolved there, and
+    ``ConfigManager.activate_profile`` compiles (or fetches from its cache)
+    the profile's rules there too before publishing a new snapshot. The
+    keyboard listener only ever reads the published snapshot, so switching
+    windows never costs anything on the key path.
+
+    ``resolver`` is any callable returning the names of the focused window
+    (or None); if it also has a ``wait(timeout)`` method, that is used to
+    sleep until the next focus change instead of polling.
+    """
+
+    def __init__(self, manager, resolver: Optional[Resolver] = None, interval: float = 0.25):
+        """Initialize the tracker for ``manager`` (a ConfigManager)."""
+        self.manager = manager
+        self.resolver = resolver
+        self.interval = interval
+        self.window_class: Optional[WindowClass] = None
+        self.switches = 0
+        self.errors = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def poll(self) -> bool:
+        """Resolve the focused window once; return True if the profile changed."""
+        if not self.manager.get_profiles():
+            self.window_class = None
+            return self.manager.activate_profile(None)
+        self.window_class = self.resolver()
+        profile = self.manager.profile_for_window(self.window_class) if self.window_class else None
+        if self.manager.activate_profile(profile):
+            self.switches += 1
+            return True
+        return False
+
+    def start(self) -> bool:
+        """Start tracking in a background thread; return False if focus can't be resolved."""
+        if self._thread is not None:
+            return True
+        if self.resolver is None:
+            self.resolver = default_resolver()
+            if self.resolver is None:
+                if self.manager.get_profiles():
+                    print("Per-application profiles are not supported on this desktop; using global settings.")
+                return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="NiceTypeFocusTracker", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 1.0):
+        """Stop tracking."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        """Tracking loop: compile the profiles up front, then follow the focus."""
+        wait = getattr(self.resolver, "wait", None)
+        try:
+            try:
+                self.manager.warm_profiles()
+            except Exception as e:
+                print(f"Error compiling the profiles: {e}")
+            while not self._stop.is_set():
+                try:
+                    self.poll()
+                    if wait is not None:
+                        # Events wake us early; the timeout also catches window
+                        # managers that don't announce the active window
+                        wait(max(self.interval, 0.5))
+                    else:
+                        self._stop.wait(self.interval)
+                except Exception as e:
+                    # Keep following the focus; one failed poll must not end it
+                    self.errors += 1
+                    print(f"Error tracking the focused window: {e}")
+                    self._stop.wait(self.interval)
+        finally:
+            close = getattr(self.resolver, "close", None)
+            if close is not None:
+                close()
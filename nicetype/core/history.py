@@ -0,0 +1,87 @@
+"""Keystroke history for NiceType."""
+
+from array import array
+from typing import Optional
+
+
+class KeystrokeHistory:
+    """Fixed-size ring buffer of recently typed characters.
+
+    Each entry stores the character's code point, the monotonic time it was
+    typed and the rule engine state reached after it. Storage is allocated
+    once up front; pushing, popping and reading never allocate, so the buffer
+    can be updated on every key press.
+
+    The buffer mirrors the text just before the cursor: backspace pops the
+    newest entry (restoring the rule state of the character before it), and
+    keys that move the cursor elsewhere invalidate the whole history.
+    """
+
+    def __init__(self, capacity: int = 64):
+        """Preallocate storage for ``capacity`` keystrokes."""
+        self.capacity = max(1, int(capacity))
+        self._code_points = array("I", [0]) * self.capacity
+        self._times = array("d", [0.0]) * self.capacity
+        self._states = array("I", [0]) * self.capacity
+        self._head = 0  # Index of the next slot to write
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Return the number of remembered keystrokes."""
+        return self._size
+
+    def push(self, char: str, timestamp: float, state: int = 0):
+        """Record a typed character, overwriting the oldest entry when full."""
+        head = self._head
+        self._code_points[head] = ord(char)
+        self._times[head] = timestamp
+        self._states[head] = state
+        self._head = (head + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def pop(self) -> Optional[str]:
+        """Remove and return the newest character (backspace)."""
+        if self._size == 0:
+            return None
+        self._head = (self._head - 1) % self.capacity
+        self._size -= 1
+        return chr(self._code_points[self._head])
+
+    def clear(self):
+        """Forget all keystrokes (cursor moved or focus changed)."""
+        self._size = 0
+
+    def last_code_point(self) -> int:
+        """Return the newest code point, or 0 when empty."""
+        if self._size == 0:
+            return 0
+        return self._code_points[self._head - 1]
+
+    def last_time(self) -> float:
+        """Return when the newest character was typed, or 0.0 when empty."""
+        if self._size == 0:
+            return 0.0
+        return self._times[self._head - 1]
+
+    def last_state(self) -> int:
+        """Return the rule engine state after the newest character (0 when empty)."""
+        if self._size == 0:
+            return 0
+        return self._states[self._head - 1]
+
+    def code_point(self, offset: int) -> int:
+        """Return the code point ``offset`` entries back (0 is the newest)."""
+        if not 0 <= offset < self._size:
+            raise IndexError("history offset out of range")
+        return self._code_points[(self._head - 1 - offset) % self.capacity]
+
+    def text(self, count: Optional[int] = None) -> str:
+        """Return up to ``count`` of the newest characters, oldest first."""
+        if count is None or count > self._size:
+            count = self._size
+        start = self._head - count
+        if start >= 0:
+            return "".join(map(chr, self._code_points[start:self._head]))
+        # The newest characters wrap around the end of the buffer
+        return "".join(map(chr, self._code_points[start:] + self._code_points[:self._head]))
@@ -0,0 +1,145 @@
+"""Background text injection for NiceType."""
+
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from .profiling import cpu_profiler
+
+
+# Backpressure policies applied when the output queue is full
+DROP_NEWEST = "drop_newest"  # Reject the action being submitted
+DROP_OLDEST = "drop_oldest"  # Evict the oldest queued action to make room
+BLOCK = "block"  # Wait up to ``block_timeout`` for room, then drop
+DROP_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+_STOP = object()
+
+
+class TextInjector:
+    """Runs injection actions on a single long-lived worker thread.
+
+    The keyboard listener callback only enqueues work here, so the OS hook
+    returns immediately while the (slow) synthetic key emission happens on
+    the worker.
+    """
+
+    def __init__(self, maxsize: int = 64, policy: str = DROP_NEWEST,
+                 block_timeout: float = 0.005):
+        """Initialize the injector with a bounded queue."""
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy!r}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.maxsize)
+        self._thread: Optional[threading.Thread] = None
+
+        # Counters, not locked: submitted, dropped and max_depth are written by
+        # the thread calling submit() (only the keyboard listener; calls from
+        # several threads at once could lose counts), completed and failed by
+        # the worker
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    def start(self):
+        """Start the worker thread."""
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="NiceTypeInjector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the worker after it finishes the action in progress."""
+        if self._thread is None:
+            return
+
+        # Discard pending work; the stop sentinel must always fit
+        self._drain()
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, action: Callable[..., Any], *args) -> bool:
+        """Queue an action for the worker.
+
+        Returns False if the action was dropped because of backpressure.
+        """
+        item = (action, args)
+        self.submitted += 1
+        try:
+            if self.policy == BLOCK:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.policy != DROP_OLDEST:
+                self.dropped += 1
+                return False
+
+            # Evict the oldest action; the worker may race us for it
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def depth(self) -> int:
+        """Return the number of queued actions."""
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue counters."""
+        return {
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "capacity": self.maxsize,
+            "policy": self.policy,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def _drain(self):
+        """Remove all queued actions without running them."""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        """Worker loop: run queued actions in order."""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            action, args = item
+            try:
+                if cpu_profiler.active:
+                    cpu_profiler.call("injector", action, *args)
+                else:
+                    action(*args)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error in text injection: {e}")
@@ -0,0 +1,219 @@
+"""Long-session memory profiling for NiceType (``nicetype --profile-memory``)."""
+
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Frames kept per allocation; enough to see who called the allocating helper
+TRACE_FRAMES = 8
+# Growth sites and object types listed in the report
+TOP_SITES = 15
+TOP_TYPES = 15
+
+# Allocations made by the import machinery, and anything the profiler itself
+# (or tracemalloc on its behalf) allocates
+_IGNORED_FILES = ("<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+_IGNORED_CALLERS = (tracemalloc.__file__, __file__)
+
+
+def default_memory_report_path() -> Path:
+    """Return the location of the memory report."""
+    return Path.home() / ".nicetype" / "memory-profile.txt"
+
+
+def current_rss() -> Optional[int]:
+    """Return the resident set size of this process in bytes, or None if unknown."""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)]
+            _fields_ += [(name, ctypes.c_size_t) for name in (
+                "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    # Elsewhere only the peak is known (resource.getrusage), which can't show growth
+    return None
+
+
+def _object_counts() -> Counter:
+    """Count the objects tracked by the garbage collector by type name."""
+    return Counter(type(obj).__qualname__ for obj in gc.get_objects())
+
+
+class MemoryProfiler:
+    """Samples RSS and ``tracemalloc`` snapshots on a background thread.
+
+    The first sample, taken one ``interval`` after :meth:`start`, is the
+    baseline, so allocations made while starting up don't count as growth.
+    Every later sample is compared with the baseline and with the previous
+    sample, and the report file is rewritten with the RSS history, the call
+    sites that grew most and the object types whose number grew most.
+
+    Nothing here is imported or started unless ``--profile-memory`` is given.
+    While it runs, tracing slows every allocation down noticeably and each
+    sample costs a second or two of CPU on the profiler thread.
+    """
+
+    def __init__(self, interval: float = 300.0, path: Optional[Path] = None):
+        """Initialize the profiler to sample every ``interval`` seconds."""
+        self.interval = interval
+        self.path = Path(path) if path is not None else default_memory_report_path()
+        self.started_at = time.time()
+        self.samples: List[Tuple[float, Optional[int], int]] = []  # (elapsed, RSS, traced bytes)
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._baseline_types: Counter = Counter()
+        self._lock = threading.Lock()  # One sample at a time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start tracing allocations and sampling."""
+        if self._thread is not None:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self.started_at = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="NiceTypeMemoryProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Take a final sample, write the report and stop tracing."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(5.0)
+        self._thread = None
+        self.sample()
+        tracemalloc.stop()
+
+    def _run(self):
+        """Sampling loop."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error profiling memory: {e}")
+
+    def sample(self):
+        """Record RSS, diff a new snapshot against the earlier ones and rewrite the report."""
+        if not tracemalloc.is_tracing():
+            return
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot()
+            traced, _ = tracemalloc.get_traced_memory()
+            self.samples.append((time.time() - self.started_at, current_rss(), traced))
+            types = _object_counts()
+            if self._baseline is None:
+                self._baseline = self._previous = snapshot
+                self._baseline_types = types
+            report = self.format_report(snapshot, types)
+            self._previous = snapshot
+            self._write(report)
+
+    def format_report(self, snapshot: tracemalloc.Snapshot, types: Counter) -> str:
+        """Render the RSS history and the growth since the baseline and the last sample."""
+        lines = [
+            f"NiceType memory profile, pid {os.getpid()}, started {time.ctime(self.started_at)}",
+            f"Sampled every {self.interval:g} s; the first sample is the baseline.",
+            "",
+            f"{'elapsed':>10}{'RSS MiB':>10}{'traced MiB':>12}",
+        ]
+        for elapsed, rss, traced in self.samples:
+            rss_text = f"{rss / 2 ** 20:.1f}" if rss is not None else "-"
+            lines.append(f"{_format_elapsed(elapsed):>10}{rss_text:>10}{traced / 2 ** 20:>12.2f}")
+        trend = self.rss_trend()
+        if trend is not None:
+            lines.append(f"RSS trend since the baseline: {trend:+.2f} MiB/hour")
+
+        lines += ["", f"Top {TOP_SITES} growth sites since the baseline:"]
+        lines += _format_growth(snapshot.compare_to(self._baseline, "traceback"), TOP_SITES, tracebacks=True)
+        lines += ["", f"Top {TOP_SITES} growth sites since the previous sample:"]
+        lines += _format_growth(snapshot.compare_to(self._previous, "lineno"), TOP_SITES, tracebacks=False)
+
+        lines += ["", f"Top {TOP_TYPES} object types by growth since the baseline (count now, change):"]
+        growth = sorted(((count - self._baseline_types.get(name, 0), name, count) for name, count in types.items()),
+                        reverse=True)
+        shown = [f"  {name:<40}{count:>10}{change:>+10}" for change, name, count in growth[:TOP_TYPES] if change > 0]
+        lines += shown or ["  (none)"]
+        return "\n".join(lines) + "\n"
+
+    def rss_trend(self) -> Optional[float]:
+        """Return the least-squares RSS slope in MiB per hour over the samples, if known."""
+        points = [(elapsed, rss) for elapsed, rss, _ in self.samples if rss is not None]
+        if len(points) < 3:
+            return None
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        spread = sum((x - mean_x) ** 2 for x, _ in points)
+        if not spread:
+            return None
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+        return slope * 3600 / 2 ** 20
+
+    def _write(self, report: str):
+        """Replace the report file."""
+        from ..config.persistence import write_atomic
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(self.path, report)
+        except OSError as e:
+            print(f"Error saving memory report: {e}")
+
+
+def _ignored(traceback: tracemalloc.Traceback) -> bool:
+    """Return True for allocations by the import machinery or the profiler itself."""
+    # Checked on the few statistics shown; Snapshot.filter_traces() would take
+    # seconds on a snapshot of the whole application
+    if traceback[-1].filename in _IGNORED_FILES:
+        return True
+    return any(frame.filename in _IGNORED_CALLERS for frame in traceback)
+
+
+def _format_growth(stats: List[tracemalloc.StatisticDiff], limit: int, tracebacks: bool) -> List[str]:
+    """Format the statistics that grew, largest growth first."""
+    lines = []
+    shown = 0
+    for stat in stats:
+        if shown >= limit:
+            break
+        if stat.size_diff <= 0 or _ignored(stat.traceback):
+            continue
+        shown += 1
+        frame = stat.traceback[-1]  # Frames run from the oldest to the allocating one
+        lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                     f"{frame.filename}:{frame.lineno}")
+        if tracebacks:
+            # Its callers, innermost first; without source lines, which would
+            # fill linecache and show up as growth themselves
+            lines.extend(f"        called from {caller.filename}:{caller.lineno}"
+                         for caller in reversed(stat.traceback[:-1]))
+    return lines or ["  (no growth)"]
+
+
+def _format_elapsed(seconds: float) -> str:
+    """Format seconds as h:mm:ss."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
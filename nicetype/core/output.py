@@ -0,0 +1,205 @@
+"""Synthetic keyboard output for NiceType."""
+
+import threading
+import time
+from typing import Optional
+
+from .timing import EchoTracker
+
+
+class EditScript:
+    """One text edit at the cursor, sent as a single burst of synthetic keys.
+
+    The edit deletes ``backspaces`` characters before the cursor, types
+    ``text`` and then moves the cursor ``cursor_left`` characters back (used
+    to land between an auto-completed pair).
+    """
+
+    __slots__ = ("backspaces", "text", "cursor_left")
+
+    def __init__(self, backspaces: int = 0, text: str = "", cursor_left: int = 0):
+        """Describe the edit."""
+        self.backspaces = backspaces
+        self.text = text
+        self.cursor_left = cursor_left
+
+    def __len__(self) -> int:
+        """Return the number of synthetic key presses in the script."""
+        return self.backspaces + len(self.text) + self.cursor_left
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, EditScript) and self.backspaces == other.backspaces
+                and self.text == other.text and self.cursor_left == other.cursor_left)
+
+    def __repr__(self) -> str:
+        return f"EditScript(backspaces={self.backspaces}, text={self.text!r}, cursor_left={self.cursor_left})"
+
+
+class OutputController:
+    """Long-lived owner of the pynput ``Controller`` used for all injections.
+
+    The controller is created on the first edit and reused afterwards. The
+    pause before the burst and between its individual key events is the
+    ``pacing`` of the :class:`EchoTracker`, which is also told about every
+    injected event so their echoes can be recognised and timed.
+    """
+
+    def __init__(self, timing: EchoTracker):
+        """Initialize the output controller."""
+        self.timing = timing
+        self.scripts_sent = 0
+        self.events_sent = 0
+        self._keyboard = None
+        self._controller: Optional[object] = None
+
+    def _get_controller(self):
+        """Create the pynput controller on first use."""
+        if self._controller is None:
+            from pynput import keyboard
+            self._keyboard = keyboard
+            self._controller = keyboard.Controller()
+        return self._controller
+
+    def send(self, script: EditScript):
+        """Play an edit script."""
+        controller = self._get_controller()
+        Key = self._keyboard.Key
+        timing = self.timing
+        pacing = timing.pacing
+        sent = timing.sent
+        sleep = time.sleep
+        now = time.monotonic
+
+        # Give the application time to receive the key that triggered the edit
+        if pacing:
+            sleep(pacing)
+
+        for _ in range(script.backspaces):
+            sent("backspace", now())
+            controller.press(Key.backspace)
+            controller.release(Key.backspace)
+            if pacing:
+                sleep(pacing)
+
+        if script.text:
+            started = now()
+            for char in script.text:
+                sent(char, started)
+            controller.type(script.text)
+
+        for _ in range(script.cursor_left):
+            if pacing:
+                sleep(pacing)
+            sent("left", now())
+            controller.press(Key.left)
+            controller.release(Key.left)
+
+        self.scripts_sent += 1
+        self.events_sent += len(script)
+
+
+class PendingEdits:
+    """Edits decided by the listener that the output worker has not typed yet.
+
+    Instead of queueing one edit script per trigger, the listener updates a
+    small virtual screen: the text around the cursor as the application has
+    it now and as it should look once everything pending is applied. Keys the
+    user types in between are applied to both. When the worker gets to it,
+    :meth:`take` diffs the two into a single :class:`EditScript`, so a burst of
+    completions and conversions costs one injection instead of one each.
+
+    Only the text touched since the last flush is kept; the keystroke history
+    supplies older characters when a conversion reaches back further than
+    that.
+    """
+
+    def __init__(self):
+        """Start with nothing pending."""
+        self.active = False
+        self.flush_queued = False
+        self.merged = 0  # Triggers folded into an already pending edit
+        self._lock = threading.Lock()
+        self._screen_before = ""
+        self._screen_after = ""
+        self._target_before = ""
+        self._target_after = ""
+
+    def _activate(self) -> bool:
+        """Start tracking if needed; return True if a flush must be scheduled."""
+        if self.active:
+            self.merged += 1
+        else:
+            self.active = True
+            self._screen_before = self._target_before = ""
+            self._screen_after = self._target_after = ""
+        if self.flush_queued:
+            return False
+        self.flush_queued = True
+        return True
+
+    def typed(self, char: str):
+        """The user typed ``char`` at the cursor."""
+        with self._lock:
+            if self.active:
+                self._screen_before += char
+                self._target_before += char
+
+    def deleted(self):
+        """The user pressed backspace."""
+        with self._lock:
+            if self.active:
+                self._screen_before = self._screen_before[:-1]
+                self._target_before = self._target_before[:-1]
+
+    def replace(self, length: int, replacement: str, char: str, history) -> bool:
+        """Replace the last ``length`` characters, ending with ``char`` just typed.
+
+        ``history`` holds the intended text before ``char``.
+        """
+        with self._lock:
+            schedule = self._activate()
+            missing = length - len(self._target_before)
+            if missing > 0:
+                # The pattern started before the tracked text; both screens share that part
+                prefix = (history.text(length - 1) + char)[:missing]
+                self._screen_before = prefix + self._screen_before
+                self._target_before = prefix + self._target_before
+            self._target_before = self._target_before[:len(self._target_before) - length] + replacement
+            return schedule
+
+    def complete(self, text: str) -> bool:
+        """Insert ``text``; a single character goes after the cursor (closing a pair)."""
+        with self._lock:
+            schedule = self._activate()
+            if len(text) == 1:
+                self._target_after = text + self._target_after
+            else:
+                self._target_before += text
+            return schedule
+
+    def discard(self):
+        """Forget pending edits (the cursor moved, so they no longer apply)."""
+        with self._lock:
+            self.active = False
+
+    def cancel(self):
+        """Forget pending edits whose flush could not be scheduled."""
+        with self._lock:
+            self.active = False
+            self.flush_queued = False
+
+    def take(self) -> EditScript:
+        """Return one script that turns the screen into the target, and reset."""
+        with self._lock:
+            self.flush_queued = False
+            if not self.active:
+                return EditScript()
+            self.active = False
+            screen, target = self._screen_before, self._target_before
+            common = 0
+            limit = min(len(screen), len(target))
+            while common < limit and screen[common] == target[common]:
+                common += 1
+            # Text after the cursor is only ever prepended to
+            extra = self._target_after[:len(self._target_after) - len(self._screen_after)]
+            return EditScript(len(screen) - common, target[common:] + extra, len(extra))
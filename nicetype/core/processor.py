@@ -1,10 +1,32 @@
 """Input processor for NiceType."""
 
+import threading
 import time
-from typing import Optional, Callable
-from pynput import keyboard
-from pynput.keyboard import Key, Listener, Controller
-from ..config.manager import config
+from typing import Optional, Callable, Mapping
+from ..config.manager import get_config
+from .history import KeystrokeHistory
+from .injector import TextInjector
+from .output import EditScript, OutputController, PendingEdits
+from .profiling import cpu_profiler
+from .rules import Match, RuleEngine
+from .stats import latency_stats
+from .timing import EchoTracker
+
+
+def _keyboard():
+    """Import pynput's keyboard module on first use.
+
+    Importing pynput loads the platform input backend (and fails without a
+    display on Linux), so it is deferred until listening actually starts.
+    """
+    from pynput import keyboard
+    return keyboard
+
+
+# Keys that neither type text nor move the cursor
+_PASSTHROUGH_KEYS = frozenset({"shift", "shift_l", "shift_r", "caps_lock"})
+# Settings the output timing is loaded from
+_TIMING_KEYS = frozenset({"injection_pacing", "injection_settle"})
 
 
 class InputProcessor:
@@ -12,20 +34,42 @@ class InputProcessor:
     
     def __init__(self):
         """Initialize the input processor."""
-        self.last_char = ""
-        self.last_char_time = 0
+        self._config = config = get_config()
+        self._history_capacity = config.get("history_capacity", 64)
+        self.history = KeystrokeHistory(self._history_capacity)
         self.char_timeout = 1.0  # 1 second timeout for consecutive characters
-        self.listener: Optional[Listener] = None
+        self.listener = None  # pynput Listener while running
         self.on_text_change: Optional[Callable[[str], None]] = None
-        self._inserting_text = False  # Flag to prevent recursive processing
         self._last_completion_char = None  # Track last completion to prevent infinite loops
+        self.injector: Optional[TextInjector] = None
+        self.timing = EchoTracker(config.get("injection_pacing", 0.005), config.get("injection_settle", 0.02))
+        self.output = OutputController(self.timing)
+        self.pending = PendingEdits()
+        self._char_down = None  # Last character pressed and not yet released (autorepeat detection)
+        self._unsubscribe: Optional[Callable[[], None]] = None
+        self._rules: Optional[RuleEngine] = None
+        self._rule_state = RuleEngine.ROOT  # State reached by the key being processed
+        self._key_press_latency = latency_stats.histogram("key_press")
+        self._rule_match_latency = latency_stats.histogram("rule_match")
+        self._replace_latency = latency_stats.histogram("replace_text")
+        self._insert_latency = latency_stats.histogram("insert_text")
         
     def start(self):
         """Start listening for keyboard input."""
         if self.listener is not None:
             return
+        
+        # Text injection runs on its own worker so the listener callback never sleeps
+        config = self._config
+        self.timing.reset(config.get("injection_pacing", 0.005), config.get("injection_settle", 0.02))
+        self._unsubscribe = config.subscribe(self._on_config_change)
+        self.injector = TextInjector(
+            maxsize=config.get("injection_queue_size", 64),
+            policy=config.get("injection_drop_policy", "drop_newest"),
+        )
+        self.injector.start()
             
-        self.listener = Listener(
+        self.listener = _keyboard().Listener(
             on_press=self._on_key_press,
             on_release=self._on_key_release
         )
@@ -33,9 +77,45 @@ class InputProcessor:
     
     def stop(self):
         """Stop listening for keyboard input."""
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
         if self.listener is not None:
             self.listener.stop()
             self.listener = None
+        if self.injector is not None:
+            self.injector.stop()
+            self.injector = None
+        # Stopping the injector dropped any queued flush; without this the
+        # next start would never schedule one again
+        self.pending.cancel()
+        self._save_timing()
+    
+    def _on_config_change(self, snapshot, changed):
+        """Apply timing edited elsewhere (calibration, settings, config.json) while running."""
+        if changed & _TIMING_KEYS:
+            config = self._config
+            self.timing.reset(config.get("injection_pacing", 0.005), config.get("injection_settle", 0.02))
+    
+    def _save_timing(self):
+        """Keep timing values adapted during this session for the next start."""
+        timing = self.timing
+        if not timing.changed:
+            return
+        self._config.update({
+            "injection_pacing": round(timing.pacing, 4),
+            "injection_settle": round(timing.settle, 4),
+        })
+        self._config.save()
+        timing.changed = False
+    
+    def get_injection_stats(self) -> dict:
+        """Get output queue counters (depth, drops, completed actions)."""
+        if self.injector is None:
+            return {}
+        stats = self.injector.stats()
+        stats["merged"] = self.pending.merged
+        return stats
     
     def set_text_change_callback(self, callback: Callable[[str], None]):
         """Set callback for text changes."""
@@ -43,85 +123,145 @@ class InputProcessor:
     
     def _on_key_press(self, key):
         """Handle key press events."""
-        if not config.is_enabled():
+        started = time.perf_counter_ns()
+        if cpu_profiler.active:
+            cpu_profiler.call("listener", self._process_key_press, key)
+        else:
+            self._process_key_press(key)
+        self._key_press_latency.record(time.perf_counter_ns() - started)
+    
+    def _process_key_press(self, key):
+        """Classify a key press and queue any conversion or completion."""
+        # One attribute load gives a consistent view of all settings for this key
+        snapshot = self._config.snapshot
+        if not snapshot.enabled:
             return
             
-        # Skip processing if we're currently inserting text to prevent recursion
-        if self._inserting_text:
+        # Drop exactly the echoes of our own synthetic keys; the user's keys
+        # always go through, even while a burst is being typed
+        if self.timing.has_pending() and self.timing.echoed(key, time.monotonic()):
             return
             
-        # Convert key to character if possible
-        char = self._key_to_char(key)
+        # Special keys (pynput Key members) have no character
+        char = getattr(key, "char", None)
         if char is None:
-            # Reset last char for non-character keys to avoid stale state
-            self.last_char = ""
-            # Also reset completion state for navigation keys
-            self._last_completion_char = None
+            self._char_down = None
+            self._on_special_key(key)
             return
             
-        current_time = time.time()
+        current_time = time.monotonic()
+        pending = self.pending
+        if pending.active:
+            pending.typed(char)
+        
+        # A character pressed again without being released is the keyboard's autorepeat
+        repeated = char == self._char_down
+        self._char_down = char
+        if repeated or char not in snapshot.trigger_chars:
+            # Held keys only repeat the character, and most characters (letters,
+            # digits) appear in no rule and no completion: just remember them
+            self._rule_state = RuleEngine.ROOT
+            self.history.push(char, current_time, RuleEngine.ROOT)
+            return
         
         # Check for punctuation conversion first (higher priority)
-        if config.is_punctuation_conversion_enabled():
-            converted_text = self._check_punctuation_conversion(char, current_time)
-            if converted_text:
-                self._replace_text(converted_text)
-                # Reset last char after conversion to prevent further processing
-                self.last_char = ""
-                self.last_char_time = current_time
+        if snapshot.punctuation_conversion_enabled:
+            match = self._check_punctuation_conversion(char, current_time, snapshot.rules)
+            if match:
+                pattern_length, converted_text = match
+                if pending.replace(pattern_length, converted_text, char, self.history):
+                    self._submit(self._flush_edits)
+                self._record_replacement(pattern_length, converted_text, current_time)
                 return
+        else:
+            self._rule_state = RuleEngine.ROOT
         
         # Check for auto-completion
-        if config.is_auto_complete_enabled():
-            completion = self._check_auto_completion(char)
-            if completion:
-                self._insert_text(completion)
+        if snapshot.auto_complete_enabled:
+            completion = self._check_auto_completion(char, snapshot.auto_complete_pairs)
+            if completion and pending.complete(completion):
+                self._submit(self._flush_edits)
+        
+        # Remember the character together with the rule state it led to
+        self.history.push(char, current_time, self._rule_state)
+    
+    def _on_special_key(self, key):
+        """Update the keystroke history for a non-character key."""
+        name = getattr(key, "name", None)
+        if name in _PASSTHROUGH_KEYS:
+            return
         
-        # Update last character and time
-        self.last_char = char
-        self.last_char_time = current_time
+        if name == "backspace":
+            # The character before the cursor is gone; its predecessor's state is current again
+            self.history.pop()
+            if self.pending.active:
+                self.pending.deleted()
+        else:
+            # Navigation and editing keys move the cursor away from the typed text
+            self.history.clear()
+            if self.pending.active:
+                self.pending.discard()
+        # Also reset completion state for navigation keys
+        self._last_completion_char = None
+    
+    def _record_replacement(self, pattern_length: int, replacement: str, current_time: float):
+        """Mirror a conversion in the history: the pattern is replaced by its output."""
+        # The final pattern character was never pushed
+        for _ in range(pattern_length - 1):
+            self.history.pop()
+        # Converted text never takes part in a further conversion
+        for char in replacement:
+            self.history.push(char, current_time, RuleEngine.ROOT)
+        self._rule_state = RuleEngine.ROOT
+    
+    def _submit(self, action, *args):
+        """Hand an injection action to the output worker."""
+        if self.injector is None:
+            # Not listening (e.g. driven directly); run inline
+            action(*args)
+            return
+        if not self.injector.submit(action, *args):
+            # Dropped by backpressure; the edits it would have applied are dropped too
+            self.pending.cancel()
     
     def _on_key_release(self, key):
         """Handle key release events."""
-        pass
+        self._char_down = None
     
-    def _key_to_char(self, key) -> Optional[str]:
-        """Convert key object to character string."""
-        try:
-            # Handle regular characters
-            if hasattr(key, 'char') and key.char is not None:
-                return key.char
-            # Handle special keys if needed
-            return None
-        except AttributeError:
-            return None
-    
-    def _check_punctuation_conversion(self, char: str, current_time: float) -> Optional[str]:
-        """Check if current character should trigger punctuation conversion."""
-        # Check if we have a previous character within timeout
-        if (current_time - self.last_char_time) > self.char_timeout:
-            return None
-            
-        # Check if current char matches last char for conversion
-        double_char = self.last_char + char
-        punctuation_mapping = config.get_punctuation_mapping()
+    def _check_punctuation_conversion(self, char: str, current_time: float,
+                                      rules: RuleEngine) -> Optional[Match]:
+        """Advance the rule engine and return the rule completed by ``char``, if any."""
+        started = time.perf_counter_ns()
+        if rules is not self._rules:
+            # Mapping changed; states of the old automaton are meaningless
+            self._rules = rules
+            self._fit_history(rules)
+            self.history.clear()
         
-        # Try exact match first
-        if double_char in punctuation_mapping:
-            return punctuation_mapping[double_char]
+        # Every character of a pattern must follow the previous one within the timeout
+        history = self.history
+        if (current_time - history.last_time()) > self.char_timeout:
+            state = RuleEngine.ROOT
+        else:
+            state = history.last_state()
         
-        # Also try case-insensitive matching if configured
-        if not config.get("case_sensitive", False):
-            for pattern, replacement in punctuation_mapping.items():
-                if pattern.lower() == double_char.lower():
-                    return replacement
-                    
-        return None
+        self._rule_state = rules.step(state, char)
+        match = rules.match(self._rule_state)
+        self._rule_match_latency.record(time.perf_counter_ns() - started)
+        return match
     
-    def _check_auto_completion(self, char: str) -> Optional[str]:
-        """Check if current character should trigger auto-completion."""
-        auto_complete_pairs = config.get_auto_complete_pairs()
+    def _fit_history(self, rules: RuleEngine):
+        """Make the history long enough to hold the longest pattern of ``rules``.
         
+        A conversion deletes its whole pattern, and what was typed before the
+        pending edits comes from the history; a shorter one loses characters.
+        """
+        capacity = max(self._history_capacity, rules.max_pattern_length)
+        if capacity != self.history.capacity:
+            self.history = KeystrokeHistory(capacity)
+    
+    def _check_auto_completion(self, char: str, auto_complete_pairs: Mapping[str, str]) -> Optional[str]:
+        """Check if current character should trigger auto-completion."""
         if char in auto_complete_pairs:
             completion_char = auto_complete_pairs[char]
             # Prevent infinite recursion: if the completion is the same as input, 
@@ -140,75 +280,48 @@ class InputProcessor:
             
         return None
     
-    def _replace_text(self, replacement: str):
-        """Replace the last two characters with the replacement text."""
-        try:
-            # Set flag to prevent recursive processing
-            self._inserting_text = True
-            
-            # Small delay to ensure proper timing
-            time.sleep(0.01)
-            
-            # Send backspace twice to remove the two characters
-            controller = Controller()
-            controller.press(Key.backspace)
-            controller.release(Key.backspace)
-            time.sleep(0.01)  # Small delay between operations
-            controller.press(Key.backspace)
-            controller.release(Key.backspace)
-            time.sleep(0.01)
-            
-            # Type the replacement character
-            controller.type(replacement)
-            
-            if self.on_text_change:
-                self.on_text_change(replacement)
-                
-        except Exception as e:
-            print(f"Error replacing text: {e}")
-        finally:
-            # Always clear the flag with a small delay
-            time.sleep(0.02)
-            self._inserting_text = False
+    def _flush_edits(self):
+        """Type everything pending as one edit script (runs on the output worker)."""
+        script = self.pending.take()
+        if not len(script):
+            return
+        if script.backspaces:
+            self._apply_edit(script, self._replace_latency, "replacing")
+        else:
+            self._apply_edit(script, self._insert_latency, "inserting")
     
-    def _insert_text(self, text: str):
-        """Insert text at current cursor position."""
+    def _apply_edit(self, script: EditScript, histogram, action: str):
+        """Send an edit script through the shared output controller."""
+        started = time.perf_counter_ns()
         try:
-            # Set flag to prevent recursive processing
-            self._inserting_text = True
-            
-            # Small delay to ensure proper timing
-            time.sleep(0.01)
-            
-            controller = Controller()
-            
-            # For better cursor positioning, especially with quotes,
-            # we need to ensure the cursor ends up between the paired characters
-            controller.type(text)
-            
-            # Move cursor back to position between brackets/quotes for better UX
-            # For auto-completion pairs, position cursor in the middle
-            if len(text) == 1:  # Single character completion
-                time.sleep(0.01)  # Small delay before moving cursor
-                # Use precise cursor movement to avoid selection issues
-                # Ensure no modifier keys are held when moving cursor
-                try:
-                    controller.press(Key.left)
-                    controller.release(Key.left)
-                except:
-                    # Fallback in case of key press issues
-                    pass
+            # Every event is queued as an expected echo, so no recursion guard is needed
+            self.output.send(script)
             
             if self.on_text_change:
-                self.on_text_change(text)
+                self.on_text_change(script.text)
                 
         except Exception as e:
-            print(f"Error inserting text: {e}")
+            print(f"Error {action} text: {e}")
         finally:
-            # Always clear the flag with a small delay
-            time.sleep(0.02)
-            self._inserting_text = False
+            histogram.record(time.perf_counter_ns() - started)
+
+
+_input_processor: Optional[InputProcessor] = None
+_input_processor_lock = threading.Lock()
+
+
+def get_input_processor() -> InputProcessor:
+    """Get the global input processor, creating it on first use."""
+    global _input_processor
+    if _input_processor is None:
+        with _input_processor_lock:
+            if _input_processor is None:
+                _input_processor = InputProcessor()
+    return _input_processor
 
 
-# Global input processor instance
-input_processor = InputProcessor()
\ No newline at end of file
+def __getattr__(name):
+    """Create the global ``input_processor`` lazily."""
+    if name == "input_processor":
+        return get_input_processor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""On-demand CPU profiling of the listener, injection and GUI threads."""
+
+import atexit
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Seconds between writes of the profiles while profiling is on
+WRITE_INTERVAL = 60.0
+# Paths deeper than this are cut off in the collapsed stacks
+_MAX_DEPTH = 64
+# Before Python 3.12 cProfile hooks a single thread; from 3.12 on it profiles
+# every thread at once, so only the per-call hooks are used there
+_PER_THREAD = sys.version_info < (3, 12)
+
+# pstats key of a function: (file, line, name)
+Function = Tuple[str, int, str]
+
+
+def default_profile_dir() -> Path:
+    """Return the directory the profiles are written to."""
+    return Path.home() / ".nicetype" / "profiles"
+
+
+class CpuProfiler:
+    """cProfile data per thread, collected only while switched on.
+
+    The key path checks :attr:`active` inline before calling :meth:`call`,
+    so a disabled profiler costs one attribute load per key and nothing is
+    imported. Loops that own their thread (the Tk loop) call
+    :meth:`sync_thread` periodically instead, which profiles the whole
+    thread while active. From Python 3.12 only one profiler runs at a time,
+    so there the Tk loop wraps each work item in :meth:`call`, and calls
+    overlapping one already profiled on another thread are counted in
+    :attr:`skipped` and run unprofiled (see :meth:`coverage_note`).
+
+    Every ``WRITE_INTERVAL`` seconds, and when profiling stops, each profile
+    is written to ``<name>.pstats`` (load with :mod:`pstats`, snakeviz, ...)
+    and ``<name>.collapsed`` (``frame;frame;frame microseconds`` lines for
+    flamegraph.pl or speedscope).
+    """
+
+    def __init__(self):
+        """Create a disabled profiler."""
+        self.active = False
+        self.directory = default_profile_dir()
+        self.interval = WRITE_INTERVAL
+        self.skipped = 0  # Calls left unprofiled because another profiler was running
+        self._profiles: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._exit_hook = False
+
+    def start(self, interval: Optional[float] = None, directory: Optional[Path] = None):
+        """Start collecting fresh profiles and writing them periodically."""
+        with self._lock:
+            if self.active:
+                return
+            if interval is not None:
+                self.interval = interval
+            if directory is not None:
+                self.directory = Path(directory)
+            self._profiles = {}
+            self.skipped = 0
+            self._stop.clear()
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="NiceTypeProfileWriter", daemon=True)
+            self._thread.start()
+            if not self._exit_hook:
+                atexit.register(self.stop)
+                self._exit_hook = True
+
+    def stop(self):
+        """Stop collecting and write the profiles one last time."""
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            self._stop.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(5.0)
+        self.write()
+        if self.skipped:
+            print(f"{self.skipped} calls were not profiled: another thread was being profiled at the same time")
+
+    def coverage_note(self) -> Optional[str]:
+        """Say what this Python leaves out of the profiles, or None if nothing."""
+        if _PER_THREAD:
+            return None
+        return ("On Python 3.12+ Tk event handlers are not profiled (only work handed to the GUI thread), "
+                "and a call overlapping one profiled on another thread is skipped")
+
+    def toggle(self) -> bool:
+        """Switch profiling on or off; return the new state."""
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+        return self.active
+
+    def _profile(self, name: str):
+        """Return the profile called ``name``, creating it on first use."""
+        profile = self._profiles.get(name)
+        if profile is None:
+            import cProfile
+
+            with self._lock:
+                profile = self._profiles.setdefault(name, cProfile.Profile())
+        return profile
+
+    def call(self, name: str, func: Callable[..., Any], *args) -> Any:
+        """Run ``func(*args)`` and add its cost to profile ``name``."""
+        local = self._local
+        if getattr(local, "busy", False) or getattr(local, "thread_profile", None) is not None:
+            # Already profiled further up this thread
+            return func(*args)
+        profile = self._profile(name)
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is active (Python 3.12+ allows only one at a time)
+            self.skipped += 1
+            return func(*args)
+        local.busy = True
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            local.busy = False
+
+    def sync_thread(self, name: str):
+        """Profile the calling thread as ``name`` while active; call it regularly on that thread."""
+        local = self._local
+        current = getattr(local, "thread_profile", None)
+        wanted = self._profile(name) if self.active and _PER_THREAD else None
+        if current is wanted:
+            return
+        if current is not None:
+            current.disable()
+        local.thread_profile = None
+        if wanted is not None:
+            try:
+                wanted.enable()
+            except ValueError:
+                self.skipped += 1
+                return
+            local.thread_profile = wanted
+
+    def _run(self):
+        """Writer loop."""
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        """Write every profile collected so far."""
+        from ..config.persistence import atomic_writer
+        import marshal
+
+        for name, profile in list(self._profiles.items()):
+            # snapshot_stats() reads the data without disabling the profile
+            # (create_stats() would disable it on the wrong thread)
+            profile.snapshot_stats()
+            stats = profile.stats
+            if not stats:
+                continue
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                with atomic_writer(self.directory / f"{name}.pstats", binary=True) as f:
+                    marshal.dump(stats, f)
+                with atomic_writer(self.directory / f"{name}.collapsed") as f:
+                    for line in collapsed_stacks(stats):
+                        f.write(line + "\n")
+            except (OSError, ValueError) as e:
+                print(f"Error saving CPU profile {name}: {e}")
+
+
+def _label(function: Function) -> str:
+    """Name a function for a flame graph frame."""
+    filename, line, name = function
+    if filename == "~":
+        return name.replace(";", ",")  # Built-in
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def _is_profiler(function: Function) -> bool:
+    """Return True for the profiler's own bookkeeping seen at the edge of a profile."""
+    return function[0] == __file__ or function[2] == "<method 'disable' of '_lsprof.Profiler' objects>"
+
+
+def collapsed_stacks(stats: Dict[Function, tuple]) -> Iterator[str]:
+    """Turn pstats data into collapsed stacks weighted by microseconds of own time.
+
+    cProfile only records caller/callee pairs, so full stacks are rebuilt by
+    walking down from the outermost calls, splitting each function's time
+    over its callers in proportion to the time spent through them (as
+    flameprof and similar tools do). Recursion is cut at the first repeat.
+    """
+    children: Dict[Function, List[Tuple[Function, float]]] = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((function, edge[3]))
+    # Time not accounted for by recorded callers was spent in calls made from
+    # above the point where profiling started (or from outside any hook)
+    roots: Dict[Function, float] = {}
+    for function, (_, _, _, cumulative, callers) in stats.items():
+        unaccounted = cumulative - sum(edge[3] for edge in callers.values())
+        if unaccounted > 0 and not _is_profiler(function):
+            roots[function] = unaccounted
+    total = sum(roots.values())
+    # Paths carrying less than this are dropped, bounding the output size
+    threshold = max(1e-6, total / 100000)
+
+    stack: List[str] = []
+    seen: set = set()
+
+    def walk(function: Function, budget: float) -> Iterator[str]:
+        _, _, own, cumulative, _ = stats[function]
+        scale = budget / cumulative if cumulative > 0 else 0.0
+        stack.append(_label(function))
+        seen.add(function)
+        own_time = own * scale
+        if own_time >= threshold:
+            yield f"{';'.join(stack)} {max(1, round(own_time * 1e6))}"
+        if len(stack) < _MAX_DEPTH:
+            for child, edge_time in children.get(function, ()):
+                if child not in seen and edge_time * scale >= threshold:
+                    yield from walk(child, edge_time * scale)
+        seen.discard(function)
+        stack.pop()
+
+    for root, budget in sorted(roots.items(), key=lambda item: -item[1]):
+        if budget >= threshold:
+            yield from walk(root, budget)
+
+
+# Global profiler; switched on by --profile or the tray menu
+cpu_profiler = CpuProfiler()
@@ -0,0 +1,228 @@
+"""Compiled rule engine for punctuation conversion."""
+
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# (pattern length, replacement) reported when a rule matches
+Match = Tuple[int, str]
+# (matched text, replacement) -> number of conversions, collected by feed()
+Hits = Dict[Tuple[str, str], int]
+
+# Characters typed with Space/Enter/Tab; those keys clear the history while
+# typing, so no rule spans them in batch conversion either
+BREAKS = frozenset(" \r\n\t")
+
+
+def _check_states(count: int, *columns: Iterable[Any]):
+    """Raise ValueError unless every value in ``columns`` is a state number below ``count``."""
+    values = list(chain(*columns))
+    # Whole-column passes in C; the tables have tens of thousands of entries
+    if values and (not set(map(type, values)) <= {int} or min(values) < 0 or max(values) >= count):
+        raise ValueError("invalid state numbers in compiled rules")
+
+
+def _load_matches(column: List[Any]) -> List[Optional[Match]]:
+    """Turn the JSON form of an output column back into matches, checking their types."""
+    output = [found if found is None else tuple(found) for found in column]
+    found = [match for match in output if match is not None]
+    if found and (set(map(len, found)) != {2} or not set(map(type, map(itemgetter(0), found))) <= {int}
+                  or not set(map(type, map(itemgetter(1), found))) <= {str}):
+        raise ValueError("invalid matches in compiled rules")
+    return output
+
+
+def _char_variants(char: str, case_sensitive: bool) -> List[str]:
+    """Return the edge labels a pattern character should accept."""
+    if case_sensitive:
+        return [char]
+    variants = [char]
+    for variant in (char.lower(), char.upper()):
+        # Some characters change length when case-mapped (e.g. 'ß'); skip those
+        if len(variant) == 1 and variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+class RuleEngine:
+    """Aho-Corasick automaton over the punctuation mapping.
+
+    Patterns may be any length. The engine is fed one typed character at a
+    time with :meth:`step`; the work per key is independent of the number of
+    rules. When several patterns end on the same character the longest one
+    wins. Case-insensitive matching is handled by adding the case variants
+    of every pattern character as edges at compile time, so no case mapping
+    happens while typing.
+    """
+
+    ROOT = 0
+    name = "automaton"
+
+    def __init__(self, mapping: Dict[str, str], case_sensitive: bool = False):
+        """Compile the mapping into an automaton."""
+        self.case_sensitive = case_sensitive
+        self.rule_count = 0
+        self.max_pattern_length = 0
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [self.ROOT]
+        self._output: List[Optional[Match]] = [None]
+        self._depth: List[int] = [0]
+
+        for pattern, replacement in mapping.items():
+            self._add_pattern(pattern, replacement)
+        self._build_failure_links()
+        # Any other character always leads back to ROOT without a match
+        self.alphabet = frozenset(char for edges in self._goto for char in edges)
+
+    def __len__(self) -> int:
+        """Return the number of compiled rules."""
+        return self.rule_count
+
+    @property
+    def state_count(self) -> int:
+        """Return the number of automaton states."""
+        return len(self._goto)
+
+    def to_data(self) -> Dict[str, Any]:
+        """Return the compiled tables as plain JSON data (see :meth:`from_data`)."""
+        return {
+            "case_sensitive": self.case_sensitive,
+            "rule_count": self.rule_count,
+            "max_pattern_length": self.max_pattern_length,
+            "goto": self._goto,
+            "fail": self._fail,
+            "output": self._output,
+            "depth": self._depth,
+        }
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "RuleEngine":
+        """Rebuild an engine from :meth:`to_data` without compiling the rules again.
+
+        The tables are checked first; inconsistent data raises (ValueError,
+        TypeError, KeyError, ...) instead of failing later on the key path.
+        """
+        engine = cls.__new__(cls)
+        engine.case_sensitive = bool(data["case_sensitive"])
+        engine.rule_count = int(data["rule_count"])
+        engine.max_pattern_length = int(data["max_pattern_length"])
+        goto = data["goto"]
+        count = len(goto)
+        if not count or not len(data["fail"]) == len(data["output"]) == len(data["depth"]) == count:
+            raise ValueError("compiled rule tables differ in length")
+        if not set(map(type, goto)) <= {dict}:
+            raise ValueError("invalid transitions in compiled rules")
+        _check_states(count, chain.from_iterable(map(dict.values, goto)), data["fail"])
+        _check_states(engine.max_pattern_length + 1, data["depth"])
+        engine._goto = goto
+        engine._fail = data["fail"]
+        engine._depth = data["depth"]
+        engine._output = _load_matches(data["output"])
+        engine.alphabet = frozenset(chain.from_iterable(goto))
+        return engine
+
+    def _add_pattern(self, pattern: str, replacement: str):
+        """Insert a pattern into the trie."""
+        if not pattern:
+            return
+
+        state = self.ROOT
+        for char in pattern:
+            edges = self._goto[state]
+            next_state = edges.get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(self.ROOT)
+                self._output.append(None)
+                self._depth.append(self._depth[state] + 1)
+                for variant in _char_variants(char, self.case_sensitive):
+                    edges.setdefault(variant, next_state)
+            state = next_state
+
+        # First rule wins when patterns collide (e.g. differ only by case)
+        if self._output[state] is None:
+            self._output[state] = (len(pattern), replacement)
+            self.rule_count += 1
+            self.max_pattern_length = max(self.max_pattern_length, len(pattern))
+
+    def _build_failure_links(self):
+        """Compute failure links and propagate the longest suffix match."""
+        queue = list(dict.fromkeys(self._goto[self.ROOT].values()))
+        visited = set(queue)
+        index = 0
+        while index < len(queue):
+            state = queue[index]
+            index += 1
+            for char, child in self._goto[state].items():
+                if child in visited:
+                    # Already reached through another case variant
+                    continue
+                visited.add(child)
+                queue.append(child)
+
+                fallback = self._fail[state]
+                while fallback != self.ROOT and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, self.ROOT)
+                self._fail[child] = target if target != child else self.ROOT
+
+                # A state's own pattern is always the longest suffix ending here
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+
+    def step(self, state: int, char: str) -> int:
+        """Advance the automaton by one typed character."""
+        goto = self._goto
+        fail = self._fail
+        while True:
+            next_state = goto[state].get(char)
+            if next_state is not None:
+                return next_state
+            if state == self.ROOT:
+                return self.ROOT
+            state = fail[state]
+
+    def match(self, state: int) -> Optional[Match]:
+        """Return the longest rule ending at ``state``, if any."""
+        return self._output[state]
+
+    def depth(self, state: int) -> int:
+        """Return how many of the latest characters ``state`` stands for."""
+        return self._depth[state]
+
+    def feed(self, held: str, chunk: str, state: int, hits: Hits) -> Tuple[str, str, int]:
+        """Convert the next piece of a text stream.
+
+        ``held`` is what the previous call held back (already reflected in
+        ``state``). Returns the converted text that is final, the characters
+        to hold back for the next call, and the new state.
+        """
+        step = self.step
+        match = self._output.__getitem__
+        root = self.ROOT
+        # The held characters were already fed; ``state`` accounts for them
+        text = held + chunk
+        out: List[str] = []
+        emitted = 0
+
+        for index, char in enumerate(chunk, len(held) + 1):
+            if char in BREAKS:
+                state = root
+                continue
+            state = step(state, char)
+            found = match(state)
+            if found is not None:
+                length, replacement = found
+                out.append(text[emitted:index - length])
+                out.append(replacement)
+                emitted = index
+                state = root
+                rule = (text[index - length:index], replacement)
+                hits[rule] = hits.get(rule, 0) + 1
+
+        # Hold back the characters the automaton may still extend into a pattern
+        keep = max(emitted, len(text) - self._depth[state])
+        out.append(text[emitted:keep])
+        return "".join(out), text[keep:], state
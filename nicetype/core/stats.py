@@ -0,0 +1,221 @@
+"""Latency statistics for NiceType."""
+
+import json
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Each power-of-two range is split into this many linear sub-buckets, giving
+# about 3% relative precision (the same layout as an HDR histogram).
+_SUB_BUCKET_BITS = 5
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+# Values up to 2**40 ns (about 18 minutes); larger values land in the last bucket
+_MAX_MAGNITUDE = 40
+_BUCKET_COUNT = 2 * _SUB_BUCKETS + (_MAX_MAGNITUDE - _SUB_BUCKET_BITS - 1) * _SUB_BUCKETS
+
+
+def _bucket_index(value: int) -> int:
+    """Map a value in nanoseconds to its bucket."""
+    if value < 2 * _SUB_BUCKETS:
+        return value if value > 0 else 0
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    # Equivalent to 2*S + (shift - 1)*S + (value >> shift) - S for S sub-buckets
+    index = (shift << _SUB_BUCKET_BITS) + (value >> shift)
+    return index if index < _BUCKET_COUNT else _BUCKET_COUNT - 1
+
+
+def _bucket_value(index: int) -> int:
+    """Return the highest value that falls into a bucket."""
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = (index - 2 * _SUB_BUCKETS) // _SUB_BUCKETS + 1
+    sub_bucket = (index - 2 * _SUB_BUCKETS) % _SUB_BUCKETS + _SUB_BUCKETS
+    return ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Constant-memory histogram of durations in nanoseconds.
+
+    Recording is a couple of integer operations and never allocates. Each
+    histogram is meant to be written from one thread; concurrent writers may
+    occasionally lose a count, which is acceptable for diagnostics.
+    """
+
+    def __init__(self, name: str):
+        """Create an empty histogram."""
+        self.name = name
+        self._counts = array("Q", [0]) * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        """Record one duration in nanoseconds."""
+        # _bucket_index() inlined; this runs several times per key press
+        if value < 2 * _SUB_BUCKETS:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+            index = (shift << _SUB_BUCKET_BITS) + (value >> shift)
+            if index >= _BUCKET_COUNT:
+                index = _BUCKET_COUNT - 1
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def min(self) -> int:
+        """Return the lower bound of the smallest recorded value."""
+        for index, bucket_count in enumerate(self._counts):
+            if bucket_count:
+                return _bucket_value(index - 1) + 1 if index else 0
+        return 0
+
+    def reset(self):
+        """Forget all recorded values."""
+        for index in range(_BUCKET_COUNT):
+            self._counts[index] = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def percentile(self, percent: float) -> int:
+        """Return the value at or below which ``percent`` of samples fall."""
+        if self.count == 0:
+            return 0
+        threshold = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= threshold:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add another histogram's samples into this one."""
+        for index, bucket_count in enumerate(other._counts):
+            if bucket_count:
+                self._counts[index] += bucket_count
+        if other.count:
+            self.max = max(self.max, other.max)
+            self.count += other.count
+            self.total += other.total
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize the histogram (times in microseconds) with its raw buckets."""
+        return {
+            "count": self.count,
+            "min_us": self.min / 1000.0,
+            "mean_us": (self.total / self.count / 1000.0) if self.count else 0.0,
+            "p50_us": self.percentile(50) / 1000.0,
+            "p90_us": self.percentile(90) / 1000.0,
+            "p99_us": self.percentile(99) / 1000.0,
+            "p999_us": self.percentile(99.9) / 1000.0,
+            "max_us": self.max / 1000.0,
+            "total_ns": self.total,
+            "buckets": {str(index): count for index, count in enumerate(self._counts) if count},
+        }
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict[str, Any]) -> "LatencyHistogram":
+        """Rebuild a histogram from :meth:`to_dict` output."""
+        histogram = cls(name)
+        for index, bucket_count in data.get("buckets", {}).items():
+            index = int(index)
+            if 0 <= index < _BUCKET_COUNT:
+                histogram._counts[index] = int(bucket_count)
+        histogram.count = int(data.get("count", 0))
+        histogram.total = int(data.get("total_ns", 0))
+        histogram.max = int(round(data.get("max_us", 0.0) * 1000))
+        return histogram
+
+
+class LatencyStats:
+    """Named latency histograms for the key path and text injection."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        """Get (or create) the histogram called ``name``."""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, LatencyHistogram(name))
+        return histogram
+
+    def reset(self):
+        """Reset every histogram."""
+        for histogram in list(self._histograms.values()):
+            histogram.reset()
+        self.started_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize all histograms."""
+        return {
+            "started_at": self.started_at,
+            "written_at": time.time(),
+            "histograms": {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())},
+        }
+
+    def dump(self, path: Optional[Path] = None):
+        """Write the statistics to ``path`` (``~/.nicetype/stats.json`` by default)."""
+        path = Path(path) if path is not None else default_stats_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except IOError as e:
+            print(f"Error saving statistics: {e}")
+
+    def format_report(self) -> str:
+        """Render the statistics as a text table."""
+        return format_report(self.to_dict())
+
+
+def default_stats_path() -> Path:
+    """Return the location of the statistics dump."""
+    return Path.home() / ".nicetype" / "stats.json"
+
+
+def load_stats(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Read a statistics dump, or return None if there is none."""
+    path = Path(path) if path is not None else default_stats_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def format_report(data: Dict[str, Any]) -> str:
+    """Render a statistics dump as a text table."""
+    lines = [f"{'histogram':<14}{'count':>9}{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'max':>10}"]
+    for name, summary in data.get("histograms", {}).items():
+        if not summary.get("count"):
+            continue
+        lines.append(
+            f"{name:<14}{summary['count']:>9}"
+            + "".join(f"{_format_us(summary[key]):>10}" for key in ("p50_us", "p90_us", "p99_us", "p999_us", "max_us"))
+        )
+    if len(lines) == 1:
+        lines.append("(no samples recorded yet)")
+    return "\n".join(lines)
+
+
+def _format_us(value: float) -> str:
+    """Format a duration given in microseconds."""
+    if value >= 1000.0:
+        return f"{value / 1000.0:.1f}ms"
+    return f"{value:.1f}us"
+
+
+# Global statistics instance
+latency_stats = LatencyStats()
@@ -0,0 +1,234 @@
+"""Injection timing: echo tracking and calibration for NiceType."""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Bounds for the values chosen by calibration and online adaptation (seconds)
+MIN_SETTLE = 0.002
+MAX_PACING = 0.05
+MAX_SETTLE = 0.25
+# Clean echoes needed before pacing is relaxed again
+_RELAX_AFTER = 64
+# Expired events without a single echo before we stop expecting echoes at all
+_NO_ECHO_LIMIT = 32
+
+
+def key_token(key) -> Optional[str]:
+    """Return the character or key name that identifies a pynput key event."""
+    char = getattr(key, "char", None)
+    if char is not None:
+        return char
+    return getattr(key, "name", None)
+
+
+class EchoTracker:
+    """Queue of expected echoes of synthetic key events.
+
+    The output side calls :meth:`sent` for every event it injects; each one
+    is queued with a sequence number and a deadline ``settle`` seconds
+    ahead. The listener calls :meth:`echoed` for every key it sees: a key
+    that matches a queued event is our own echo and is removed and dropped,
+    anything else is the user's and goes through, even in the middle of a
+    burst. Events still unmatched at their deadline are forgotten. On a
+    desktop that never echoes synthetic keys, nothing is queued any more
+    once that has become clear.
+
+    Round-trip times are sampled, and two timing values are adapted from
+    what happens:
+
+    * ``pacing`` - pause between the events of one burst. It is doubled when
+      echoes arrive out of order and slowly relaxed back towards its
+      calibrated floor after a long run of clean echoes.
+    * ``settle`` - how long an echo is waited for. It is raised when an echo
+      takes more than half of it, or when events expire on a desktop that
+      does echo.
+    """
+
+    def __init__(self, pacing: float = 0.005, settle: float = 0.02):
+        """Start from the configured (or calibrated) values."""
+        self.pacing = pacing
+        self.settle = settle
+        self.floor = pacing  # Pacing never relaxes below the calibrated value
+        self.expecting = True  # False once the desktop turned out not to echo
+        self.echoes = 0
+        self.late = 0
+        self.out_of_order = 0
+        self.lost = 0
+        self.changed = False  # Adapted since the values were loaded
+        self._clean = 0
+        self._sequence = 0
+        self._last_echoed = 0  # Highest sequence number echoed so far
+        self._pending = deque()  # (sequence, token, sent_at, deadline)
+        self._lock = threading.Lock()
+        self._rtts = deque(maxlen=256)
+
+    def reset(self, pacing: float, settle: float):
+        """Replace the timing values (after calibration or a config change)."""
+        self.pacing = self.floor = pacing
+        self.settle = settle
+        self.changed = False
+        self._clean = 0
+
+    def sent(self, token: str, sent_at: float) -> int:
+        """Queue an injected event whose echo is expected; return its sequence number."""
+        with self._lock:
+            self._sequence += 1
+            if self.expecting:
+                self._pending.append((self._sequence, token, sent_at, sent_at + self.settle))
+            return self._sequence
+
+    def has_pending(self) -> bool:
+        """Return True while echoes are outstanding (cheap; no lock)."""
+        return bool(self._pending)
+
+    def echoed(self, key, now: float) -> bool:
+        """Account for a key seen by the listener; return True if it is our own echo."""
+        token = key_token(key)
+        with self._lock:
+            pending = self._pending
+            expired = 0
+            while pending and pending[0][3] < now:
+                pending.popleft()
+                expired += 1
+            for index, entry in enumerate(pending):
+                if entry[1] == token:
+                    break
+            else:
+                entry = None
+            if entry is not None:
+                del pending[index]
+
+        if expired:
+            self.lost += expired
+            if self.echoes:
+                # Echoes do come back here, just slower than the deadline
+                self._adapt(settle=min(MAX_SETTLE, self.settle * 1.5))
+            elif self.lost >= _NO_ECHO_LIMIT:
+                self.expecting = False
+        if entry is None:
+            return False
+
+        sequence, _, sent_at, _ = entry
+        rtt = now - sent_at
+        self.echoes += 1
+        self._rtts.append(rtt)
+        if sequence < self._last_echoed:
+            # Events overtook each other: slow the bursts down
+            self.out_of_order += 1
+            self._adapt(pacing=min(MAX_PACING, max(self.pacing * 2, 0.001)))
+        elif rtt > self.settle / 2:
+            # Close to the deadline; leave more room before echoes get mistaken for input
+            self.late += 1
+            self._adapt(settle=min(MAX_SETTLE, max(self.settle * 1.5, rtt * 2)))
+        else:
+            self._clean += 1
+            if self._clean >= _RELAX_AFTER and self.pacing > self.floor:
+                self._adapt(pacing=max(self.floor, self.pacing * 0.8))
+        self._last_echoed = max(self._last_echoed, sequence)
+        return True
+
+    def _adapt(self, pacing: Optional[float] = None, settle: Optional[float] = None):
+        """Apply new timing values."""
+        if pacing is not None:
+            self.pacing = pacing
+        if settle is not None:
+            self.settle = settle
+        self.changed = True
+        self._clean = 0
+
+    def percentile_rtt(self, fraction: float) -> float:
+        """Return a round-trip time percentile in seconds (0.0 without samples)."""
+        samples = sorted(self._rtts)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def stats(self) -> Dict[str, float]:
+        """Return the current values and counters."""
+        return {
+            "pacing": self.pacing,
+            "settle": self.settle,
+            "echoes": self.echoes,
+            "late": self.late,
+            "out_of_order": self.out_of_order,
+            "lost": self.lost,
+            "outstanding": len(self._pending),
+            "rtt_p50": self.percentile_rtt(0.50),
+            "rtt_p99": self.percentile_rtt(0.99),
+        }
+
+
+# Candidate pacings tried by calibration, fastest first
+_CALIBRATION_PACINGS = (0.0, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05)
+
+
+def calibrate(bursts: int = 5, burst_length: int = 8,
+              timeout: float = 1.0) -> Optional[Tuple[float, float, Dict[str, float]]]:
+    """Measure how this desktop handles synthetic keys.
+
+    Bursts of shift presses (alternating left and right, which type nothing)
+    are injected at increasing pacing and watched through a pynput listener.
+    The smallest pacing at which every echo arrives, in order, is chosen; the
+    settle time is twice the worst round trip seen at that pacing.
+
+    Returns ``(pacing, settle, details)``, or None if no echo was seen at all.
+    """
+    from pynput import keyboard
+
+    Key = keyboard.Key
+    probes = (Key.shift_l, Key.shift_r)
+    seen: List[Tuple[str, float]] = []
+    lock = threading.Lock()
+
+    def on_press(key):
+        with lock:
+            seen.append((key_token(key), time.monotonic()))
+
+    listener = keyboard.Listener(on_press=on_press)
+    listener.start()
+    listener.wait()
+    controller = keyboard.Controller()
+    details: Dict[str, float] = {}
+    try:
+        for pacing in _CALIBRATION_PACINGS:
+            worst = 0.0
+            clean = True
+            for _ in range(bursts):
+                with lock:
+                    seen.clear()
+                sent = []
+                for i in range(burst_length):
+                    key = probes[i % 2]
+                    sent.append((key.name, time.monotonic()))
+                    controller.press(key)
+                    controller.release(key)
+                    if pacing:
+                        time.sleep(pacing)
+
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline:
+                    with lock:
+                        if len(seen) >= len(sent):
+                            break
+                    time.sleep(0.001)
+                with lock:
+                    echoes = list(seen)
+
+                if not echoes and not details:
+                    # Nothing comes back at all; there is nothing to calibrate against
+                    return None
+                if [token for token, _ in echoes[:len(sent)]] != [token for token, _ in sent]:
+                    clean = False
+                    break
+                worst = max(worst, max(echo[1] - out[1] for echo, out in zip(echoes, sent)))
+
+            details[f"rtt_max@{pacing * 1000:g}ms"] = worst if clean else -1.0
+            if clean:
+                settle = min(MAX_SETTLE, max(MIN_SETTLE, worst * 2))
+                return pacing, settle, details
+    finally:
+        listener.stop()
+
+    return MAX_PACING, MAX_SETTLE, details
@@ -0,0 +1,160 @@
+"""The single Tk event loop shared by every NiceType window."""
+
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from ..core.profiling import cpu_profiler
+
+# How often the Tk thread looks for work posted by other threads
+POLL_INTERVAL_MS = 50
+
+
+class GuiLoop:
+    """Owns the one Tk interpreter of the process and the thread running it.
+
+    Tkinter objects may only be used from the thread that created the
+    interpreter. Other threads (the tray icon, the input processor, ...)
+    hand work over with :meth:`call`; it goes through a queue that the Tk
+    thread drains every ``POLL_INTERVAL_MS`` with ``after()``. Windows are
+    ``Toplevel``s of a hidden root created on demand by :meth:`show`.
+
+    The loop runs either on a background thread started by the first
+    :meth:`call`, or on the thread that calls :meth:`run` (the main thread
+    when there is no tray icon).
+    """
+
+    def __init__(self):
+        """Initialize the loop; nothing is created until it is first used."""
+        self.root = None
+        self._queue: "queue.Queue[Callable[[], Any]]" = queue.Queue()
+        self._windows: Dict[str, Any] = {}
+        self._thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def in_gui_thread(self) -> bool:
+        """Return True if the caller is the thread that owns the Tk interpreter."""
+        return self._thread_id == threading.get_ident()
+
+    def ensure_root(self):
+        """Return the hidden root window, creating the interpreter on this thread if needed."""
+        if self.root is not None:
+            if not self.in_gui_thread():
+                raise RuntimeError("Tk is owned by another thread; use GuiLoop.call()")
+            return self.root
+        import tkinter as tk
+
+        with self._lock:
+            self._thread_id = threading.get_ident()
+            self.root = tk.Tk()
+        self.root.withdraw()
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+        return self.root
+
+    def run(self):
+        """Process Tk events on this thread until :meth:`stop`."""
+        root = self.ensure_root()
+        try:
+            root.mainloop()
+        finally:
+            # stop() may already have handed the loop over to a new thread
+            if self.root is root:
+                self._windows.clear()
+                self.root = None
+            if self.in_gui_thread():
+                self._thread_id = None
+
+    def start(self):
+        """Run the loop on a background thread (if it is not running yet)."""
+        with self._lock:
+            if self._thread_id is not None:
+                return
+            self._thread_id = -1  # Claimed; the thread sets its own id
+        threading.Thread(target=self._run_thread, name="NiceTypeGUI", daemon=True).start()
+
+    def _run_thread(self):
+        """Background thread body."""
+        try:
+            self.run()
+        except Exception as e:
+            print(f"Error in GUI loop: {e}")
+
+    def call(self, func: Callable[..., Any], *args):
+        """Run ``func(*args)`` on the Tk thread; safe to call from any thread.
+
+        Runs immediately when already on the Tk thread, otherwise queues it
+        (starting the background loop if nothing runs one yet).
+        """
+        if self.in_gui_thread():
+            func(*args)
+            return
+        self._queue.put(lambda: func(*args))
+        if self._thread_id is None:
+            self.start()
+
+    def _poll(self):
+        """Run the queued work, then look again after ``POLL_INTERVAL_MS``."""
+        # Follows the CPU profiling switch (tray menu) on this thread
+        cpu_profiler.sync_thread("gui")
+        while True:
+            try:
+                work = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if cpu_profiler.active:
+                    # A no-op under sync_thread; from 3.12 on it is how GUI work gets profiled
+                    cpu_profiler.call("gui", work)
+                else:
+                    work()
+            except Exception as e:
+                print(f"Error in GUI task: {e}")
+        if self.root is not None:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def show(self, name: str, factory: Callable[[Any], Any]):
+        """Raise window ``name``, creating it with ``factory(root)`` if it isn't open.
+
+        Tk thread only (wrap in :meth:`call` elsewhere). ``factory`` returns
+        an object whose ``window`` attribute is the Toplevel.
+        """
+        import tkinter as tk
+
+        window = self._windows.get(name)
+        if window is not None:
+            try:
+                if window.window.winfo_exists():
+                    window.window.deiconify()
+                    window.window.lift()
+                    window.window.focus_force()
+                    return window
+            except tk.TclError:
+                pass
+        window = factory(self.ensure_root())
+        self._windows[name] = window
+        return window
+
+    def stop(self):
+        """Close every window and end the loop; safe to call from any thread."""
+        def destroy():
+            root, self.root = self.root, None
+            self._windows.clear()
+            self._thread_id = None  # The next call() starts a new loop
+            if root is not None:
+                root.destroy()  # Also ends mainloop()
+        if self._thread_id is not None:
+            self.call(destroy)
+
+
+_gui_loop: Optional[GuiLoop] = None
+_gui_loop_lock = threading.Lock()
+
+
+def get_gui_loop() -> GuiLoop:
+    """Get the global GUI loop."""
+    global _gui_loop
+    if _gui_loop is None:
+        with _gui_loop_lock:
+            if _gui_loop is None:
+                _gui_loop = GuiLoop()
+    return _gui_loop
@@ -0,0 +1,334 @@
+"""Virtualized rule list with incremental search for the settings window."""
+
+import tkinter as tk
+from bisect import bisect_left, insort
+from tkinter import ttk
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Rows scrolled per mouse wheel notch
+_WHEEL_ROWS = 3
+
+
+class PrefixIndex:
+    """Sorted ``(text, key)`` pairs answering "which keys have a text starting with ...".
+
+    Texts are case-folded. Lookups are a binary search plus one step per
+    result; adding or removing an entry keeps the list sorted in place.
+    """
+
+    def __init__(self):
+        """Create an empty index."""
+        self._entries: List[Tuple[str, str]] = []
+
+    def build(self, pairs: Iterable[Tuple[str, str]]):
+        """Replace the contents with ``(text, key)`` pairs."""
+        self._entries = sorted((text.casefold(), key) for text, key in pairs)
+
+    def add(self, text: str, key: str):
+        """Index ``key`` under ``text``."""
+        insort(self._entries, (text.casefold(), key))
+
+    def remove(self, text: str, key: str):
+        """Remove the entry for ``key`` under ``text`` (if present)."""
+        entry = (text.casefold(), key)
+        index = bisect_left(self._entries, entry)
+        if index < len(self._entries) and self._entries[index] == entry:
+            del self._entries[index]
+
+    def search(self, prefix: str) -> Set[str]:
+        """Return the keys having a text that starts with ``prefix``."""
+        prefix = prefix.casefold()
+        entries = self._entries
+        index = bisect_left(entries, (prefix,))
+        keys = set()
+        while index < len(entries) and entries[index][0].startswith(prefix):
+            keys.add(entries[index][1])
+            index += 1
+        return keys
+
+
+class RuleListModel:
+    """Rows of a mapping (in mapping order) and the subset matching a search.
+
+    Every change is applied to the rows, the prefix index (patterns and
+    replacements) and the filtered ``view`` directly, so the cost of an edit
+    does not grow with the number of rules.
+    """
+
+    def __init__(self):
+        """Create an empty model."""
+        self.values: Dict[str, str] = {}
+        self.query = ""
+        self.view: List[str] = []  # Keys shown, in mapping order
+        self._order: Dict[str, int] = {}
+        self._next_order = 0
+        self._index = PrefixIndex()
+
+    def __len__(self) -> int:
+        """Return the number of rows (ignoring the search)."""
+        return len(self.values)
+
+    def load(self, mapping: Dict[str, str]):
+        """Replace all rows with ``mapping``."""
+        self.values = dict(mapping)
+        self._order = {key: order for order, key in enumerate(self.values)}
+        self._next_order = len(self.values)
+        self._index.build([(key, key) for key in self.values] + [(value, key) for key, value in self.values.items()])
+        self.filter(self.query)
+
+    def matches(self, key: str) -> bool:
+        """Return True if row ``key`` matches the current search."""
+        query = self.query.casefold()
+        return key.casefold().startswith(query) or self.values[key].casefold().startswith(query)
+
+    def filter(self, query: str):
+        """Show only rows whose pattern or replacement starts with ``query``."""
+        self.query = query
+        if not query:
+            self.view = list(self.values)
+        else:
+            self.view = sorted(self._index.search(query), key=self._order.__getitem__)
+
+    def _view_index(self, key: str) -> int:
+        """Return where ``key`` is (or belongs) in the view, by mapping order."""
+        view = self.view
+        order = self._order
+        target = order[key]
+        low, high = 0, len(view)
+        while low < high:
+            middle = (low + high) // 2
+            if order[view[middle]] < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def position(self, key: str) -> Optional[int]:
+        """Return the index of ``key`` in the view, or None if it is hidden."""
+        if key not in self._order:
+            return None
+        index = self._view_index(key)
+        return index if index < len(self.view) and self.view[index] == key else None
+
+    def set(self, key: str, value: str):
+        """Add row ``key`` (at the end) or change its value."""
+        if key in self.values:
+            old_value = self.values[key]
+            if old_value == value:
+                return
+            self._index.remove(old_value, key)
+            position = self.position(key)
+            if position is not None:
+                del self.view[position]
+        else:
+            self._order[key] = self._next_order
+            self._next_order += 1
+            self._index.add(key, key)
+        self.values[key] = value
+        self._index.add(value, key)
+        if self.matches(key):
+            self.view.insert(self._view_index(key), key)
+
+    def remove(self, key: str):
+        """Delete row ``key``."""
+        if key not in self.values:
+            return
+        position = self.position(key)
+        if position is not None:
+            del self.view[position]
+        self._index.remove(key, key)
+        self._index.remove(self.values.pop(key), key)
+        del self._order[key]
+
+
+class VirtualRuleList(ttk.Frame):
+    """Two-column list that only creates Treeview rows for what is visible.
+
+    The Treeview holds one item per visible line; scrolling re-fills those
+    items from the model instead of moving thousands of real rows, so opening
+    the window and editing stay instant however many rules there are.
+    """
+
+    def __init__(self, parent, columns: Tuple[str, str], headings: Tuple[str, str], height: int = 8):
+        """Create the list with the given column ids and headings."""
+        super().__init__(parent)
+        self.model = RuleListModel()
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="browse")
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=200)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+        self._capacity = height  # Lines that fit; measured once rows are shown
+        self._measured = False
+        self._height = 0
+        self._top = 0
+        self._item_keys: Dict[str, str] = {}  # Treeview item id -> row key
+        self._selected: Optional[str] = None
+        self._rendering = False
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-_WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(_WHEEL_ROWS))
+        for sequence, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "page-up"), ("<Next>", "page-down"),
+                               ("<Home>", "home"), ("<End>", "end")):
+            self.tree.bind(sequence, lambda event, step=step: self._move_selection(step))
+
+    def load(self, mapping: Dict[str, str]):
+        """Show ``mapping`` (keeps the search and, if still present, the selection)."""
+        self.model.load(mapping)
+        if self._selected not in self.model.values:
+            self._selected = None
+        self._render()
+
+    def filter(self, query: str):
+        """Show only rules whose pattern or replacement starts with ``query``."""
+        self.model.filter(query)
+        self._top = 0
+        self._render()
+
+    def set_row(self, key: str, value: str):
+        """Add or change one row and select it."""
+        self.model.set(key, value)
+        self._selected = key
+        self.see(key)
+
+    def remove_row(self, key: str):
+        """Delete one row."""
+        self.model.remove(key)
+        if self._selected == key:
+            self._selected = None
+        self._render()
+
+    def selection(self) -> Optional[Tuple[str, str]]:
+        """Return ``(key, value)`` of the selected row, or None."""
+        if self._selected is None or self._selected not in self.model.values:
+            return None
+        return self._selected, self.model.values[self._selected]
+
+    def see(self, key: str):
+        """Scroll so that row ``key`` is visible (if it matches the search)."""
+        position = self.model.position(key)
+        if position is not None:
+            if position < self._top:
+                self._top = position
+            elif position >= self._top + self._capacity:
+                self._top = position - self._capacity + 1
+        self._render()
+
+    def scroll(self, rows: int):
+        """Scroll by ``rows`` lines."""
+        self._top += rows
+        self._render()
+        return "break"
+
+    def _render(self):
+        """Fill the visible Treeview items from the model."""
+        view = self.model.view
+        self._top = max(0, min(self._top, len(view) - self._capacity))
+        rows = view[self._top:self._top + self._capacity]
+        tree = self.tree
+        items = list(tree.get_children())
+        self._rendering = True
+        try:
+            # Only the number of visible lines ever changes, never thousands of rows
+            for item in items[len(rows):]:
+                tree.delete(item)
+            items = items[:len(rows)]
+            while len(items) < len(rows):
+                items.append(tree.insert("", "end"))
+
+            self._item_keys = {}
+            selected_item = None
+            values = self.model.values
+            for item, key in zip(items, rows):
+                tree.item(item, values=(key, values[key]))
+                self._item_keys[item] = key
+                if key == self._selected:
+                    selected_item = item
+            if selected_item is not None:
+                tree.selection_set(selected_item)
+            elif tree.selection():
+                tree.selection_remove(tree.selection())
+        finally:
+            self._rendering = False
+
+        if rows and not self._measured:
+            # Row geometry is only known once a row has been drawn
+            self.after_idle(self._measure)
+        if view:
+            self.scrollbar.set(self._top / len(view), min(1.0, (self._top + self._capacity) / len(view)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_resize(self, event):
+        """Recompute how many lines fit."""
+        self._height = event.height
+        self._measure()
+
+    def _measure(self):
+        """Derive the number of lines from the position and height of the first row."""
+        tree = self.tree
+        children = tree.get_children()
+        bbox = tree.bbox(children[0]) if children else None
+        if not bbox or not self._height:
+            return
+        _, first_y, _, row_height = bbox
+        self._measured = True
+        capacity = max(1, (self._height - first_y) // max(1, row_height))
+        if capacity != self._capacity:
+            self._capacity = capacity
+            self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        """Handle scrollbar drags and clicks."""
+        if action == "moveto":
+            self._top = int(float(amount) * len(self.model.view))
+            self._render()
+        else:
+            rows = int(amount) * (self._capacity if unit == "pages" else 1)
+            self.scroll(rows)
+
+    def _on_wheel(self, event):
+        """Scroll with the mouse wheel (Windows and macOS)."""
+        if event.delta:
+            return self.scroll(-_WHEEL_ROWS if event.delta > 0 else _WHEEL_ROWS)
+        return None
+
+    def _on_select(self, event):
+        """Remember the selected row by its key."""
+        if self._rendering:
+            return
+        selection = self.tree.selection()
+        if selection:
+            self._selected = self._item_keys.get(selection[0])
+
+    def _move_selection(self, step):
+        """Keyboard navigation across the whole list, not just the visible lines."""
+        view = self.model.view
+        if not view:
+            return "break"
+        position = self.model.position(self._selected) if self._selected is not None else None
+        if step == "home":
+            position = 0
+        elif step == "end":
+            position = len(view) - 1
+        elif position is None:
+            position = self._top
+        elif step == "page-up":
+            position -= self._capacity
+        elif step == "page-down":
+            position += self._capacity
+        else:
+            position += step
+        position = max(0, min(position, len(view) - 1))
+        self._selected = view[position]
+        self.see(self._selected)
+        return "break"
@@ -1,26 +1,100 @@
 """Main GUI window for NiceType settings."""
 
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
-from typing import Dict
-from ..config.manager import config
-from ..core.processor import input_processor
+from tkinter import ttk, messagebox, filedialog
+from typing import Callable, Dict, Optional
+from ..config.manager import get_config
+from ..config import rulefiles
+from ..config.persistence import atomic_writer
+from .loop import get_gui_loop
+from .rulelist import VirtualRuleList
+
+
+# File dialog choices for importing and exporting rules
+_RULE_FILE_TYPES = [
+    ("Rule files", "*.csv *.tsv *.jsonl"),
+    ("CSV", "*.csv"),
+    ("Tab separated", "*.tsv"),
+    ("JSON lines", "*.jsonl"),
+    ("All files", "*"),
+]
+
+
+class _BackgroundApplier:
+    """Applies a setting on a background thread, so the window never waits for it.
+
+    Setting the punctuation mapping recompiles the whole rule set, which takes
+    tens of milliseconds for large sets. Values requested while one is being
+    applied are coalesced: only the newest is applied next. :meth:`flush`
+    applies anything pending before the config is read or saved.
+    """
+    
+    def __init__(self, apply: Callable[[Dict[str, str]], None]):
+        """Initialize the applier; the thread starts with the first request."""
+        self._apply = apply
+        self._pending: Optional[Dict[str, str]] = None
+        self._cond = threading.Condition()
+        # Held while applying, so values are applied in request order
+        self._apply_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def request(self, value: Dict[str, str]):
+        """Schedule ``value`` to be applied."""
+        with self._cond:
+            self._pending = value
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="NiceTypeRuleApplier", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+    
+    def flush(self):
+        """Apply the pending value now and wait for one being applied."""
+        with self._apply_lock:
+            with self._cond:
+                value, self._pending = self._pending, None
+            if value is not None:
+                try:
+                    self._apply(value)
+                except Exception as e:
+                    print(f"Error applying rules: {e}")
+    
+    def _run(self):
+        """Applier loop."""
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+            self.flush()
+
+
+def _set_punctuation_mapping(mapping: Dict[str, str]):
+    """Store ``mapping`` as the global punctuation rules."""
+    get_config().set_punctuation_mapping(mapping)
+
+
+# Rule edits made in the settings window are compiled off the Tk thread
+_punctuation_applier = _BackgroundApplier(_set_punctuation_mapping)
 
 
 class SettingsWindow:
-    """Main settings window for NiceType."""
+    """Main settings window for NiceType (a Toplevel of the shared GUI loop)."""
     
-    def __init__(self):
-        """Initialize the settings window."""
-        self.window = tk.Tk()
+    def __init__(self, master=None):
+        """Initialize the settings window; must run on the GUI thread."""
+        if master is None:
+            master = get_gui_loop().ensure_root()
+        self.window = tk.Toplevel(master)
+        self.window.protocol("WM_DELETE_WINDOW", self.destroy)
         self.window.title("NiceType Settings")
         self.window.geometry("600x500")
         self.window.resizable(True, True)
+        self.config = get_config()
         
         # Variables for checkboxes
-        self.enabled_var = tk.BooleanVar(value=config.is_enabled())
-        self.punctuation_var = tk.BooleanVar(value=config.is_punctuation_conversion_enabled())
-        self.auto_complete_var = tk.BooleanVar(value=config.is_auto_complete_enabled())
+        self.enabled_var = tk.BooleanVar(self.window, value=self.config.is_enabled())
+        self.punctuation_var = tk.BooleanVar(self.window, value=self.config.is_punctuation_conversion_enabled())
+        self.auto_complete_var = tk.BooleanVar(self.window, value=self.config.is_auto_complete_enabled())
         
         self._create_widgets()
         self._load_settings()
@@ -72,25 +146,20 @@ class SettingsWindow:
         )
         
         row += 1
-        # Create frame for punctuation mapping
-        punct_frame = ttk.Frame(main_frame)
-        punct_frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
-        punct_frame.columnconfigure(0, weight=1)
-        punct_frame.rowconfigure(0, weight=1)
-        
-        # Punctuation mapping treeview
-        self.punct_tree = ttk.Treeview(punct_frame, columns=("from", "to"), show="headings", height=8)
-        self.punct_tree.heading("from", text="From (Chinese)")
-        self.punct_tree.heading("to", text="To (English)")
-        self.punct_tree.column("from", width=200)
-        self.punct_tree.column("to", width=200)
-        
-        # Scrollbar for punctuation mapping
-        punct_scrollbar = ttk.Scrollbar(punct_frame, orient="vertical", command=self.punct_tree.yview)
-        self.punct_tree.configure(yscrollcommand=punct_scrollbar.set)
-        
-        self.punct_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        punct_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        # Incremental search over patterns and replacements
+        search_frame = ttk.Frame(main_frame)
+        search_frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        search_frame.columnconfigure(1, weight=1)
+        ttk.Label(search_frame, text="Search:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
+        self.search_var = tk.StringVar(self.window)
+        self.search_var.trace_add("write", lambda *args: self.punct_list.filter(self.search_var.get()))
+        ttk.Entry(search_frame, textvariable=self.search_var).grid(row=0, column=1, sticky=(tk.W, tk.E))
+        
+        row += 1
+        # Punctuation mapping list (only visible rows are rendered)
+        self.punct_list = VirtualRuleList(main_frame, ("from", "to"), ("From (Chinese)", "To (English)"), height=8)
+        self.punct_list.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        punct_row = row
         
         # Buttons for punctuation mapping
         row += 1
@@ -113,25 +182,10 @@ class SettingsWindow:
         )
         
         row += 1
-        # Create frame for auto-complete pairs
-        auto_frame = ttk.Frame(main_frame)
-        auto_frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
-        auto_frame.columnconfigure(0, weight=1)
-        auto_frame.rowconfigure(0, weight=1)
-        
-        # Auto-complete pairs treeview
-        self.auto_tree = ttk.Treeview(auto_frame, columns=("open", "close"), show="headings", height=6)
-        self.auto_tree.heading("open", text="Opening")
-        self.auto_tree.heading("close", text="Closing")
-        self.auto_tree.column("open", width=200)
-        self.auto_tree.column("close", width=200)
-        
-        # Scrollbar for auto-complete pairs
-        auto_scrollbar = ttk.Scrollbar(auto_frame, orient="vertical", command=self.auto_tree.yview)
-        self.auto_tree.configure(yscrollcommand=auto_scrollbar.set)
-        
-        self.auto_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        auto_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        # Auto-complete pairs list
+        self.auto_list = VirtualRuleList(main_frame, ("open", "close"), ("Opening", "Closing"), height=6)
+        self.auto_list.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        auto_row = row
         
         # Buttons for auto-complete pairs
         row += 1
@@ -147,12 +201,14 @@ class SettingsWindow:
         bottom_frame = ttk.Frame(main_frame)
         bottom_frame.grid(row=row, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=20)
         
+        ttk.Button(bottom_frame, text="Import Rules...", command=self._import_rules).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(bottom_frame, text="Export Rules...", command=self._export_rules).pack(side=tk.LEFT)
         ttk.Button(bottom_frame, text="Save & Apply", command=self._save_settings).pack(side=tk.RIGHT, padx=(5, 0))
         ttk.Button(bottom_frame, text="Reset to Defaults", command=self._reset_to_defaults).pack(side=tk.RIGHT)
         
         # Configure row weights for expansion
-        main_frame.rowconfigure(row-3, weight=1)  # Punctuation mapping area
-        main_frame.rowconfigure(row-1, weight=1)  # Auto-complete pairs area
+        main_frame.rowconfigure(punct_row, weight=1)  # Punctuation mapping area
+        main_frame.rowconfigure(auto_row, weight=1)  # Auto-complete pairs area
     
     def _load_settings(self):
         """Load current settings into the GUI."""
@@ -160,95 +216,71 @@ class SettingsWindow:
         self._load_auto_complete_pairs()
     
     def _load_punctuation_mapping(self):
-        """Load punctuation mapping into the treeview."""
-        # Clear existing items
-        for item in self.punct_tree.get_children():
-            self.punct_tree.delete(item)
-        
-        # Add current mappings
-        mapping = config.get_punctuation_mapping()
-        for from_chars, to_char in mapping.items():
-            self.punct_tree.insert("", "end", values=(from_chars, to_char))
+        """Load punctuation mapping into the list."""
+        self.punct_list.load(self.config.get_punctuation_mapping())
     
     def _load_auto_complete_pairs(self):
-        """Load auto-complete pairs into the treeview."""
-        # Clear existing items
-        for item in self.auto_tree.get_children():
-            self.auto_tree.delete(item)
-        
-        # Add current pairs
-        pairs = config.get_auto_complete_pairs()
-        for open_char, close_char in pairs.items():
-            self.auto_tree.insert("", "end", values=(open_char, close_char))
+        """Load auto-complete pairs into the list."""
+        self.auto_list.load(self.config.get_auto_complete_pairs())
     
     def _on_enabled_changed(self):
         """Handle enabled checkbox change."""
-        config.set_enabled(self.enabled_var.get())
+        self.config.set_enabled(self.enabled_var.get())
     
     def _on_punctuation_changed(self):
         """Handle punctuation conversion checkbox change."""
-        config.set_punctuation_conversion_enabled(self.punctuation_var.get())
+        self.config.set_punctuation_conversion_enabled(self.punctuation_var.get())
     
     def _on_auto_complete_changed(self):
         """Handle auto-complete checkbox change."""
-        config.set_auto_complete_enabled(self.auto_complete_var.get())
+        self.config.set_auto_complete_enabled(self.auto_complete_var.get())
     
     def _add_punctuation_rule(self):
         """Add a new punctuation conversion rule."""
         dialog = PunctuationRuleDialog(self.window, "Add Punctuation Rule")
         if dialog.result:
             from_chars, to_char = dialog.result
-            # Check if rule already exists
-            mapping = config.get_punctuation_mapping()
-            if from_chars in mapping:
-                messagebox.showwarning("Duplicate Rule", f"Rule for '{from_chars}' already exists.")
+            # Check if rule already exists (the list is ahead of rules still being applied)
+            if from_chars in self.punct_list.model.values:
+                messagebox.showwarning("Duplicate Rule", f"Rule for '{from_chars}' already exists.", parent=self.window)
                 return
             
-            mapping[from_chars] = to_char
-            config.set_punctuation_mapping(mapping)
-            self._load_punctuation_mapping()
+            self.punct_list.set_row(from_chars, to_char)
+            self._apply_punctuation_mapping()
     
     def _edit_punctuation_rule(self):
         """Edit selected punctuation conversion rule."""
-        selection = self.punct_tree.selection()
+        selection = self.punct_list.selection()
         if not selection:
-            messagebox.showwarning("No Selection", "Please select a rule to edit.")
+            messagebox.showwarning("No Selection", "Please select a rule to edit.", parent=self.window)
             return
         
-        item = selection[0]
-        values = self.punct_tree.item(item, "values")
-        from_chars, to_char = values
+        from_chars, to_char = selection
         
         dialog = PunctuationRuleDialog(self.window, "Edit Punctuation Rule", from_chars, to_char)
         if dialog.result:
             new_from_chars, new_to_char = dialog.result
-            mapping = config.get_punctuation_mapping()
-            
-            # Remove old rule if key changed
+            # Remove old rule if key changed; the renamed rule moves to the end
             if new_from_chars != from_chars:
-                del mapping[from_chars]
-            
-            mapping[new_from_chars] = new_to_char
-            config.set_punctuation_mapping(mapping)
-            self._load_punctuation_mapping()
+                self.punct_list.remove_row(from_chars)
+            self.punct_list.set_row(new_from_chars, new_to_char)
+            self._apply_punctuation_mapping()
     
     def _delete_punctuation_rule(self):
         """Delete selected punctuation conversion rule."""
-        selection = self.punct_tree.selection()
+        selection = self.punct_list.selection()
         if not selection:
-            messagebox.showwarning("No Selection", "Please select a rule to delete.")
+            messagebox.showwarning("No Selection", "Please select a rule to delete.", parent=self.window)
             return
         
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this rule?"):
-            item = selection[0]
-            values = self.punct_tree.item(item, "values")
-            from_chars = values[0]
-            
-            mapping = config.get_punctuation_mapping()
-            if from_chars in mapping:
-                del mapping[from_chars]
-                config.set_punctuation_mapping(mapping)
-                self._load_punctuation_mapping()
+        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this rule?", parent=self.window):
+            from_chars = selection[0]
+            self.punct_list.remove_row(from_chars)
+            self._apply_punctuation_mapping()
+    
+    def _apply_punctuation_mapping(self):
+        """Hand the rules shown in the list to the config; they are compiled in the background."""
+        _punctuation_applier.request(dict(self.punct_list.model.values))
     
     def _add_auto_complete_pair(self):
         """Add a new auto-complete pair."""
@@ -256,78 +288,128 @@ class SettingsWindow:
         if dialog.result:
             open_char, close_char = dialog.result
             # Check if pair already exists
-            pairs = config.get_auto_complete_pairs()
+            pairs = self.config.get_auto_complete_pairs()
             if open_char in pairs:
-                messagebox.showwarning("Duplicate Pair", f"Pair for '{open_char}' already exists.")
+                messagebox.showwarning("Duplicate Pair", f"Pair for '{open_char}' already exists.", parent=self.window)
                 return
             
             pairs[open_char] = close_char
-            config.set_auto_complete_pairs(pairs)
-            self._load_auto_complete_pairs()
+            self.config.set_auto_complete_pairs(pairs)
+            self.auto_list.set_row(open_char, close_char)
     
     def _edit_auto_complete_pair(self):
         """Edit selected auto-complete pair."""
-        selection = self.auto_tree.selection()
+        selection = self.auto_list.selection()
         if not selection:
-            messagebox.showwarning("No Selection", "Please select a pair to edit.")
+            messagebox.showwarning("No Selection", "Please select a pair to edit.", parent=self.window)
             return
         
-        item = selection[0]
-        values = self.auto_tree.item(item, "values")
-        open_char, close_char = values
+        open_char, close_char = selection
         
         dialog = AutoCompletePairDialog(self.window, "Edit Auto-Complete Pair", open_char, close_char)
         if dialog.result:
             new_open_char, new_close_char = dialog.result
-            pairs = config.get_auto_complete_pairs()
+            pairs = self.config.get_auto_complete_pairs()
             
             # Remove old pair if key changed
             if new_open_char != open_char:
                 del pairs[open_char]
             
             pairs[new_open_char] = new_close_char
-            config.set_auto_complete_pairs(pairs)
-            self._load_auto_complete_pairs()
+            self.config.set_auto_complete_pairs(pairs)
+            if new_open_char != open_char:
+                self.auto_list.remove_row(open_char)
+            self.auto_list.set_row(new_open_char, new_close_char)
     
     def _delete_auto_complete_pair(self):
         """Delete selected auto-complete pair."""
-        selection = self.auto_tree.selection()
+        selection = self.auto_list.selection()
         if not selection:
-            messagebox.showwarning("No Selection", "Please select a pair to delete.")
+            messagebox.showwarning("No Selection", "Please select a pair to delete.", parent=self.window)
             return
         
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this pair?"):
-            item = selection[0]
-            values = self.auto_tree.item(item, "values")
-            open_char = values[0]
+        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this pair?", parent=self.window):
+            open_char = selection[0]
             
-            pairs = config.get_auto_complete_pairs()
+            pairs = self.config.get_auto_complete_pairs()
             if open_char in pairs:
                 del pairs[open_char]
-                config.set_auto_complete_pairs(pairs)
-                self._load_auto_complete_pairs()
+                self.config.set_auto_complete_pairs(pairs)
+                self.auto_list.remove_row(open_char)
+    
+    def _import_rules(self):
+        """Merge punctuation rules and completion pairs from a CSV, TSV or JSON lines file."""
+        path = filedialog.askopenfilename(parent=self.window, title="Import Rules", filetypes=_RULE_FILE_TYPES)
+        if not path:
+            return
+        _punctuation_applier.flush()
+        try:
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                plan = rulefiles.plan_import(self.config, f, rulefiles.detect_format(path))
+        except (OSError, UnicodeDecodeError) as e:
+            messagebox.showerror("Import Failed", f"Could not read {path}:\n{e}", parent=self.window)
+            return
+        if not plan.ok:
+            messagebox.showerror("Import Failed", "Nothing was imported.\n\n" + plan.summary(), parent=self.window)
+            return
+        
+        overwrite = False
+        if plan.conflicts:
+            answer = messagebox.askyesnocancel(
+                "Conflicting Rules",
+                plan.summary() + "\n\nReplace the existing rules with the imported ones?\n"
+                "(No keeps the existing rules and imports the rest.)", parent=self.window)
+            if answer is None:
+                return
+            overwrite = answer
+        
+        # One config change for the whole file, so the rules are compiled once
+        if rulefiles.apply_import(self.config, plan, overwrite):
+            self._load_settings()
+        messagebox.showinfo("Rules Imported", plan.summary(overwrite), parent=self.window)
+    
+    def _export_rules(self):
+        """Write all punctuation rules and completion pairs to a file."""
+        path = filedialog.asksaveasfilename(parent=self.window, title="Export Rules", defaultextension=".csv",
+                                            filetypes=_RULE_FILE_TYPES)
+        if not path:
+            return
+        _punctuation_applier.flush()
+        try:
+            with atomic_writer(path, "utf-8", newline="") as f:
+                count = rulefiles.write_rules(f, rulefiles.detect_format(path), rulefiles.export_rows(self.config))
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Export Failed", str(e), parent=self.window)
+            return
+        messagebox.showinfo("Rules Exported", f"Exported {count} rules to {path}.", parent=self.window)
     
     def _save_settings(self):
         """Save all settings to configuration file."""
-        config.save()
-        messagebox.showinfo("Settings Saved", "Settings have been saved successfully.")
+        _punctuation_applier.flush()
+        self.config.save()
+        messagebox.showinfo("Settings Saved", "Settings have been saved successfully.", parent=self.window)
     
     def _reset_to_defaults(self):
         """Reset all settings to defaults."""
-        if messagebox.askyesno("Reset to Defaults", "Are you sure you want to reset all settings to defaults?"):
-            config._config = config._load_default_config()
-            self.enabled_var.set(config.is_enabled())
-            self.punctuation_var.set(config.is_punctuation_conversion_enabled())
-            self.auto_complete_var.set(config.is_auto_complete_enabled())
+        if messagebox.askyesno("Reset to Defaults", "Are you sure you want to reset all settings to defaults?",
+                               parent=self.window):
+            # Edits still being applied would otherwise land on top of the defaults
+            _punctuation_applier.flush()
+            self.config.reset_to_defaults()
+            self.enabled_var.set(self.config.is_enabled())
+            self.punctuation_var.set(self.config.is_punctuation_conversion_enabled())
+            self.auto_complete_var.set(self.config.is_auto_complete_enabled())
             self._load_settings()
     
     def run(self):
-        """Start the GUI main loop."""
-        self.window.mainloop()
+        """Process GUI events until the window is closed."""
+        self.window.wait_window()
     
     def destroy(self):
         """Destroy the window."""
         self.window.destroy()
+        # Settings-only mode exits once the window is gone
+        _punctuation_applier.flush()
 
 
 class PunctuationRuleDialog:
@@ -385,15 +467,11 @@ class PunctuationRuleDialog:
         to_char = self.to_entry.get().strip()
         
         if not from_chars or not to_char:
-            messagebox.showwarning("Invalid Input", "Both fields are required.")
-            return
-        
-        if len(from_chars) != 2:
-            messagebox.showwarning("Invalid Input", "From field must be exactly 2 characters.")
+            messagebox.showwarning("Invalid Input", "Both fields are required.", parent=self.dialog)
             return
         
         if len(to_char) != 1:
-            messagebox.showwarning("Invalid Input", "To field must be exactly 1 character.")
+            messagebox.showwarning("Invalid Input", "To field must be exactly 1 character.", parent=self.dialog)
             return
         
         self.result = (from_chars, to_char)
@@ -459,15 +537,17 @@ class AutoCompletePairDialog:
         close_char = self.close_entry.get().strip()
         
         if not open_char or not close_char:
-            messagebox.showwarning("Invalid Input", "Both fields are required.")
+            messagebox.showwarning("Invalid Input", "Both fields are required.", parent=self.dialog)
             return
         
         if len(open_char) != 1:
-            messagebox.showwarning("Invalid Input", "Opening character must be exactly 1 character.")
+            messagebox.showwarning("Invalid Input", "Opening character must be exactly 1 character.",
+                                   parent=self.dialog)
             return
         
         if len(close_char) != 1:
-            messagebox.showwarning("Invalid Input", "Closing character must be exactly 1 character.")
+            messagebox.showwarning("Invalid Input", "Closing character must be exactly 1 character.",
+                                   parent=self.dialog)
             return
         
         self.result = (open_char, close_char)
@@ -0,0 +1,58 @@
+"""Latency statistics window for NiceType."""
+
+import tkinter as tk
+from tkinter import ttk
+from ..core.stats import latency_stats, default_stats_path
+from .loop import get_gui_loop
+
+
+class StatsWindow:
+    """Shows the latency histograms of the running NiceType instance."""
+
+    def __init__(self, master=None):
+        """Initialize the statistics window; must run on the GUI thread."""
+        if master is None:
+            master = get_gui_loop().ensure_root()
+        self.window = tk.Toplevel(master)
+        self.window.protocol("WM_DELETE_WINDOW", self.destroy)
+        self.window.title("NiceType Statistics")
+        self.window.geometry("640x260")
+
+        main_frame = ttk.Frame(self.window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.text = tk.Text(main_frame, font=("Courier", 10), height=10, wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True)
+
+        self.path_label = ttk.Label(main_frame, text="")
+        self.path_label.pack(anchor=tk.W, pady=(5, 0))
+
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(btn_frame, text="Reset", command=self._reset).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(btn_frame, text="Refresh", command=self._refresh).pack(side=tk.RIGHT)
+
+        self._refresh()
+
+    def _refresh(self):
+        """Redraw the report and save it for bug reports."""
+        latency_stats.dump()
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, latency_stats.format_report())
+        self.text.config(state=tk.DISABLED)
+        self.path_label.config(text=f"Saved to {default_stats_path()}")
+
+    def _reset(self):
+        """Clear all histograms."""
+        latency_stats.reset()
+        self._refresh()
+
+    def run(self):
+        """Process GUI events until the window is closed."""
+        self.window.wait_window()
+
+    def destroy(self):
+        """Destroy the window."""
+        self.window.destroy()
@@ -1,23 +1,36 @@
 """System tray integration for NiceType."""
 
-import tkinter as tk
-import threading
-from tkinter import messagebox
 import sys
 import os
+from typing import Optional
 
-# Try to import pystray for system tray, fallback to menu if not available
-try:
-    import pystray
-    from pystray import MenuItem as Item
-    from PIL import Image, ImageDraw
-    TRAY_AVAILABLE = True
-except ImportError:
-    TRAY_AVAILABLE = False
+from ..core.processor import get_input_processor
+from ..config.manager import get_config
+from ..core.profiling import cpu_profiler
+from .loop import get_gui_loop
 
-from ..core.processor import input_processor
-from ..config.manager import config
-from .settings import SettingsWindow
+# pystray and PIL are imported on first use by _load_tray_backend()
+pystray = None
+Item = None
+Image = None
+ImageDraw = None
+_tray_available: Optional[bool] = None
+
+
+def _load_tray_backend() -> bool:
+    """Import pystray and PIL, returning False if they are not installed."""
+    global pystray, Item, Image, ImageDraw, _tray_available
+    if _tray_available is None:
+        try:
+            import pystray as _pystray
+            from PIL import Image as _Image, ImageDraw as _ImageDraw
+        except ImportError:
+            _tray_available = False
+        else:
+            pystray, Item = _pystray, _pystray.MenuItem
+            Image, ImageDraw = _Image, _ImageDraw
+            _tray_available = True
+    return _tray_available
 
 
 class SystemTray:
@@ -26,15 +39,14 @@ class SystemTray:
     def __init__(self):
         """Initialize system tray."""
         self.icon = None
-        self.settings_window = None
         self.running = False
         
-        if not TRAY_AVAILABLE:
+        if not _load_tray_backend():
             print("System tray not available. Please install: pip install pystray pillow")
     
     def create_icon_image(self, enabled=True):
         """Create the system tray icon image."""
-        if not TRAY_AVAILABLE:
+        if not _load_tray_backend():
             return None
             
         # Create a simple icon
@@ -54,56 +66,50 @@ class SystemTray:
     
     def create_menu(self):
         """Create the system tray menu."""
-        if not TRAY_AVAILABLE:
+        if not _load_tray_backend():
             return None
             
         return (
             Item("Settings", self.show_settings, default=True),
-            Item("Enable/Disable", self.toggle_enabled, checked=lambda item: config.is_enabled()),
+            Item("Enable/Disable", self.toggle_enabled, checked=lambda item: get_config().is_enabled()),
             pystray.Menu.SEPARATOR,
             Item("Punctuation Conversion", self.toggle_punctuation, 
-                 checked=lambda item: config.is_punctuation_conversion_enabled()),
+                 checked=lambda item: get_config().is_punctuation_conversion_enabled()),
             Item("Auto-Completion", self.toggle_auto_complete, 
-                 checked=lambda item: config.is_auto_complete_enabled()),
+                 checked=lambda item: get_config().is_auto_complete_enabled()),
+            pystray.Menu.SEPARATOR,
+            Item("Latency Statistics", self.show_stats),
+            Item("CPU Profiling", self.toggle_profiling, checked=lambda item: cpu_profiler.active),
             pystray.Menu.SEPARATOR,
             Item("Exit", self.quit_application)
         )
     
     def show_settings(self, icon=None, item=None):
-        """Show the settings window."""
-        if self.settings_window is None:
-            self.settings_window = SettingsWindow()
-            # Run in a separate thread to avoid blocking
-            threading.Thread(target=self._run_settings_window, daemon=True).start()
-        else:
-            # Bring window to front
-            try:
-                self.settings_window.window.lift()
-                self.settings_window.window.focus_force()
-            except tk.TclError:
-                # Window was destroyed, create new one
-                self.settings_window = SettingsWindow()
-                threading.Thread(target=self._run_settings_window, daemon=True).start()
-    
-    def _run_settings_window(self):
-        """Run the settings window in a thread."""
-        try:
-            self.settings_window.run()
-        except Exception as e:
-            print(f"Error in settings window: {e}")
-        finally:
-            self.settings_window = None
+        """Show the settings window (or bring it to the front)."""
+        # Menu callbacks run on pystray's thread; Tk only ever runs on the GUI thread
+        gui = get_gui_loop()
+        gui.call(gui.show, "settings", _open_settings)
+    
+    def show_stats(self, icon=None, item=None):
+        """Show the latency statistics window."""
+        gui = get_gui_loop()
+        gui.call(gui.show, "stats", _open_stats)
+    
+    def toggle_profiling(self, icon=None, item=None):
+        """Switch CPU profiling of the listener, injection and GUI threads on or off."""
+        _toggle_profiling()
     
     def toggle_enabled(self, icon=None, item=None):
         """Toggle NiceType enabled state."""
+        config = get_config()
         current_state = config.is_enabled()
         config.set_enabled(not current_state)
         config.save()
         
         if current_state:
-            input_processor.stop()
+            get_input_processor().stop()
         else:
-            input_processor.start()
+            get_input_processor().start()
         
         # Update icon
         if self.icon:
@@ -111,12 +117,14 @@ class SystemTray:
     
     def toggle_punctuation(self, icon=None, item=None):
         """Toggle punctuation conversion."""
+        config = get_config()
         current_state = config.is_punctuation_conversion_enabled()
         config.set_punctuation_conversion_enabled(not current_state)
         config.save()
     
     def toggle_auto_complete(self, icon=None, item=None):
         """Toggle auto-completion."""
+        config = get_config()
         current_state = config.is_auto_complete_enabled()
         config.set_auto_complete_enabled(not current_state)
         config.save()
@@ -124,13 +132,8 @@ class SystemTray:
     def quit_application(self, icon=None, item=None):
         """Quit the application."""
         self.running = False
-        input_processor.stop()
-        
-        if self.settings_window:
-            try:
-                self.settings_window.destroy()
-            except:
-                pass
+        get_input_processor().stop()
+        get_gui_loop().stop()
         
         if self.icon:
             self.icon.stop()
@@ -139,22 +142,22 @@ class SystemTray:
     
     def run(self):
         """Run the system tray."""
-        if not TRAY_AVAILABLE:
+        if not _load_tray_backend():
             # Fallback: run settings window directly
             print("Running NiceType in window mode (system tray not available)")
-            self.show_settings()
+            _open_settings(get_gui_loop().ensure_root()).run()
             return
         
         self.running = True
         
         # Start input processor
-        if config.is_enabled():
-            input_processor.start()
+        if get_config().is_enabled():
+            get_input_processor().start()
         
         # Create and run system tray icon
         self.icon = pystray.Icon(
             "NiceType",
-            self.create_icon_image(config.is_enabled()),
+            self.create_icon_image(get_config().is_enabled()),
             "NiceType - Chinese Input Enhancement",
             self.create_menu()
         )
@@ -169,27 +172,32 @@ class MenuFallback:
     """Fallback menu system when system tray is not available."""
     
     def __init__(self):
-        """Initialize fallback menu."""
-        self.root = tk.Tk()
-        self.root.title("NiceType")
-        self.root.geometry("300x200")
-        self.settings_window = None
+        """Initialize fallback menu; the GUI loop runs on this thread."""
+        import tkinter as tk
+        self.gui = get_gui_loop()
+        self.window = tk.Toplevel(self.gui.ensure_root())
+        self.window.title("NiceType")
+        self.window.geometry("300x280")
+        self.window.protocol("WM_DELETE_WINDOW", self.quit_application)
         
         self._create_menu()
         
         # Start input processor if enabled
-        if config.is_enabled():
-            input_processor.start()
+        if get_config().is_enabled():
+            get_input_processor().start()
     
     def _create_menu(self):
         """Create the fallback menu."""
-        main_frame = tk.Frame(self.root, padx=20, pady=20)
+        import tkinter as tk
+        main_frame = tk.Frame(self.window, padx=20, pady=20)
         main_frame.pack(fill=tk.BOTH, expand=True)
         
         tk.Label(main_frame, text="NiceType", font=("Arial", 16, "bold")).pack(pady=(0, 20))
         
         tk.Button(main_frame, text="Settings", command=self.show_settings, width=20).pack(pady=5)
         tk.Button(main_frame, text="Toggle Enable/Disable", command=self.toggle_enabled, width=20).pack(pady=5)
+        tk.Button(main_frame, text="Statistics", command=self.show_stats, width=20).pack(pady=5)
+        tk.Button(main_frame, text="Toggle CPU Profiling", command=self.toggle_profiling, width=20).pack(pady=5)
         tk.Button(main_frame, text="Exit", command=self.quit_application, width=20).pack(pady=5)
         
         # Status
@@ -199,56 +207,87 @@ class MenuFallback:
     
     def _update_status(self):
         """Update status display."""
-        status = "Enabled" if config.is_enabled() else "Disabled"
+        status = "Enabled" if get_config().is_enabled() else "Disabled"
+        if cpu_profiler.active:
+            status += ", profiling CPU"
         self.status_label.config(text=f"Status: {status}")
     
     def show_settings(self):
         """Show settings window."""
-        if self.settings_window is None:
-            self.settings_window = SettingsWindow()
-            # Run in separate thread
-            threading.Thread(target=self._run_settings, daemon=True).start()
+        self.gui.show("settings", _open_settings)
     
-    def _run_settings(self):
-        """Run settings window."""
-        try:
-            self.settings_window.run()
-        except Exception as e:
-            print(f"Error in settings: {e}")
-        finally:
-            self.settings_window = None
+    def show_stats(self):
+        """Show latency statistics window."""
+        self.gui.show("stats", _open_stats)
+    
+    def toggle_profiling(self):
+        """Toggle CPU profiling."""
+        _toggle_profiling()
+        self._update_status()
     
     def toggle_enabled(self):
         """Toggle enabled state."""
+        config = get_config()
         current_state = config.is_enabled()
         config.set_enabled(not current_state)
         config.save()
         
         if current_state:
-            input_processor.stop()
+            get_input_processor().stop()
         else:
-            input_processor.start()
+            get_input_processor().start()
         
         self._update_status()
     
     def quit_application(self):
         """Quit application."""
-        input_processor.stop()
-        if self.settings_window:
-            try:
-                self.settings_window.destroy()
-            except:
-                pass
-        self.root.quit()
+        get_input_processor().stop()
+        self.gui.stop()
         sys.exit(0)
     
     def run(self):
         """Run the fallback menu."""
-        self.root.mainloop()
+        self.gui.run()
+
+
+def _toggle_profiling():
+    """Switch CPU profiling on or off and say where the profiles go."""
+    if cpu_profiler.toggle():
+        print(f"CPU profiling on; writing to {cpu_profiler.directory} every {cpu_profiler.interval:g} s")
+        note = cpu_profiler.coverage_note()
+        if note:
+            print(f"Note: {note}.")
+    else:
+        print(f"CPU profiling off; profiles saved in {cpu_profiler.directory}")
+
+
+def _open_settings(root):
+    """Create the settings window (on the GUI thread)."""
+    from .settings import SettingsWindow
+    return SettingsWindow(root)
+
+
+def _open_stats(root):
+    """Create the statistics window (on the GUI thread)."""
+    from .stats import StatsWindow
+    return StatsWindow(root)
+
+
+_tray = None
+
+
+def get_tray():
+    """Get the global tray, falling back to a plain window without pystray."""
+    global _tray
+    if _tray is None:
+        _tray = SystemTray() if _load_tray_backend() else MenuFallback()
+    return _tray
 
 
-# Create global tray instance
-if TRAY_AVAILABLE:
-    tray = SystemTray()
-else:
-    tray = MenuFallback()
\ No newline at end of file
+def __getattr__(name):
+    """Create the global ``tray`` and ``TRAY_AVAILABLE`` lazily."""
+    if name == "tray":
+        return get_tray()
+    if name == "TRAY_AVAILABLE":
+        return _load_tray_backend()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 import sys
 import argparse
+import atexit
 import os
 
 
@@ -16,6 +17,15 @@ Examples:
   nicetype --settings-only    # Run settings window only
   nicetype --no-tray          # Run without system tray
   nicetype --test             # Test core functionality only
+  nicetype --stats            # Show latency statistics of the last run
+  nicetype --calibrate        # Measure and store injection timing
+  nicetype --profile-memory 600           # Report memory growth every 10 minutes
+  nicetype --profile                      # Write CPU profiles to ~/.nicetype/profiles/
+  nicetype convert notes.txt  # Apply the punctuation rules to a file
+  cat log.txt | nicetype convert -o converted.txt
+  nicetype convert --in-place docs/       # Convert a whole tree in parallel
+  nicetype rules import shared.csv        # Merge a shared rule set
+  nicetype rules export -o rules.jsonl    # Save all rules and pairs
         """
     )
     
@@ -37,24 +47,196 @@ Examples:
         help="Test core functionality without GUI"
     )
     
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print latency statistics saved by the last run (~/.nicetype/stats.json)"
+    )
+    
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Measure how fast synthetic keys round-trip on this desktop and store the injection timing"
+    )
+    
+    parser.add_argument(
+        "--profile-memory",
+        nargs="?",
+        type=float,
+        const=300.0,
+        default=None,
+        metavar="SECONDS",
+        help="Trace memory use and write the largest growth to ~/.nicetype/memory-profile.txt "
+             "every SECONDS (default: 300)"
+    )
+    
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        type=float,
+        const=60.0,
+        default=None,
+        metavar="SECONDS",
+        help="Profile the listener, injection and GUI threads and write pstats and collapsed stacks "
+             "to ~/.nicetype/profiles/ every SECONDS (default: 60)"
+    )
+    
     parser.add_argument(
         "--version",
         action="version",
         version="NiceType 1.0.0"
     )
     
+    subparsers = parser.add_subparsers(dest="command")
+    convert_parser = subparsers.add_parser(
+        "convert",
+        help="Apply the punctuation rules to files or stdin",
+        description="Apply the configured punctuation rules to files (or stdin) exactly as live typing would."
+    )
+    convert_parser.add_argument(
+        "files",
+        nargs="*",
+        help="Files to convert ('-' or none for stdin); results are written one after another"
+    )
+    convert_parser.add_argument(
+        "-o", "--output",
+        help="Write to this file instead of stdout"
+    )
+    convert_parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="Rewrite the given files (directories are searched recursively) in place, in parallel"
+    )
+    convert_parser.add_argument(
+        "--mirror",
+        metavar="DIR",
+        help="Like --in-place, but write every file to the same relative path under DIR"
+    )
+    convert_parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes for --in-place/--mirror (default: one per CPU)"
+    )
+    convert_parser.add_argument(
+        "--encoding",
+        default="utf-8",
+        help="Text encoding of input and output (default: utf-8)"
+    )
+    convert_parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=64 * 1024,
+        help="Characters read per chunk (default: 65536)"
+    )
+    
+    rules_parser = subparsers.add_parser(
+        "rules",
+        help="Import or export punctuation rules and completion pairs",
+        description="Bulk import or export rules as CSV, TSV or JSON lines (columns/keys: kind, from, to)."
+    )
+    rules_commands = rules_parser.add_subparsers(dest="rules_command")
+    rules_commands.required = True
+    import_parser = rules_commands.add_parser(
+        "import",
+        help="Merge rules from a file into the configuration (in one step)"
+    )
+    import_parser.add_argument(
+        "file",
+        help="Rule file ('-' for stdin)"
+    )
+    import_parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Replace the existing rules of every kind found in the file instead of merging"
+    )
+    import_parser.add_argument(
+        "--on-conflict",
+        choices=("keep", "overwrite"),
+        default="keep",
+        help="For patterns that already exist with another replacement (default: keep)"
+    )
+    import_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report what would change"
+    )
+    export_parser = rules_commands.add_parser(
+        "export",
+        help="Write the configured rules to a file or stdout"
+    )
+    export_parser.add_argument(
+        "-o", "--output",
+        help="Write to this file instead of stdout"
+    )
+    for sub in (import_parser, export_parser):
+        sub.add_argument(
+            "--format",
+            choices=("csv", "tsv", "jsonl"),
+            help="File format (default: from the file extension, else csv)"
+        )
+        sub.add_argument(
+            "--kind",
+            choices=("punctuation", "completion", "all"),
+            default=None,
+            help="Import: kind of rows without a kind column (default: punctuation). "
+                 "Export: which rules to write (default: all)"
+        )
+        sub.add_argument(
+            "--encoding",
+            default="utf-8",
+            help="Text encoding (default: utf-8; a byte order mark is skipped on import)"
+        )
+    
     args = parser.parse_args()
+    if args.profile_memory is not None and args.profile_memory <= 0:
+        parser.error("--profile-memory interval must be positive")
+    if args.profile is not None and args.profile <= 0:
+        parser.error("--profile interval must be positive")
+    if args.command == "convert" and args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.command == "convert" and args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    
+    if args.command == "convert":
+        return run_convert(args)
+    
+    if args.command == "rules":
+        return run_rules(args)
     
     # Handle test mode first (no GUI dependencies)
     if args.test:
         return run_tests()
     
+    if args.stats:
+        return show_stats()
+    
+    if args.calibrate:
+        return run_calibration()
+    
     # Check for GUI environment
     if not check_gui_environment():
         print("Warning: GUI environment not available.")
         print("Running in test mode to verify core functionality...")
         return run_tests()
     
+    if args.profile_memory is not None:
+        start_memory_profiler(args.profile_memory)
+    if args.profile is not None:
+        from .core.profiling import cpu_profiler
+        cpu_profiler.start(args.profile)
+        print(f"Profiling CPU; writing to {cpu_profiler.directory} every {args.profile:g} s")
+        note = cpu_profiler.coverage_note()
+        if note:
+            print(f"Note: {note}.")
+    
+    # Keep the latency histograms of this session for `nicetype --stats`
+    if not args.settings_only:
+        from .core.stats import latency_stats
+        atexit.register(latency_stats.dump)
+        start_config_watcher()
+        start_focus_tracker()
+    
     try:
         if args.settings_only:
             # Show settings window only
@@ -74,8 +256,9 @@ Examples:
     except KeyboardInterrupt:
         print("\nShutting down NiceType...")
         try:
-            from .core.processor import input_processor
-            input_processor.stop()
+            from .core import processor
+            if processor._input_processor is not None:
+                processor._input_processor.stop()
         except:
             pass
         sys.exit(0)
@@ -96,25 +279,575 @@ def check_gui_environment():
     if os.name == 'posix' and 'DISPLAY' not in os.environ:
         return False
     
-    # Try importing tkinter
+    # Look for tkinter without importing it (that alone takes tens of milliseconds)
+    import importlib.util
+    return importlib.util.find_spec("tkinter") is not None
+
+
+def start_config_watcher():
+    """Reload ~/.nicetype/config.json automatically when it is edited."""
+    from .config.manager import config
+    if not config.get("watch_config", True):
+        return None
+    
+    from .config.watcher import ConfigWatcher
+    watcher = ConfigWatcher(config)
+    watcher.start()
+    atexit.register(watcher.stop)
+    return watcher
+
+
+def start_focus_tracker():
+    """Follow the focused window to apply per-application profiles."""
+    from .config.manager import config
+    from .core.focus import FocusTracker
+    tracker = FocusTracker(config)
+    if not tracker.start():
+        return None
+    atexit.register(tracker.stop)
+    return tracker
+
+
+def start_memory_profiler(interval):
+    """Sample memory use every ``interval`` seconds for the growth report."""
+    from .core.memprofile import MemoryProfiler
+    profiler = MemoryProfiler(interval)
+    profiler.start()
+    atexit.register(profiler.stop)
+    print(f"Profiling memory every {interval:g} s; report: {profiler.path}")
+    return profiler
+
+
+def show_stats():
+    """Print latency statistics saved by the last NiceType session."""
+    from .core.stats import default_stats_path, format_report, load_stats
+    
+    path = default_stats_path()
+    data = load_stats(path)
+    if data is None:
+        print(f"No statistics found at {path}.")
+        print("Statistics are saved when NiceType exits or when the tray's statistics window is opened.")
+        return 1
+    
+    print(f"NiceType latency statistics ({path})")
+    print(format_report(data))
+    return 0
+
+
+def run_calibration():
+    """Measure injection timing for this desktop and save it to the config."""
+    from .config.manager import get_config
+    from .core.timing import calibrate
+    
+    print("Calibrating injection timing; please don't type for a few seconds...")
     try:
-        import tkinter
-        return True
-    except ImportError:
-        return False
+        result = calibrate()
+    except Exception as e:
+        print(f"Calibration failed: {e}")
+        return 1
+    if result is None:
+        print("No synthetic key events were echoed back; keeping the current timing.")
+        return 1
+    
+    pacing, settle, details = result
+    for name, value in details.items():
+        print(f"  {name}: {'out of order' if value < 0 else f'{value * 1000:.2f} ms'}")
+    
+    config = get_config()
+    config.update({"injection_pacing": pacing, "injection_settle": settle})
+    config.save()
+    config.flush()
+    print(f"✓ injection_pacing = {pacing * 1000:g} ms, injection_settle = {settle * 1000:.1f} ms")
+    return 0
+
+
+def run_convert(args):
+    """Stream files or stdin through the punctuation rules."""
+    from .config.manager import get_config
+    from .core.convert import convert_stream
+    
+    config = get_config()
+    if args.in_place or args.mirror:
+        if not args.files or "-" in args.files or args.output:
+            print("--in-place/--mirror need files or directories (and no --output)", file=sys.stderr)
+            return 2
+        from .core.batch import convert_files
+        summary = convert_files(args.files, config.get_punctuation_mapping(),
+                                config.get("case_sensitive", False), mirror=args.mirror,
+                                jobs=args.jobs, encoding=args.encoding,
+                                backend=config.get("rule_backend", "auto"))
+        print(summary.format())
+        return 1 if summary.errors else 0
+    
+    rules = config.get_compiled_rules()
+    if args.output:
+        try:
+            destination = open(args.output, "w", encoding=args.encoding, newline="")
+        except OSError as e:
+            print(f"Error writing {args.output}: {e}", file=sys.stderr)
+            return 1
+    else:
+        sys.stdout.reconfigure(encoding=args.encoding, newline="")
+        destination = sys.stdout
+    
+    status = 0
+    try:
+        for path in args.files or ["-"]:
+            try:
+                if path == "-":
+                    sys.stdin.reconfigure(encoding=args.encoding, newline="")
+                    convert_stream(sys.stdin, destination, rules, args.chunk_size)
+                else:
+                    with open(path, "r", encoding=args.encoding, newline="") as source:
+                        convert_stream(source, destination, rules, args.chunk_size)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error converting {path}: {e}", file=sys.stderr)
+                status = 1
+    finally:
+        if destination is not sys.stdout:
+            destination.close()
+        else:
+            destination.flush()
+    return status
+
+
+def run_rules(args):
+    """Import or export rules in bulk."""
+    from .config.manager import get_config
+    from .config import rulefiles
+    
+    config = get_config()
+    if args.rules_command == "export":
+        fmt = args.format or rulefiles.detect_format(args.output)
+        kinds = rulefiles.KINDS if args.kind in (None, "all") else (args.kind,)
+        rows = rulefiles.export_rows(config, kinds)
+        try:
+            if args.output:
+                from .config.persistence import atomic_writer
+                with atomic_writer(args.output, args.encoding, newline="") as f:
+                    count = rulefiles.write_rules(f, fmt, rows)
+                print(f"Exported {count} rules to {args.output}")
+            else:
+                sys.stdout.reconfigure(encoding=args.encoding, newline="")
+                rulefiles.write_rules(sys.stdout, fmt, rows)
+        except (OSError, ValueError) as e:
+            print(f"Error exporting rules: {e}", file=sys.stderr)
+            return 1
+        return 0
+    
+    fmt = args.format or rulefiles.detect_format(args.file)
+    kind = rulefiles.PUNCTUATION if args.kind in (None, "all") else args.kind
+    # utf-8-sig also reads plain UTF-8, and skips the BOM spreadsheets like to add
+    encoding = "utf-8-sig" if args.encoding.lower().replace("_", "-") in ("utf-8", "utf8") else args.encoding
+    try:
+        if args.file == "-":
+            sys.stdin.reconfigure(encoding=encoding, newline="")
+            plan = rulefiles.plan_import(config, sys.stdin, fmt, kind, args.replace)
+        else:
+            with open(args.file, "r", encoding=encoding, newline="") as f:
+                plan = rulefiles.plan_import(config, f, fmt, kind, args.replace)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error reading {args.file}: {e}", file=sys.stderr)
+        return 1
+    
+    overwrite = args.on_conflict == "overwrite"
+    print(plan.summary(overwrite))
+    if not plan.ok:
+        print("Nothing imported; fix the errors above first.", file=sys.stderr)
+        return 1
+    if args.dry_run:
+        return 0
+    if rulefiles.apply_import(config, plan, overwrite):
+        config.save()
+        config.flush()
+        print("✓ Rules imported")
+    else:
+        print("Nothing to change.")
+    return 0
+
+
+def _expect(actual, expected, what: str):
+    """Fail the test run if ``actual`` is not ``expected``."""
+    if actual != expected:
+        raise AssertionError(f"{what}: expected {expected!r}, got {actual!r}")
+
+
+def _match_after(rules, text: str):
+    """Feed ``text`` to ``rules`` one key at a time and return the match on the last key."""
+    state = rules.ROOT
+    for char in text:
+        state = rules.step(state, char)
+    return rules.match(state)
+
+
+def _test_rule_engine():
+    """Check matching of the compiled rule automaton."""
+    from .core.rules import RuleEngine
+    
+    rules = RuleEngine({",,": "，", "..": "‥", "...": "…", "abc": "X", "bd": "Y", "": "ignored"})
+    _expect(len(rules), 5, "rules compiled (empty pattern skipped)")
+    _expect(_match_after(rules, "a,,"), (2, "，"), "rule ending at the last key")
+    _expect(_match_after(rules, ".."), (2, "‥"), "shorter rule before the longer one completes")
+    _expect(_match_after(rules, "..."), (3, "…"), "longest rule ending at the last key")
+    _expect(_match_after(rules, "abd"), (2, "Y"), "rule found through a failure link")
+    _expect(_match_after(rules, "abx"), None, "unknown character resets")
+    _expect(_match_after(rules, "ABC"), (3, "X"), "case-insensitive match")
+    _expect(_match_after(RuleEngine({"abc": "X"}, case_sensitive=True), "ABC"), None, "case-sensitive match")
+    _expect(_match_after(RuleEngine({"ab": "1", "AB": "2"}), "AB"), (2, "1"), "first of colliding rules wins")
+    print("✓ Rule engine matches longest rules, case and failure links correctly")
+
+
+def _test_pending_edits():
+    """Check that a burst of conversions and completions is typed as one edit."""
+    from .core.history import KeystrokeHistory
+    from .core.output import EditScript, PendingEdits
+    from .core.processor import InputProcessor
+    
+    history = KeystrokeHistory(16)
+    for char in "a,":
+        history.push(char, 0.0, 0)
+    pending = PendingEdits()
+    _expect(pending.replace(2, "，", ",", history), True, "first edit schedules a flush")
+    _expect(pending.take(), EditScript(2, "，"), "conversion reaching into the history")
+    _expect(pending.take(), EditScript(), "nothing left after a flush")
+    
+    # "(" completes, then "a[" and ",," are typed before the worker flushes
+    _expect(pending.complete(")"), True, "completion schedules a flush")
+    for char in "a[":
+        pending.typed(char)
+    _expect(pending.complete("]"), False, "second completion joins the pending flush")
+    for char in ",,":
+        pending.typed(char)
+    _expect(pending.replace(2, "，", ",", history), False, "conversion joins the pending flush")
+    _expect(pending.merged, 2, "triggers merged")
+    _expect(pending.take(), EditScript(2, "，])", 2), "one script for the whole burst")
+    
+    # Moving the cursor drops the pending edits, but the queued flush still comes
+    _expect(pending.complete(")"), True, "completion after a flush schedules a new one")
+    pending.discard()
+    _expect(pending.complete("]"), False, "flush still queued after the cursor moved")
+    _expect(pending.take(), EditScript(0, "]", 1), "only edits made after the cursor moved")
+    
+    # Disabling drops the queued flush with the injector; enabling again must schedule anew
+    processor = InputProcessor()
+    _expect(processor.pending.complete(")"), True, "completion before disabling")
+    processor.stop()
+    _expect(processor.pending.complete(")"), True, "completion after re-enabling schedules a flush")
+    print("✓ Pending edits coalesce bursts and recover from a dropped flush")
+
+
+def _test_history_capacity():
+    """Check that a rule longer than the keystroke history is still replaced whole."""
+    from types import SimpleNamespace
+    from .config.snapshot import ConfigSnapshot
+    from .core.history import KeystrokeHistory
+    from .core.processor import InputProcessor
+    from .core.rules import RuleEngine
+    
+    processor = InputProcessor()
+    processor.stop()  # Not listening: edits are typed inline
+    rules = RuleEngine({"abcd": "Z"})
+    settings = {"auto_complete_enabled": False}
+    processor._config = SimpleNamespace(snapshot=ConfigSnapshot(0, settings, rules))
+    # As with "history_capacity": 2
+    processor._history_capacity = 2
+    processor.history = KeystrokeHistory(2)
+    scripts = []
+    processor.output = SimpleNamespace(send=scripts.append)
+    for char in "abcd":
+        processor._on_key_press(SimpleNamespace(char=char))
+    _expect([(script.backspaces, script.text) for script in scripts], [(4, "Z")], "edit for a 4-key rule")
+    _expect(processor.history.capacity, 4, "history grown to the longest pattern")
+    print("✓ Keystroke history holds the longest rule")
+
+
+def _test_rule_store():
+    """Check that compiled rules survive the disk cache and damaged files are ignored."""
+    import contextlib
+    import io
+    import tempfile
+    from pathlib import Path
+    from .config.rulecache import CompiledRuleStore, rules_key
+    from .core.rules import RuleEngine
+    
+    mapping = {",,": "，", "-->": "→"}
+    key = rules_key(mapping, False, "automaton")
+    rules = RuleEngine(mapping)
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "rules.cache"
+        store = CompiledRuleStore(path)
+        store.save(key, rules)
+        store.flush()
+        loaded = store.load(key)
+        _expect(loaded.to_data() if loaded is not None else None, rules.to_data(), "rules loaded from the cache")
+        _expect(store.load(rules_key(mapping, True, "automaton")), None, "cache of other rules")
+        
+        data = path.read_bytes()
+        header, _, body = data.partition(b"\n")
+        damaged = {
+            "wrong magic": header.replace(b"NICETYPE-RULES", b"NICETYPE-OTHER") + b"\n" + body,
+            "truncated JSON": data[:len(data) - 10],
+        }
+        for what, content in damaged.items():
+            path.write_bytes(content)
+            with contextlib.redirect_stdout(io.StringIO()):
+                _expect(store.load(key), None, f"cache with {what}")
+        _expect((store.hits, store.misses), (1, 3), "cache hits and misses")
+    print("✓ Compiled rule cache round-trips and ignores damaged files")
+
+
+def _test_stream_converter():
+    """Check that batch conversion gives the same text however the input is split."""
+    import io
+    from .core.backends import compile_rules, eligible_backends
+    from .core.convert import StreamConverter, convert_stream
+    
+    cases = [
+        # Spaces and line breaks end a pattern; the trailing "--" is held back until the end
+        ({",,": "，", "-->": "→", "<-": "←"}, "a,,b-->c , ,\n, <-x--", "a，b→c , ,\n, ←x--", 3),
+        ({"，": ",", "。": "."}, "a，b。\n，", "a,b.\n,", 3),
+    ]
+    for mapping, text, expected, conversions in cases:
+        splits = [[text]] + [[text[:cut], text[cut:]] for cut in range(1, len(text))] + [list(text)]
+        for backend in eligible_backends(mapping, False):
+            rules = compile_rules(mapping, backend=backend)
+            for chunks in splits:
+                converter = StreamConverter(rules)
+                output = "".join(converter.feed(chunk) for chunk in chunks) + converter.flush()
+                _expect(output, expected, f"{backend} output for chunks {chunks!r}")
+                _expect(converter.conversions, conversions, f"{backend} conversions for chunks {chunks!r}")
+                _expect((converter.chars_in, converter.chars_out), (len(text), len(expected)), f"{backend} counts")
+    
+    # An empty read means the end of the input, so a chunk size of 0 would silently drop everything
+    try:
+        rules = compile_rules({",,": "，"}, backend="automaton")
+        convert_stream(io.StringIO("a,,b"), io.StringIO(), rules, chunk_size=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("chunk size 0 accepted")
+    print("✓ Batch conversion is the same across chunk boundaries")
+
+
+def _scratch_config(directory: str):
+    """Return a ConfigManager kept in ``directory`` that compiles quickly and writes no rule cache."""
+    import json
+    from pathlib import Path
+    from .config.manager import ConfigManager
+    
+    settings = {"rule_backend": "automaton", "compiled_rule_cache": False}
+    (Path(directory) / "config.json").write_text(json.dumps(settings), encoding="utf-8")
+    return ConfigManager(directory)
+
+
+def _test_config_watcher():
+    """Check that the watcher reloads edits made elsewhere but not our own saves."""
+    import json
+    import tempfile
+    from .config.watcher import ConfigWatcher
+    
+    with tempfile.TemporaryDirectory() as directory:
+        manager = _scratch_config(directory)
+        watcher = ConfigWatcher(manager, debounce=0.01, poll_interval=0.01)
+        backend = watcher._create_backend()
+        try:
+            manager.set_enabled(False)
+            manager.save()
+            manager.flush()
+            watcher._watch_once(backend)
+            _expect((watcher.own_saves, watcher.reloads), (1, 0), "own save skipped")
+            
+            data = json.loads(manager.config_file.read_text(encoding="utf-8"))
+            data["enabled"] = True
+            manager.config_file.write_text(json.dumps(data), encoding="utf-8")
+            watcher._watch_once(backend)
+            _expect((watcher.own_saves, watcher.reloads), (1, 1), "edit made elsewhere reloaded")
+            _expect(manager.is_enabled(), True, "reloaded setting")
+        finally:
+            backend.close()
+    print("✓ Config watcher reloads outside edits and skips its own saves")
+
+
+def _test_config_writer():
+    """Check that saves in quick succession end in one atomic write."""
+    import json
+    import os
+    import tempfile
+    from pathlib import Path
+    from .config.persistence import ConfigWriter
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "config.json"
+        path.write_text("{}", encoding="utf-8")
+        os.chmod(path, 0o640)
+        # The worker waits out the delay, so only flush() writes during the check
+        writer = ConfigWriter(path, delay=60.0)
+        for count in range(1, 4):
+            writer.request({"count": count})
+        writer.flush()
+        _expect((writer.requests, writer.writes), (3, 1), "saves coalesced into one write")
+        _expect(json.loads(path.read_text(encoding="utf-8")), {"count": 3}, "newest settings written")
+        _expect(os.listdir(directory), ["config.json"], "files after the write")
+        _expect(os.stat(path).st_mode & 0o777, 0o640, "permissions kept")
+        _expect(writer.wrote_current(), True, "file recognised as our own write")
+        path.write_text('{"count": 4}', encoding="utf-8")
+        _expect(writer.wrote_current(), False, "file changed elsewhere")
+    print("✓ Config writer coalesces saves into one atomic write")
+
+
+def _test_profiles():
+    """Check that malformed profiles are skipped and windows select the right one."""
+    import contextlib
+    import io
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as directory:
+        manager = _scratch_config(directory)
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            manager.set("profiles", {
+                "terminal": {"match": ["XTerm"], "punctuation_conversion_enabled": False},
+                "editor": {"match": ["code"], "punctuation_mapping": {"->": "→"}},
+                "no list": {"match": "code"},
+                "wrong type": {"match": ["gedit"], "enabled": "yes"},
+                "no object": ["code"],
+            })
+        _expect(sorted(manager.get_profiles()), ["editor", "terminal"], "profiles kept")
+        _expect(report.getvalue().count("Skipping profile"), 3, "malformed profiles reported")
+        _expect(manager.profile_for_window(("xterm", "XTerm")), "terminal", "profile for a terminal")
+        _expect(manager.profile_for_window(("code", "Code")), "editor", "profile matched ignoring case")
+        _expect(manager.profile_for_window(("firefox", "Firefox")), None, "window without a profile")
+        _expect(manager.get_compiled_rules("terminal") is manager.get_compiled_rules(), True,
+                "profile without rule overrides shares the global rules")
+        
+        _expect(manager.activate_profile("editor"), True, "profile switch")
+        snapshot = manager.snapshot
+        _expect((snapshot.profile, _match_after(snapshot.rules, "->")), ("editor", (2, "→")), "editor rules active")
+        _expect(manager.activate_profile("editor"), False, "switch to the active profile")
+        manager.activate_profile(None)
+        _expect(_match_after(manager.snapshot.rules, "->"), None, "global rules after leaving the editor")
+    print("✓ Profiles are validated and follow the focused window")
+
+
+def _test_echo_tracker():
+    """Check that exactly the echoes of injected keys are recognised."""
+    from types import SimpleNamespace
+    from .core.timing import EchoTracker
+    
+    comma = SimpleNamespace(char="，")
+    tracker = EchoTracker(pacing=0.001, settle=0.02)
+    tracker.sent("backspace", 1.0)
+    tracker.sent("，", 1.0)
+    _expect(tracker.echoed(SimpleNamespace(char="a"), 1.001), False, "user key in the middle of a burst")
+    _expect(tracker.echoed(SimpleNamespace(name="backspace"), 1.002), True, "echo of a special key")
+    _expect(tracker.echoed(comma, 1.003), True, "echo of a character")
+    _expect((tracker.has_pending(), tracker.echoes), (False, 2), "all echoes matched")
+    _expect(tracker.echoed(comma, 1.004), False, "user typing the injected character again")
+    
+    tracker.sent("x", 2.0)
+    tracker.sent("y", 2.0)
+    tracker.echoed(SimpleNamespace(char="y"), 2.001)
+    tracker.echoed(SimpleNamespace(char="x"), 2.002)
+    _expect((tracker.out_of_order, tracker.pacing), (1, 0.002), "pacing doubled after reordered echoes")
+    
+    tracker.sent("z", 3.0)
+    _expect(tracker.echoed(SimpleNamespace(char="z"), 3.1), False, "key after the echo deadline")
+    _expect(tracker.lost, 1, "expired echoes")
+    _expect(round(tracker.settle, 6), 0.03, "settle raised on a desktop that echoes")
+    
+    # A desktop that never echoes stops queueing after enough expired events
+    silent = EchoTracker(settle=0.01)
+    for index in range(32):
+        silent.sent("shift", float(index))
+    silent.echoed(SimpleNamespace(char="a"), 100.0)
+    silent.sent("shift", 100.0)
+    _expect((silent.expecting, silent.has_pending()), (False, False), "no echoes expected any more")
+    print("✓ Echo tracker drops only echoes of injected keys")
+
+
+def _test_config_updates():
+    """Check that changes are published to subscribers and invalid ones change nothing."""
+    import contextlib
+    import io
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as directory:
+        manager = _scratch_config(directory)
+        events = []
+        unsubscribe = manager.subscribe(lambda snapshot, changed: events.append((snapshot, changed)))
+        
+        manager.set_enabled(False)
+        _expect([changed for _, changed in events], [frozenset({"enabled"})], "change published")
+        _expect((events[0][0] is manager.snapshot, manager.snapshot.enabled), (True, False), "new snapshot")
+        manager.set_enabled(False)
+        _expect(len(events), 1, "unchanged setting not published")
+        
+        manager.set_punctuation_mapping({"->": "→"})
+        _expect(_match_after(manager.snapshot.rules, "->"), (2, "→"), "rules recompiled")
+        
+        snapshot = manager.snapshot
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            manager.set("history_capacity", "many")
+            manager.set("injection_settle", -1)
+            manager.set_punctuation_mapping({"->": 1})
+        _expect(report.getvalue().count("Keeping current settings"), 3, "invalid settings reported")
+        _expect((manager.snapshot is snapshot, len(events)), (True, 2), "invalid settings not published")
+        _expect((manager.get("history_capacity"), manager.get_punctuation_mapping()), (64, {"->": "→"}),
+                "settings after rejected changes")
+        
+        unsubscribe()
+        manager.set_enabled(True)
+        _expect(len(events), 2, "no events after unsubscribing")
+    print("✓ Config changes are validated and published atomically")
+
+
+def _test_rule_import():
+    """Check duplicate, conflict and error handling of rule file imports."""
+    import io
+    import tempfile
+    from .config import rulefiles
+    
+    with tempfile.TemporaryDirectory() as directory:
+        manager = _scratch_config(directory)
+        manager.set_punctuation_mapping({",,": "，", "..": "。"})
+        rows = ("kind,from,to\n"
+                "punctuation,->,→\n"
+                "punctuation,->,→\n"
+                "punctuation,\",,\",，\n"
+                "punctuation,..,…\n"
+                "completion,(,)\n")
+        plan = rulefiles.plan_import(manager, io.StringIO(rows), "csv")
+        _expect((plan.ok, plan.added, plan.duplicates, plan.unchanged), (True, 1, 1, 2), "import counts")
+        _expect(plan.conflicts, [(5, "punctuation", "..", "。", "…")], "conflicting rule")
+        _expect(plan.changes(overwrite=True)["punctuation_mapping"][".."], "…", "conflict resolved for the file")
+        _expect(rulefiles.apply_import(manager, plan), True, "import applied")
+        _expect(manager.get_punctuation_mapping(), {",,": "，", "..": "。", "->": "→"}, "existing rule kept")
+        
+        rows = "punctuation,->,⇒\npunctuation,->,→\npunctuation,a b,x\n"
+        plan = rulefiles.plan_import(manager, io.StringIO(rows), "csv")
+        _expect((plan.ok, len(plan.errors)), (False, 2), "contradiction and space reported")
+        _expect(rulefiles.apply_import(manager, plan, overwrite=True), False, "file with errors not applied")
+        _expect(manager.get_punctuation_mapping()["->"], "→", "rules after a failed import")
+        
+        exported = io.StringIO()
+        count = rulefiles.write_rules(exported, "tsv", rulefiles.export_rows(manager))
+        plan = rulefiles.plan_import(manager, io.StringIO(exported.getvalue()), "tsv")
+        _expect((plan.ok, plan.unchanged, plan.changes()), (True, count, {}), "exported rules import unchanged")
+    print("✓ Rule import reports duplicates, conflicts and errors")
 
 
 def run_tests():
     """Run core functionality tests."""
     try:
-        from .config.manager import ConfigManager
+        from .config.manager import get_config
         
         print("=" * 50)
         print("NiceType Core Functionality Test")
         print("=" * 50)
         
         # Test configuration
-        config = ConfigManager()
+        config = get_config()
         print(f"✓ Configuration loaded successfully")
         print(f"  - Enabled: {config.is_enabled()}")
         print(f"  - Punctuation conversion: {config.is_punctuation_conversion_enabled()}")
@@ -136,6 +869,19 @@ def run_tests():
         if len(pairs) > 3:
             print(f"  - ... and {len(pairs) - 3} more")
         
+        print()
+        _test_rule_engine()
+        _test_pending_edits()
+        _test_history_capacity()
+        _test_stream_converter()
+        _test_rule_store()
+        _test_config_watcher()
+        _test_config_writer()
+        _test_profiles()
+        _test_echo_tracker()
+        _test_config_updates()
+        _test_rule_import()
+        
         print("\n" + "=" * 50)
         print("🎉 NiceType core functionality is working correctly!")
         print("=" * 50)